@@ -16,10 +16,17 @@ MONTH_MAPPING = {
     "Nov": 11,
     "Dec": 12,
 }
+FORWARD_FILLED_COLUMNS = ["status", "news", "news_added"]
 
 
-def compute_availability(df: pl.LazyFrame) -> pl.LazyFrame:
-    """Compute the availability of players for each fixture."""
+def compute_availability(
+    df: pl.LazyFrame, prior: pl.DataFrame | None = None
+) -> pl.LazyFrame:
+    """Compute the availability of players for each fixture.
+
+    A prior from `get_availability_prior` continues forward filling from records
+    that are no longer in the frame.
+    """
 
     # Sort by kickoff time (for forward filling)
     df = df.sort("kickoff_time")
@@ -32,28 +39,42 @@ def compute_availability(df: pl.LazyFrame) -> pl.LazyFrame:
             pl.col("news_added").forward_fill().over("code"),
         ]
     )
+    if prior is not None:
+        prior = prior.select(
+            pl.col("code"),
+            *[pl.col(c).alias(f"prior_{c}") for c in FORWARD_FILLED_COLUMNS],
+        )
+        df = df.join(
+            prior.lazy() if isinstance(df, pl.LazyFrame) else prior,
+            on="code",
+            how="left",
+            maintain_order="left",
+        )
+        df = df.with_columns(
+            pl.col(c).fill_null(pl.col(f"prior_{c}")) for c in FORWARD_FILLED_COLUMNS
+        ).drop(f"prior_{c}" for c in FORWARD_FILLED_COLUMNS)
 
-    # Parse the "news" column to get expected return days and months
-    df = df.with_columns(
+    # Parse the "news" column to get expected return days and months. The news
+    # repeats across many fixtures, so only its unique values are parsed.
+    news = df.select(pl.col("news").unique().drop_nulls())
+    text = pl.col("news").cast(pl.String)
+    news = news.with_columns(
         [
-            pl.col("news")
-            .str.extract(EXPECTED_BACK_PATTERN, 1)
+            text.str.extract(EXPECTED_BACK_PATTERN, 1)
             .cast(pl.Int32)
             .alias("expected_back_day"),
-            pl.col("news")
-            .str.extract(EXPECTED_BACK_PATTERN, 2)
+            text.str.extract(EXPECTED_BACK_PATTERN, 2)
             .replace(MONTH_MAPPING)
             .alias("expected_back_month"),
-            pl.col("news")
-            .str.extract(SUSPENDED_UNTIL_PATTERN, 1)
+            text.str.extract(SUSPENDED_UNTIL_PATTERN, 1)
             .cast(pl.Int32)
             .alias("suspended_until_day"),
-            pl.col("news")
-            .str.extract(SUSPENDED_UNTIL_PATTERN, 2)
+            text.str.extract(SUSPENDED_UNTIL_PATTERN, 2)
             .replace(MONTH_MAPPING)
             .alias("suspended_until_month"),
         ]
     )
+    df = df.join(news, on="news", how="left", maintain_order="left")
     df = df.with_columns(
         [
             pl.when(
@@ -152,3 +173,12 @@ def compute_availability(df: pl.LazyFrame) -> pl.LazyFrame:
     )
 
     return df
+
+
+def get_availability_prior(df: pl.DataFrame) -> pl.DataFrame:
+    """Get the last known status, news, and news_added of each player."""
+    return (
+        df.sort("kickoff_time")
+        .group_by("code")
+        .agg(pl.col(c).drop_nulls().last() for c in FORWARD_FILLED_COLUMNS)
+    )
@@ -19,44 +19,22 @@ def compute_clb_features(matches: pl.DataFrame):
     )
 
     # Calculate expected goals for both sides based on win probabilities
-    predictions = []
-    for match in matches.to_dicts():
-        target_probs = [
-            {
-                "type": "h2h",
-                "data": [
-                    {"side": "home", "prob": match["team_h_clb_win_prob"]},
-                    {"side": "away", "prob": match["team_a_clb_win_prob"]},
-                ],
-            }
+    outcomes = pl.concat(
+        [
+            matches.select(
+                pl.int_range(pl.len(), dtype=pl.UInt32).alias("match"),
+                pl.lit("h2h").alias("type"),
+                pl.lit(side).alias("side"),
+                pl.lit(None, dtype=pl.Float64).alias("point"),
+                pl.col(f"team_{team}_clb_win_prob").alias("prob"),
+            )
+            for team, side in [("h", "home"), ("a", "away")]
         ]
-
-        result = estimate_goals(target_probs, max_goals=10)
-        if result.success:
-            predicted_home_goals, predicted_away_goals = result.x
-        else:
-            predicted_home_goals = predicted_away_goals = None
-
-        row = {
-            "season": match["season"],
-            "fixture_id": match["fixture_id"],
-            "team_h_clb_expected_goals": predicted_home_goals,
-            "team_a_clb_expected_goals": predicted_away_goals,
-        }
-        predictions.append(row)
-
-    clb_predictions = pl.DataFrame(predictions)
-
-    # Merge predictions back into matches DataFrame
-    matches = matches.join(
-        clb_predictions.select(
-            "season",
-            "fixture_id",
-            "team_h_clb_expected_goals",
-            "team_a_clb_expected_goals",
-        ),
-        on=["season", "fixture_id"],
-        how="left",
+    ).sort("match", maintain_order=True)
+    goals = estimate_goals(outcomes, matches.height, max_goals=10)
+    matches = matches.with_columns(
+        pl.Series("team_h_clb_expected_goals", goals[:, 0], nan_to_null=True),
+        pl.Series("team_a_clb_expected_goals", goals[:, 1], nan_to_null=True),
     )
 
     return matches.lazy()
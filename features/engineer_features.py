@@ -1,3 +1,5 @@
+from collections.abc import Callable, Collection
+
 import polars as pl
 
 from features.balanced_mean import compute_balanced_mean
@@ -7,7 +9,7 @@ from features.depth_unavailability import compute_depth_unavailability
 from features.fatigue import compute_fatigue
 from features.imputed_last_season_mean import compute_imputed_last_season_mean
 from features.imputed_set_piece_order import compute_imputed_set_piece_order
-from features.last_season_std import compute_last_season_std
+from features.last_season_std import compute_last_season_std, get_last_season_stds
 from features.minutes_category import compute_minutes_category
 from features.one_hot_minutes_category import compute_one_hot_minutes_category
 from features.per_90 import compute_per_90
@@ -16,163 +18,387 @@ from features.share import compute_share
 from features.toa_features import compute_toa_features
 from loaders.utils import force_dataframe, get_matches_view, get_teams_view
 
-from .availability import compute_availability
-from .last_season_mean import compute_last_season_mean
-from .overperformance import compute_adjusted_uds_xa, compute_adjusted_uds_xg
+from .availability import compute_availability, get_availability_prior
+from .last_season_mean import compute_last_season_mean, get_last_season_means
+from .overperformance import (
+    compute_adjusted_uds_xa,
+    compute_adjusted_uds_xg,
+    get_overperformance_prior,
+)
 from .record_count import compute_record_count
+from .registry import Feature, get_required_features
 from .relative_strength import compute_relative_strength
 from .rolling_mean import compute_rolling_mean
 
+# Columns and windows of rolling means and last season means
+BASE_COLUMNS = [
+    "goals_scored",
+    "assists",
+    "saves",
+    "clearances_blocks_interceptions",
+    "tackles",
+    "recoveries",
+    "influence",
+    "creativity",
+    "threat",
+    "ict_index",
+    "adjusted_uds_xG",
+    "adjusted_uds_xA",
+]
+BASE_WINDOWS = [3, 5, 10, 20]
+DERIVED_COLUMNS = (
+    BASE_COLUMNS
+    + [f"{c}_per_90" for c in BASE_COLUMNS]
+    + [f"{c}_share" for c in BASE_COLUMNS]
+)
+
+# Columns for minutes and availability are handled separately
+MINUTES_COLUMNS = [
+    "availability",
+    "minutes",
+    "minutes_category_0_minutes",
+    "minutes_category_1_to_59_minutes",
+    "minutes_category_60_plus_minutes",
+]
+MINUTES_WINDOWS = [1, 3, 5, 10, 20, 38]
+STD_WINDOWS = [3, 5, 10, 20]
+
+# Decay of the weight of last season means with each record of this season
+BALANCED_MEAN_DECAY = 0.7
+
+LAST_SEASON_MEAN_COLUMNS = MINUTES_COLUMNS + DERIVED_COLUMNS
+LAST_SEASON_STD_COLUMNS = MINUTES_COLUMNS
+
+# Condition for the "_when_available" features
+AVAILABLE_CONDITION = pl.col("availability") == 100
+
+# Windows of fatigue, in days, and columns to rank squad depth by
+FATIGUE_WINDOWS = [5, 7, 10, 14]
+DEPTH_COLUMNS = ["value", "minutes_rolling_mean_38"]
+DEPTH_RANK_PREFIXES = ["depth_rank", "adjusted_depth_rank", "depth_rank_change"]
+
+# Columns and windows of team rolling means
+MATCH_COLUMNS = ["goals_scored", "goals_conceded", "uds_xG", "uds_xGA"]
+MATCH_WINDOWS = [5, 10, 20, 30, 40]
+
+# Weights of bookmakers when aggregating their odds
+BOOKMAKER_WEIGHTS = {
+    "pinnacle": 1.0,
+    "betfair_ex_uk": 0.5,
+    "smarkets": 0.01,
+    "matchbook": 0.01,
+    "skybet": 0.001,
+}
+
+
+def get_player_feature_registry() -> dict[str, Feature]:
+    """Map each engineered player column to the columns it is built from.
+
+    Columns of availability, record counts, set piece orders and minutes
+    categories are not registered, as they are cheap and always computed.
+    """
+    registry = {}
+    for c in ["uds_xG", "uds_xA"]:
+        actual = "goals_scored" if c == "uds_xG" else "assists"
+        registry[f"{c}_overperformance"] = Feature((c, actual))
+        registry[f"adjusted_{c}"] = Feature((c, f"{c}_overperformance"))
+
+    for c in BASE_COLUMNS:
+        registry[f"{c}_per_90"] = Feature((c, "minutes"))
+        registry[f"{c}_share"] = Feature((c,))
+
+    for suffix, condition_inputs in [("", ()), ("_when_available", ("availability",))]:
+        for c, windows in [
+            *[(c, BASE_WINDOWS) for c in DERIVED_COLUMNS],
+            *[(c, MINUTES_WINDOWS) for c in MINUTES_COLUMNS],
+        ]:
+            for w in windows:
+                registry[f"{c}_rolling_mean_{w}{suffix}"] = Feature(
+                    (c, *condition_inputs)
+                )
+        for c in MINUTES_COLUMNS:
+            for w in STD_WINDOWS:
+                registry[f"{c}_rolling_std_{w}{suffix}"] = Feature(
+                    (c, *condition_inputs)
+                )
+        for c in LAST_SEASON_MEAN_COLUMNS:
+            registry[f"{c}_mean_last_season{suffix}"] = Feature((c, *condition_inputs))
+        for c in LAST_SEASON_STD_COLUMNS:
+            registry[f"{c}_std_last_season{suffix}"] = Feature((c, *condition_inputs))
+
+    for c in DERIVED_COLUMNS:
+        registry[f"imputed_{c}_mean_last_season"] = Feature((f"{c}_mean_last_season",))
+        for w in BASE_WINDOWS:
+            registry[f"balanced_{c}_rolling_mean_{w}"] = Feature(
+                (f"{c}_rolling_mean_{w}", f"imputed_{c}_mean_last_season"),
+            )
+
+    for w in FATIGUE_WINDOWS:
+        registry[f"minutes_sum_{w}_days"] = Feature(("minutes",))
 
-def engineer_player_features(df: pl.LazyFrame) -> pl.LazyFrame:
-    base_columns = [
-        "goals_scored",
-        "assists",
-        "saves",
-        "clearances_blocks_interceptions",
-        "tackles",
-        "recoveries",
-        "influence",
-        "creativity",
-        "threat",
-        "ict_index",
-        "adjusted_uds_xG",
-        "adjusted_uds_xA",
-    ]
-    base_windows = [3, 5, 10, 20]
+    for c in DEPTH_COLUMNS:
+        for prefix in DEPTH_RANK_PREFIXES:
+            registry[f"{prefix}_{c}"] = Feature((c,))
+        registry[f"depth_unavailability_{c}"] = Feature((c,))
+
+    return registry
+
+
+def engineer_player_features(
+    df: pl.LazyFrame,
+    priors: dict[str, pl.DataFrame] | None = None,
+    columns: Collection[str] | None = None,
+) -> pl.LazyFrame:
+    """Engineer player features.
+
+    Priors from `get_player_priors` stand in for the records of earlier seasons, so
+    that the frame only needs to hold records of the current season. If columns are
+    given (e.g. those read by a model), only the features they need are computed.
+    """
+    if priors is None:
+        priors = {}
+
+    required = get_required_features(PLAYER_FEATURES, columns)
+
+    def is_required(column: str) -> bool:
+        return required is None or column in required
 
     # Create extra features from the base columns
-    df = compute_availability(df)
+    df = compute_availability(df, priors.get("availability"))
     df = compute_record_count(df, on="total_points")
     df = compute_imputed_set_piece_order(df)
     df = compute_minutes_category(df)
     df = compute_one_hot_minutes_category(df)
-    df = compute_adjusted_uds_xg(df)
-    df = compute_adjusted_uds_xa(df)
-    df = compute_per_90(df, base_columns)
-    df = compute_share(df, base_columns)
+    if is_required("adjusted_uds_xG") or is_required("uds_xG_overperformance"):
+        df = compute_adjusted_uds_xg(df, priors.get("overperformance"))
+    if is_required("adjusted_uds_xA") or is_required("uds_xA_overperformance"):
+        df = compute_adjusted_uds_xa(df, priors.get("overperformance"))
+    df = compute_per_90(df, [c for c in BASE_COLUMNS if is_required(f"{c}_per_90")])
+    share_columns = [c for c in BASE_COLUMNS if is_required(f"{c}_share")]
+    if share_columns:
+        df = compute_share(df, share_columns)
+
+    # Sort records as rolling features do, so that aggregations sum values in the
+    # same order however many features are computed
+    df = df.sort("kickoff_time")
+    df = _compute_required_rolling_features(df, is_required, priors)
 
-    # Compute rolling means
-    rolling_mean_columns = []
-    rolling_mean_windows = []
+    # Weight each average using the average of the previous season
+    for c in DERIVED_COLUMNS:
+        if is_required(f"imputed_{c}_mean_last_season"):
+            df = compute_imputed_last_season_mean(df, f"{c}_mean_last_season")
 
-    derived_columns = (
-        base_columns
-        + [f"{c}_per_90" for c in base_columns]
-        + [f"{c}_share" for c in base_columns]
+    # Materialize dataframe to avoid OOM issues
+    df = force_dataframe(df)
+
+    for c in DERIVED_COLUMNS:
+        for w in BASE_WINDOWS:
+            if is_required(f"balanced_{c}_rolling_mean_{w}"):
+                df = compute_balanced_mean(
+                    df,
+                    this_season_column=f"{c}_rolling_mean_{w}",
+                    last_season_column=f"imputed_{c}_mean_last_season",
+                    decay=BALANCED_MEAN_DECAY,
+                    default=0.0,
+                )
+
+    # Compute standard deviations over the last season
+    df = _compute_required_last_season_std(df, is_required, priors)
+
+    # Create "_when_available" columns
+    suffix = "_when_available"
+    df = _compute_required_rolling_features(
+        df, is_required, priors, AVAILABLE_CONDITION, suffix
+    )
+    df = _compute_required_last_season_std(
+        df, is_required, priors, AVAILABLE_CONDITION, suffix
     )
 
-    for c in derived_columns:
-        for w in base_windows:
-            rolling_mean_columns.append(c)
-            rolling_mean_windows.append(w)
-
-    # Handle columns for minutes and availability separately
-    minutes_columns = [
-        "availability",
-        "minutes",
-        "minutes_category_0_minutes",
-        "minutes_category_1_to_59_minutes",
-        "minutes_category_60_plus_minutes",
-    ]
-    minutes_windows = [1, 3, 5, 10, 20, 38]
+    # Compute fatigue
+    for w in FATIGUE_WINDOWS:
+        if is_required(f"minutes_sum_{w}_days"):
+            df = compute_fatigue(df, window=w)
+
+    # Compute features for squad depth
+    for c in DEPTH_COLUMNS:
+        if any(is_required(f"{prefix}_{c}") for prefix in DEPTH_RANK_PREFIXES):
+            df = compute_depth_rank(df, c)
+    for c in DEPTH_COLUMNS:
+        if is_required(f"depth_unavailability_{c}"):
+            df = compute_depth_unavailability(df, c)
+
+    return df
+
 
-    for c in minutes_columns:
-        for w in minutes_windows:
-            rolling_mean_columns.append(c)
-            rolling_mean_windows.append(w)
+def _compute_required_rolling_features(
+    df: pl.LazyFrame,
+    is_required: Callable[[str], bool],
+    priors: dict[str, pl.DataFrame],
+    condition: pl.Expr | None = None,
+    suffix: str = "",
+) -> pl.LazyFrame:
+    """Compute the required rolling means and deviations, and last season means."""
+    rolling_mean_columns = []
+    rolling_mean_windows = []
 
-    df = compute_rolling_mean(df, rolling_mean_columns, rolling_mean_windows)
+    for c, windows in [
+        *[(c, BASE_WINDOWS) for c in DERIVED_COLUMNS],
+        *[(c, MINUTES_WINDOWS) for c in MINUTES_COLUMNS],
+    ]:
+        for w in windows:
+            if is_required(f"{c}_rolling_mean_{w}{suffix}"):
+                rolling_mean_columns.append(c)
+                rolling_mean_windows.append(w)
+
+    if rolling_mean_columns:
+        df = compute_rolling_mean(
+            df,
+            rolling_mean_columns,
+            rolling_mean_windows,
+            condition=condition,
+            suffix=suffix,
+        )
 
     # Compute rolling standard deviations (only for minutes)
     rolling_std_columns = []
     rolling_std_windows = []
 
-    for c in minutes_columns:
-        for w in [3, 5, 10, 20]:
-            rolling_std_columns.append(c)
-            rolling_std_windows.append(w)
+    for c in MINUTES_COLUMNS:
+        for w in STD_WINDOWS:
+            if is_required(f"{c}_rolling_std_{w}{suffix}"):
+                rolling_std_columns.append(c)
+                rolling_std_windows.append(w)
+
+    if rolling_std_columns:
+        df = compute_rolling_std(
+            df,
+            rolling_std_columns,
+            rolling_std_windows,
+            condition=condition,
+            suffix=suffix,
+        )
+
+    last_season_mean_columns = [
+        c
+        for c in LAST_SEASON_MEAN_COLUMNS
+        if is_required(f"{c}_mean_last_season{suffix}")
+    ]
+    if last_season_mean_columns:
+        df = compute_last_season_mean(
+            df,
+            last_season_mean_columns,
+            condition=condition,
+            suffix=suffix,
+            prior=priors.get("last_season"),
+        )
 
-    df = compute_rolling_std(df, rolling_std_columns, rolling_std_windows)
+    return df
 
-    # Weight each average using the average of the previous season
-    last_season_mean_columns = minutes_columns + derived_columns
-    df = compute_last_season_mean(df, last_season_mean_columns)
 
-    for c in derived_columns:
-        df = compute_imputed_last_season_mean(df, f"{c}_mean_last_season")
+def _compute_required_last_season_std(
+    df: pl.LazyFrame,
+    is_required: Callable[[str], bool],
+    priors: dict[str, pl.DataFrame],
+    condition: pl.Expr | None = None,
+    suffix: str = "",
+) -> pl.LazyFrame:
+    """Compute the required standard deviations over the last season."""
+    last_season_std_columns = [
+        c
+        for c in LAST_SEASON_STD_COLUMNS
+        if is_required(f"{c}_std_last_season{suffix}")
+    ]
+    if last_season_std_columns:
+        df = compute_last_season_std(
+            df,
+            last_season_std_columns,
+            condition=condition,
+            suffix=suffix,
+            prior=priors.get("last_season"),
+        )
+    return df
 
-    # Materialize dataframe to avoid OOM issues
-    df = force_dataframe(df)
 
-    for c in derived_columns:
-        for w in base_windows:
-            df = compute_balanced_mean(
-                df,
-                this_season_column=f"{c}_rolling_mean_{w}",
-                last_season_column=f"imputed_{c}_mean_last_season",
-                decay=0.7,
-                default=0.0,
-            )
+def get_player_priors(
+    history: pl.DataFrame, season: int, columns: Collection[str] | None = None
+) -> dict[str, pl.DataFrame]:
+    """Reduce the records of earlier seasons to the state needed by a season.
 
-    # Compute standard deviations over the last season
-    last_season_std_columns = minutes_columns
-    df = compute_last_season_std(df, last_season_std_columns)
+    If columns are given, only the last season stats they need are aggregated.
+    """
+    history = force_dataframe(history).filter(pl.col("season") < season)
+    if history.is_empty():
+        return {}
 
-    # Create "_when_available" columns (for minutes)
-    available_condition = pl.col("availability") == 100
-    df = compute_rolling_mean(
-        df,
-        rolling_mean_columns,
-        rolling_mean_windows,
-        condition=available_condition,
-        suffix="_when_available",
-    )
-    df = compute_rolling_std(
-        df,
-        rolling_std_columns,
-        rolling_std_windows,
-        condition=available_condition,
-        suffix="_when_available",
+    required = get_required_features(PLAYER_FEATURES, columns)
+
+    def get_columns(columns: list[str], alias: str) -> list[str]:
+        return [c for c in columns if required is None or alias.format(c) in required]
+
+    # Last season stats are aggregated over engineered records
+    mean_columns = get_columns(LAST_SEASON_MEAN_COLUMNS, "{}_mean_last_season")
+    std_columns = get_columns(LAST_SEASON_STD_COLUMNS, "{}_std_last_season")
+    available_mean_columns = get_columns(
+        LAST_SEASON_MEAN_COLUMNS, "{}_mean_last_season_when_available"
     )
-    df = compute_last_season_mean(
-        df,
-        last_season_mean_columns,
-        condition=available_condition,
-        suffix="_when_available",
+    available_std_columns = get_columns(
+        LAST_SEASON_STD_COLUMNS, "{}_std_last_season_when_available"
     )
-    df = compute_last_season_std(
-        df,
-        last_season_std_columns,
-        condition=available_condition,
-        suffix="_when_available",
+    engineered = force_dataframe(
+        engineer_player_features(
+            history,
+            columns=mean_columns
+            + std_columns
+            + available_mean_columns
+            + available_std_columns,
+        )
     )
+    last_season = pl.concat(
+        [
+            engineered.select(pl.col("season") + 1, "code").unique(),
+            get_last_season_means(engineered, mean_columns),
+            get_last_season_stds(engineered, std_columns),
+            get_last_season_means(
+                engineered,
+                available_mean_columns,
+                condition=AVAILABLE_CONDITION,
+                suffix="_when_available",
+            ),
+            get_last_season_stds(
+                engineered,
+                available_std_columns,
+                condition=AVAILABLE_CONDITION,
+                suffix="_when_available",
+            ),
+        ],
+        how="align",
+    ).filter(pl.col("season") == season)
+
+    return {
+        "availability": get_availability_prior(history),
+        "overperformance": get_overperformance_prior(history),
+        "last_season": last_season,
+    }
 
-    # Compute fatigue
-    for w in [5, 7, 10, 14]:
-        df = compute_fatigue(df, window=w)
 
-    # Compute features for squad depth
-    df = compute_depth_rank(df, "value")
-    df = compute_depth_rank(df, "minutes_rolling_mean_38")
-    df = compute_depth_unavailability(df, "value")
-    df = compute_depth_unavailability(df, "minutes_rolling_mean_38")
+PLAYER_FEATURES = get_player_feature_registry()
 
-    return df
 
+def engineer_match_features(
+    matches: pl.LazyFrame, condition: pl.Expr | None = None
+) -> pl.LazyFrame:
+    """Engineer match features, optionally only for matches meeting a condition.
 
-def engineer_match_features(matches: pl.LazyFrame) -> pl.LazyFrame:
+    Team level features always use all matches, as they look back across seasons.
+    """
     # Compute team level features
     teams = get_teams_view(matches)
 
-    base_columns = ["goals_scored", "goals_conceded", "uds_xG", "uds_xGA"]
-    base_windows = [5, 10, 20, 30, 40]
-
     rolling_mean_columns = []
     rolling_mean_windows = []
 
-    for column in base_columns:
-        for window in base_windows:
+    for column in MATCH_COLUMNS:
+        for window in MATCH_WINDOWS:
             rolling_mean_columns.append(column)
             rolling_mean_windows.append(window)
 
@@ -184,20 +410,14 @@ def engineer_match_features(matches: pl.LazyFrame) -> pl.LazyFrame:
         over=["code"],
     )
 
-    teams = compute_last_season_mean(teams, base_columns)
+    teams = compute_last_season_mean(teams, MATCH_COLUMNS)
 
     # Add match level features
     matches = get_matches_view(teams, extra_fixed_columns=["toa_bookmakers"])
+    if condition is not None:
+        matches = matches.filter(condition)
     matches = compute_relative_strength(matches)
     matches = compute_clb_features(matches)
-
-    bookmaker_weights = {
-        "pinnacle": 1.0,
-        "betfair_ex_uk": 0.5,
-        "smarkets": 0.01,
-        "matchbook": 0.01,
-        "skybet": 0.001,
-    }
-    matches = compute_toa_features(matches, bookmaker_weights)
+    matches = compute_toa_features(matches, BOOKMAKER_WEIGHTS)
 
     return matches
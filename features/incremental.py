@@ -0,0 +1,88 @@
+from collections.abc import Collection
+
+import polars as pl
+
+from features.engineer_features import (
+    engineer_match_features,
+    engineer_player_features,
+    get_player_priors,
+)
+from features.store import FeatureStore
+from loaders.cache import get_directory_fingerprint
+from loaders.constants import DATA_DIR
+from loaders.upcoming import get_upcoming_condition
+from loaders.utils import force_dataframe
+
+
+class IncrementalFeatures:
+    """Engineer features for upcoming gameweeks, keeping state between calls.
+
+    Records of earlier seasons are reduced to per-player priors once per season,
+    so each call only engineers player records of the current season, and match
+    level features of upcoming matches. The results are the upcoming records of
+    `engineer_player_features` and `engineer_match_features`.
+
+    With a feature store, results are shared with other runs on the same data, which
+    must then be loaded from the data directory. With columns (e.g. those read by a
+    model), only the player features they need are computed.
+    """
+
+    def __init__(
+        self,
+        store: FeatureStore | None = None,
+        columns: Collection[str] | None = None,
+    ):
+        self.season: int | None = None
+        self.priors: dict[str, pl.DataFrame] = {}
+        self.store = store
+        self.columns = None if columns is None else sorted(set(columns))
+
+    def engineer(
+        self,
+        players: pl.LazyFrame | pl.DataFrame,
+        matches: pl.LazyFrame | pl.DataFrame,
+        season: int,
+        upcoming_gameweeks: list[int],
+    ) -> tuple[pl.DataFrame, pl.DataFrame]:
+        """Return player and match features for the upcoming gameweeks."""
+        players = force_dataframe(players)
+        matches = force_dataframe(matches)
+        if self.store is None:
+            return self._engineer(players, matches, season, upcoming_gameweeks)
+
+        tables = self.store.get(
+            "upcoming",
+            get_directory_fingerprint(DATA_DIR),
+            lambda: dict(
+                zip(
+                    ["players", "matches"],
+                    self._engineer(players, matches, season, upcoming_gameweeks),
+                    strict=True,
+                )
+            ),
+            seasons=players.get_column("season").unique().sort().to_list(),
+            season=season,
+            upcoming_gameweeks=upcoming_gameweeks,
+            player_columns=self.columns,
+        )
+        return tables["players"], tables["matches"]
+
+    def _engineer(
+        self,
+        players: pl.DataFrame,
+        matches: pl.DataFrame,
+        season: int,
+        upcoming_gameweeks: list[int],
+    ) -> tuple[pl.DataFrame, pl.DataFrame]:
+        if season != self.season:
+            self.priors = get_player_priors(players, season, self.columns)
+            self.season = season
+
+        upcoming = get_upcoming_condition(season, upcoming_gameweeks)
+        players = players.filter(pl.col("season") == season)
+        players = engineer_player_features(players, self.priors, self.columns)
+        players = force_dataframe(players).filter(upcoming)
+        matches = engineer_match_features(matches, condition=upcoming)
+        matches = force_dataframe(matches)
+
+        return players, matches
@@ -6,8 +6,31 @@ def compute_last_season_std(
     columns: list[str],
     condition: pl.Expr | None = None,
     suffix: str = "",
+    prior: pl.DataFrame | None = None,
 ):
-    """Compute std stats over the each player's previous season."""
+    """Compute std stats over the each player's previous season.
+
+    A prior from `get_last_season_stds` provides the stds of seasons that are no
+    longer in the frame.
+    """
+    if prior is None:
+        mapping = get_last_season_stds(df, columns, condition, suffix)
+    else:
+        aliases = [f"{c}_std_last_season{suffix}" for c in columns]
+        mapping = prior.select(["season", "code", *aliases])
+        mapping = mapping.lazy() if isinstance(df, pl.LazyFrame) else mapping
+    # Map values to the original frame
+    df = df.join(mapping, on=["season", "code"], how="left")
+    return df
+
+
+def get_last_season_stds(
+    df: pl.LazyFrame,
+    columns: list[str],
+    condition: pl.Expr | None = None,
+    suffix: str = "",
+) -> pl.LazyFrame:
+    """Get the std stats of each player, keyed by the following season."""
     if condition is None:
         condition = pl.lit(True)
     # Compute player stds for each season
@@ -18,7 +41,4 @@ def compute_last_season_std(
         .agg([pl.col(c).std().alias(f"{c}_std_last_season{suffix}") for c in columns])
     )
     # Increment the season column
-    mapping = mapping.with_columns(pl.col("season") + 1)
-    # Map values to the original frame
-    df = df.join(mapping, on=["season", "code"], how="left")
-    return df
+    return mapping.with_columns(pl.col("season") + 1)
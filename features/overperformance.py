@@ -6,27 +6,49 @@ def _compute_overperformance(
     expected_col_name: str,
     actual_col_name: str,
     stability: int = 20,
+    prior: pl.DataFrame | None = None,
 ):
     """Computes a ratio of actual to expected values for each player, adjusted for small
-    sample sizes."""
+    sample sizes.
+
+    A prior from `get_overperformance_prior` continues the sums from records that
+    are no longer in the frame."""
     df = df.sort(["code", "kickoff_time"])
 
     # Compute the long term ratio of actual (e.g. goals scored) to expected values
     # (e.g. xG) for each player
-    df = df.with_columns(
+    values = df.select(
+        pl.col("code"),
+        pl.col(actual_col_name).fill_null(0),
+        pl.col(expected_col_name).fill_null(0),
+        pl.lit(False).alias("_prior"),
+    )
+    if prior is not None:
+        # Start each player's sums from their prior sums
+        prior = prior.select(
+            pl.col("code"),
+            pl.col(actual_col_name),
+            pl.col(expected_col_name),
+            pl.lit(True).alias("_prior"),
+        )
+        prior = prior.lazy() if isinstance(values, pl.LazyFrame) else prior
+        values = pl.concat([prior, values], how="vertical_relaxed")
+        values = values.sort("code", maintain_order=True)
+    sums = values.select(
         pl.col(actual_col_name)
-        .fill_null(0)
         .cum_sum()
         .shift(1, fill_value=0)
         .over("code")
         .alias("_cum_sum_actual"),
         pl.col(expected_col_name)
-        .fill_null(0)
         .cum_sum()
         .shift(1, fill_value=0)
         .over("code")
         .alias("_cum_sum_expected"),
+        pl.col("_prior"),
     )
+    sums = sums.filter(~pl.col("_prior")).drop("_prior")
+    df = pl.concat([df, sums], how="horizontal")
 
     df = df.with_columns(
         pl.when(pl.col("_cum_sum_expected") > 0.01)
@@ -60,26 +82,41 @@ def _compute_overperformance(
     return df
 
 
-def compute_uds_xg_overperformance(df):
-    return _compute_overperformance(df, "uds_xG", "goals_scored", stability=20)
+def compute_uds_xg_overperformance(df, prior: pl.DataFrame | None = None):
+    return _compute_overperformance(
+        df, "uds_xG", "goals_scored", stability=20, prior=prior
+    )
 
 
-def compute_uds_xa_overperformance(df):
-    return _compute_overperformance(df, "uds_xA", "assists", stability=20)
+def compute_uds_xa_overperformance(df, prior: pl.DataFrame | None = None):
+    return _compute_overperformance(df, "uds_xA", "assists", stability=20, prior=prior)
+
+
+def get_overperformance_prior(df: pl.DataFrame) -> pl.DataFrame:
+    """Get the sums of actual and expected values of each player."""
+    # Sums are accumulated in order, so that continuing them gives the same results
+    return (
+        df.sort(["code", "kickoff_time"])
+        .group_by("code", maintain_order=True)
+        .agg(
+            pl.col(column).fill_null(0).cum_sum().last()
+            for column in ["goals_scored", "uds_xG", "assists", "uds_xA"]
+        )
+    )
 
 
-def compute_adjusted_uds_xg(df):
+def compute_adjusted_uds_xg(df, prior: pl.DataFrame | None = None):
     """Adjust the xG for each player based on how their long term overperformance."""
-    df = compute_uds_xg_overperformance(df)
+    df = compute_uds_xg_overperformance(df, prior)
     df = df.with_columns(
         (pl.col("uds_xG") * pl.col("uds_xG_overperformance")).alias("adjusted_uds_xG")
     )
     return df
 
 
-def compute_adjusted_uds_xa(df):
+def compute_adjusted_uds_xa(df, prior: pl.DataFrame | None = None):
     """Adjust the xA for each player based on how their long term overperformance."""
-    df = compute_uds_xa_overperformance(df)
+    df = compute_uds_xa_overperformance(df, prior)
     df = df.with_columns(
         (pl.col("uds_xA") * pl.col("uds_xA_overperformance")).alias("adjusted_uds_xA")
     )
@@ -0,0 +1,31 @@
+from collections.abc import Collection
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Feature:
+    """An engineered column, with the columns it is computed from."""
+
+    inputs: tuple[str, ...] = ()
+
+
+def get_required_features(
+    registry: dict[str, Feature], columns: Collection[str] | None
+) -> set[str] | None:
+    """Get the registered columns needed to compute the requested columns.
+
+    Columns that are not registered are treated as inputs, and end the search.
+    Without requested columns, every registered column is needed.
+    """
+    if columns is None:
+        return None
+
+    required = set()
+    stack = [column for column in columns if column in registry]
+    while stack:
+        column = stack.pop()
+        if column in required:
+            continue
+        required.add(column)
+        stack.extend(c for c in registry[column].inputs if c in registry)
+    return required
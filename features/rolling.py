@@ -1,6 +1,7 @@
 from collections.abc import Sequence
 from typing import Literal
 
+import numpy as np
 import polars as pl
 
 from loaders.utils import force_dataframe
@@ -15,54 +16,160 @@ def _compute_rolling_stat_with_nulls_ignored(
     condition: pl.Expr | None = None,
     suffix: str = "",
 ) -> pl.LazyFrame:
-    """Calculate rolling means or stds ignoring null values."""
+    """Calculate rolling means or stds ignoring null values.
+
+    Each value is the statistic over the last `window_size` non-null values that
+    meet the condition, up to but excluding the current record.
+    """
+    if stat not in ("mean", "std"):
+        raise ValueError(f"Unsupported stat: {stat}")
+
     df = force_dataframe(df)
 
     # Sort rows for forward-filling
     df = df.sort("kickoff_time")
 
-    # Add a temporary index column (to skip null values)
-    df = df.with_row_index("index")
-
     if condition is None:
         condition = pl.lit(True)
 
-    results = []
+    # Order the records by group, keeping them in order of kickoff time
+    order = (
+        df.select(*over)
+        .with_row_index("index")
+        .sort(over, maintain_order=True, nulls_last=True)
+    )
+    groups = order.select(pl.struct(over).rle_id()).to_series().to_numpy()
+    order = order.get_column("index").to_numpy()
+
+    # Windows requested for each column, in order of first request
+    windows: dict[str, list[int]] = {}
     for column, window_size in zip(columns, window_sizes, strict=True):
-        alias = _alias(column, window_size, stat, suffix)
-
-        # Filter for non-null values meeting the condition (if any)
-        subset = df.filter(pl.col(column).is_not_null() & condition)
-        subset = subset.select(["index", *over, column])
-
-        # Apply the specific rolling function
-        col_expr = pl.col(column)
-        if stat == "mean":
-            rolled = col_expr.rolling_mean(window_size=window_size, min_samples=1)
-        elif stat == "std":
-            rolled = col_expr.rolling_std(window_size=window_size, min_samples=1)
-        else:
-            raise ValueError(f"Unsupported stat: {stat}")
-
-        subset = subset.with_columns(rolled.over(over).alias(alias))
-        results.append(subset.select(["index", alias]))
-
-    # Join all results back to the original frame
-    for result in results:
-        df = df.join(result, on="index", how="left")
-
-    # Shift and forward-fill to avoid data leakage
-    expressions = []
-    for column, window_size in zip(columns, window_sizes, strict=True):
-        alias = _alias(column, window_size, stat, suffix)
-        expressions.append(pl.col(alias).shift(1).forward_fill().over(over))
+        windows.setdefault(column, []).append(window_size)
+
+    # Columns with the same null mask share their counts and group boundaries
+    masks = df.select(
+        (pl.col(column).is_not_null() & condition).fill_null(False).alias(column)
+        for column in windows
+    )
+    shared: dict[bytes, list[str]] = {}
+    for column in windows:
+        mask = masks.get_column(column).to_numpy()[order]
+        shared.setdefault(np.packbits(mask).tobytes(), []).append(column)
+
+    results = {}
+    for group_columns in shared.values():
+        mask = masks.get_column(group_columns[0]).to_numpy()[order]
+        values = df.select(
+            pl.col(group_columns).cast(pl.Float64).fill_null(0.0)
+        ).to_numpy()[order]
+        rolled = _roll_masked(
+            values, mask, groups, [windows[c] for c in group_columns], stat
+        )
+        for column, column_rolled in zip(group_columns, rolled, strict=True):
+            for window_size, (result, valid) in zip(
+                windows[column], column_rolled, strict=True
+            ):
+                # Restore the original order of the records
+                restored = np.empty_like(result)
+                restored[order] = result
+                is_valid = np.empty_like(valid)
+                is_valid[order] = valid
+                alias = _alias(column, window_size, stat, suffix)
+                results[alias] = pl.select(
+                    pl.when(pl.Series(is_valid)).then(pl.Series(restored))
+                ).to_series()
+
+    aliases = [
+        _alias(column, window_size, stat, suffix)
+        for column, window_size in zip(columns, window_sizes, strict=True)
+    ]
+    df = df.with_columns(
+        results[alias].alias(alias) for alias in dict.fromkeys(aliases)
+    )
 
-    df = df.with_columns(expressions)
+    return df
 
-    # Drop the temporary index column
-    df = df.drop("index")
 
-    return df
+def _roll_masked(
+    values: np.ndarray,
+    mask: np.ndarray,
+    groups: np.ndarray,
+    windows: list[list[int]],
+    stat: str,
+) -> list[list[tuple[np.ndarray, np.ndarray]]]:
+    """Roll columns over the masked records of contiguous groups in one pass.
+
+    Window sums come from cumulative sums over the masked records. Each record
+    then takes the statistic of the last masked record before it in its group.
+    """
+    positions = np.flatnonzero(mask)
+    masked_groups = groups[positions]
+    # Position of each masked record's group start among the masked records
+    first = np.searchsorted(masked_groups, masked_groups, side="left")
+    end = np.arange(1, len(positions) + 1)
+
+    # Index of the last masked record before each record, within its group
+    previous = np.cumsum(mask) - mask - 1
+    valid = previous >= 0
+    valid[valid] = masked_groups[previous[valid]] == groups[valid]
+    previous = np.where(valid, previous, 0)
+
+    # Non-finite values are rolled directly, as sums would carry them onwards
+    masked = values[positions]
+    finite = np.isfinite(masked)
+    non_finite = np.concatenate([[0], np.cumsum(~finite.all(axis=1))])
+
+    # Shift values by the first value of their group, to limit cancellation
+    masked_finite = np.where(finite, masked, 0.0)
+    base = masked_finite[first]
+    shifted = masked_finite - base
+    # Sums restart in each group, so that results do not depend on other groups
+    sums = _cum_sum_by_group(shifted, masked_groups)
+    squares = _cum_sum_by_group(shifted**2, masked_groups)
+
+    rolled = []
+    for j, column_windows in enumerate(windows):
+        column_rolled = []
+        for window_size in column_windows:
+            start = np.maximum(end - window_size, first)
+            count = end - start
+            # Windows reaching the start of a group take its whole sum
+            restarted = start == first
+            total = sums[end, j] - np.where(restarted, 0.0, sums[start, j])
+            if stat == "mean":
+                result = total / count + base[:, j]
+                defined = np.ones(len(positions), dtype=bool)
+            else:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    square_total = squares[end, j] - np.where(
+                        restarted, 0.0, squares[start, j]
+                    )
+                    variance = square_total - total**2 / count
+                    result = np.sqrt(np.maximum(variance, 0.0) / (count - 1))
+                # The deviation of a single value is undefined
+                defined = count > 1
+            for i in np.flatnonzero((non_finite[end] > non_finite[start]) & defined):
+                window = masked[start[i] : end[i], j]
+                with np.errstate(invalid="ignore"):
+                    result[i] = window.mean() if stat == "mean" else window.std(ddof=1)
+
+            if len(positions) == 0:
+                column_rolled.append((np.zeros(len(mask)), np.zeros(len(mask), bool)))
+            else:
+                column_rolled.append((result[previous], valid & defined[previous]))
+        rolled.append(column_rolled)
+    return rolled
+
+
+def _cum_sum_by_group(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """Sum values cumulatively within groups, with a leading row of zeros."""
+    sums = (
+        pl.DataFrame(values, schema=[str(i) for i in range(values.shape[1])])
+        .with_columns(pl.Series("group", groups))
+        .select(pl.exclude("group").cum_sum().over("group"))
+        .to_numpy()
+    )
+    return np.vstack([np.zeros((1, values.shape[1])), sums])
 
 
 def _alias(column: str, window_size: int, stat: str, suffix: str) -> str:
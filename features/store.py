@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import polars as pl
+
+import features.engineer_features as engineer_features
+from loaders.cache import FINGERPRINT_FILENAME, is_fresh, write_tables
+from loaders.constants import CACHE_DIR
+from loaders.schemas import SCHEMA_VERSION
+from loaders.utils import force_dataframe
+
+FEATURE_STORE_DIR = CACHE_DIR / "features"
+
+# Source files whose code determines the engineered features, including the loaders
+# that build the frames they are engineered from
+FEATURE_SOURCES = [
+    *sorted(Path(engineer_features.__file__).parent.glob("*.py")),
+    *[
+        Path(engineer_features.__file__).parent.parent / f"loaders/{name}.py"
+        for name in [
+            "asof",
+            "clubelo",
+            "fpl",
+            "keys",
+            "merged",
+            "schemas",
+            "theoddsapi",
+            "understat",
+            "upcoming",
+            "utils",
+        ]
+    ],
+]
+
+
+class FeatureStore:
+    """Persist engineered feature tables as Parquet files, keyed by their sources.
+
+    Entries are directories of tables, named after a hash of the fingerprint of
+    the source data, the feature code, and the feature parameters. The input
+    frames themselves are never hashed. When the store grows beyond its budget,
+    the least recently used entries are deleted.
+    """
+
+    def __init__(self, directory: Path = FEATURE_STORE_DIR, max_bytes: int = 2**32):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.version = get_code_fingerprint()
+
+    def get(
+        self,
+        name: str,
+        fingerprint: str,
+        compute: Callable[[], dict[str, pl.DataFrame | pl.LazyFrame]],
+        columns: dict[str, list[str]] | None = None,
+        **parameters,
+    ) -> dict[str, pl.DataFrame]:
+        """Return stored tables for the sources, computing and storing them on a miss.
+
+        The fingerprint identifies the source data (e.g. that of the data directory,
+        from `get_directory_fingerprint`). Tables are read with memory mapping, and
+        tables named in `columns` only for the columns given. Extra parameters (e.g.
+        upcoming gameweeks) are part of the key.
+        """
+        key = self.get_key(name, fingerprint, **parameters)
+        directory = self.directory / key
+        if is_fresh(directory, key):
+            _touch(directory)
+        else:
+            tables = {
+                table_name: force_dataframe(table)
+                for table_name, table in compute().items()
+            }
+            write_tables(directory, tables, key)
+            _touch(directory)
+            self.evict(keep=key)
+
+        columns = columns or {}
+        return {
+            path.stem: pl.read_parquet(
+                path, columns=columns.get(path.stem), memory_map=True
+            )
+            for path in sorted(directory.glob("*.parquet"))
+        }
+
+    def get_key(self, name: str, fingerprint: str, **parameters) -> str:
+        """Hash the source fingerprint, feature code and parameters of an entry."""
+        digest = hashlib.sha256()
+        digest.update(f"{name}:{self.version}\n{fingerprint}\n".encode())
+        digest.update(json.dumps(parameters, sort_keys=True, default=str).encode())
+        return f"{name}-{digest.hexdigest()[:32]}"
+
+    def size(self) -> int:
+        """Return the total size of all entries in bytes."""
+        return sum(_get_size(entry) for entry in self._get_entries())
+
+    def evict(self, keep: str | None = None):
+        """Delete the least recently used entries until the store fits its budget."""
+        entries = sorted(
+            self._get_entries(),
+            key=lambda entry: (entry / FINGERPRINT_FILENAME).stat().st_mtime_ns,
+        )
+        total = sum(_get_size(entry) for entry in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            if entry.name == keep:
+                continue
+            total -= _get_size(entry)
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def clear(self):
+        """Delete all entries."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _get_entries(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        return [
+            entry
+            for entry in self.directory.iterdir()
+            if (entry / FINGERPRINT_FILENAME).exists()
+        ]
+
+
+def get_code_fingerprint() -> str:
+    """Fingerprint the feature and loader code, its parameters, and versions.
+
+    Versions are those of the Polars library and of the loaded data schema.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"polars:{pl.__version__}\n".encode())
+    digest.update(f"schema:{SCHEMA_VERSION}\n".encode())
+    for path in FEATURE_SOURCES:
+        digest.update(f"{path.name}:".encode())
+        digest.update(path.read_bytes())
+    parameters = {
+        "base_columns": engineer_features.BASE_COLUMNS,
+        "base_windows": engineer_features.BASE_WINDOWS,
+        "minutes_columns": engineer_features.MINUTES_COLUMNS,
+        "minutes_windows": engineer_features.MINUTES_WINDOWS,
+        "std_windows": engineer_features.STD_WINDOWS,
+        "balanced_mean_decay": engineer_features.BALANCED_MEAN_DECAY,
+        "match_columns": engineer_features.MATCH_COLUMNS,
+        "match_windows": engineer_features.MATCH_WINDOWS,
+        "bookmaker_weights": engineer_features.BOOKMAKER_WEIGHTS,
+    }
+    digest.update(json.dumps(parameters, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+def _touch(directory: Path):
+    """Mark an entry as recently used.
+
+    The time is set explicitly, as file systems may only update it every few
+    milliseconds, which would tie entries used in quick succession.
+    """
+    now = time.time_ns()
+    os.utime(directory / FINGERPRINT_FILENAME, ns=(now, now))
+
+
+def _get_size(directory: Path) -> int:
+    return sum(path.stat().st_size for path in directory.iterdir() if path.is_file())
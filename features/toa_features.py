@@ -1,379 +1,333 @@
-from collections import defaultdict
-
 import numpy as np
 import polars as pl
-from scipy.optimize import minimize
 from scipy.stats import poisson
 
 from loaders.utils import force_dataframe
 
+# Coefficients of home goals, away goals and the point of each outcome. An outcome
+# covers the scorelines where their weighted sum is positive (or zero, if exact).
+OUTCOME_COEFFICIENTS = {
+    ("h2h", "home"): (1, -1, 0, False),
+    ("h2h", "away"): (-1, 1, 0, False),
+    ("h2h", "draw"): (1, -1, 0, True),
+    ("spreads", "home"): (1, -1, 1, False),
+    ("spreads", "away"): (-1, 1, 1, False),
+    ("totals", "Over"): (1, 1, -1, False),
+    ("totals", "Under"): (-1, -1, 1, False),
+}
+
 
 def compute_toa_features(
     matches: pl.LazyFrame | pl.DataFrame, bookmaker_weights: dict
 ) -> pl.LazyFrame:
     matches = force_dataframe(matches)
 
-    predictions = []
-    for match in matches.to_dicts():
-        bookmakers = match["toa_bookmakers"]
-        if not bookmakers:
-            continue
-
-        home_team = match["team_h_toa_name"]
-        away_team = match["team_a_toa_name"]
-
-        # Calculate implied probabilities for each market
-        markets = defaultdict(list)
-        for bookmaker in bookmakers:
-            if bookmaker["key"] not in bookmaker_weights:
-                continue
-
-            for market in bookmaker["markets"]:
-                if market["key"] == "h2h":
-                    data = extract_h2h_probs(market, home_team, away_team)
-                elif market["key"] == "spreads":
-                    data = extract_spreads_probs(market, home_team, away_team)
-                elif market["key"] == "totals":
-                    data = extract_totals_probs(market)
-                else:
-                    continue
-
-                markets[market["key"]].append(
-                    {
-                        "bookmaker": bookmaker["key"],
-                        "type": market["key"],
-                        "outcomes": data,
-                    }
-                )
-
-        if not markets:
-            continue
-
-        # Aggregate market probabilities across bookmakers
-        aggregated_markets = dict()
-        for key in markets:
-            if key == "h2h":
-                aggregated_markets[key] = aggregate_h2h_probs(
-                    markets[key], bookmaker_weights
-                )
-
-            elif key == "spreads":
-                aggregated_markets[key] = aggregate_spreads_probs(
-                    markets[key], bookmaker_weights
-                )
-            elif key == "totals":
-                aggregated_markets[key] = aggregate_totals_probs(
-                    markets[key], bookmaker_weights
-                )
-            else:
-                continue
-
-        # Predict expected scores using the aggregated probabilities
-        target_probs = []
-        for key, data in aggregated_markets.items():
-            target_probs.append({"type": key, "data": data})
-
-        result = estimate_goals(target_probs, max_goals=10)
-        if result.success:
-            predicted_home_goals, predicted_away_goals = result.x
-        else:
-            predicted_home_goals = predicted_away_goals = None
-
-        # Store the predictions for goals and win probabilities
-        row = {
-            "season": match["season"],
-            "fixture_id": match["fixture_id"],
-            "team_h_toa_win_prob": None,
-            "team_a_toa_win_prob": None,
-            "team_h_toa_expected_goals": predicted_home_goals,
-            "team_a_toa_expected_goals": predicted_away_goals,
-        }
-
-        for value in aggregated_markets.get("h2h", []):
-            if value["side"] == "home":
-                row["team_h_toa_win_prob"] = value["prob"]
-            elif value["side"] == "away":
-                row["team_a_toa_win_prob"] = value["prob"]
-
-        predictions.append(row)
-
-    toa_predictions = pl.DataFrame(predictions)
-
-    # Merge predictions back into the original matches DataFrame
-    matches = matches.join(
-        toa_predictions.select(
-            "season",
-            "fixture_id",
-            "team_h_toa_expected_goals",
-            "team_a_toa_expected_goals",
-            "team_h_toa_win_prob",
-            "team_a_toa_win_prob",
-        ),
-        on=["season", "fixture_id"],
-        how="left",
-    )
-
-    return matches.lazy()
-
-
-def extract_h2h_probs(market: dict, home_team: str, away_team: str) -> dict:
-    home_odds = away_odds = draw_odds = None
-    for outcome in market["outcomes"]:
-        if outcome["name"] == home_team:
-            home_odds = outcome["price"]
-        elif outcome["name"] == away_team:
-            away_odds = outcome["price"]
-        elif outcome["name"] == "Draw":
-            draw_odds = outcome["price"]
-
-    if home_odds is None or away_odds is None or draw_odds is None:
-        raise ValueError("Missing odds for one of the outcomes in h2h market.")
-
-    home_prob, away_prob, draw_prob = calculate_implied_probs(
-        home_odds, away_odds, draw_odds
-    )
-    data = [
-        {"side": "home", "prob": home_prob},
-        {"side": "away", "prob": away_prob},
-        {"side": "draw", "prob": draw_prob},
-    ]
-    return data
-
-
-def extract_spreads_probs(market: dict, home_team: str, away_team: str) -> dict:
-    probs = calculate_implied_probs(
-        *[outcome["price"] for outcome in market["outcomes"]]
-    )
-
-    data = []
-    for outcome, prob in zip(market["outcomes"], probs, strict=True):
-        if outcome["name"] == home_team:
-            side = "home"
-        elif outcome["name"] == away_team:
-            side = "away"
-        else:
-            raise ValueError("Unexpected outcome name in spreads market.")
-
-        data.append({"side": side, "point": outcome["point"], "prob": prob})
-
-    return data
-
-
-def extract_totals_probs(market: dict) -> dict:
-    probs = calculate_implied_probs(
-        *[outcome["price"] for outcome in market["outcomes"]]
+    # Aggregate market probabilities across bookmakers, and predict expected scores
+    # of all matches from them at once
+    outcomes = get_market_probs(matches, bookmaker_weights)
+    goals = estimate_goals(outcomes, matches.height, max_goals=10)
+
+    # Store the win probabilities
+    win_probs = (
+        outcomes.filter(pl.col("type") == "h2h")
+        .group_by("match")
+        .agg(
+            pl.col("prob")
+            .filter(pl.col("side") == "home")
+            .first()
+            .alias("team_h_toa_win_prob"),
+            pl.col("prob")
+            .filter(pl.col("side") == "away")
+            .first()
+            .alias("team_a_toa_win_prob"),
+        )
     )
 
-    data = []
-    for outcome, prob in zip(market["outcomes"], probs, strict=True):
-        data.append(
-            {
-                "name": outcome["name"],
-                "point": outcome["point"],
-                "prob": prob,
-            }
+    matches = (
+        matches.with_row_index("match")
+        .with_columns(
+            pl.Series("team_h_toa_expected_goals", goals[:, 0], nan_to_null=True),
+            pl.Series("team_a_toa_expected_goals", goals[:, 1], nan_to_null=True),
         )
+        .join(win_probs, on="match", how="left", maintain_order="left")
+        .drop("match")
+    )
 
-    return data
-
-
-def aggregate_h2h_probs(bookmakers: list[dict], bookmaker_weights: dict) -> list[dict]:
-    groups = defaultdict(list)
-    for bookmaker in bookmakers:
-        for outcome in bookmaker["outcomes"]:
-            groups[outcome["side"]].append(
-                {"bookmaker": bookmaker["bookmaker"], "prob": outcome["prob"]}
-            )
+    return matches.lazy()
 
-    aggregated = []
-    for side, outcomes in groups.items():
-        aggregated.append(
-            {"side": side, "prob": weight_probs(outcomes, bookmaker_weights)}
-        )
 
-    return aggregated
-
-
-def aggregate_spreads_probs(
-    bookmakers: list[dict], bookmaker_weights: dict | defaultdict
-) -> list[dict]:
-    groups = defaultdict(list)
-    for bookmaker in bookmakers:
-        for outcome in bookmaker["outcomes"]:
-            key = (outcome["side"], outcome["point"])
-            groups[key].append(
-                {"bookmaker": bookmaker["bookmaker"], "prob": outcome["prob"]}
-            )
-
-    aggregated = []
-    for (side, point), outcomes in groups.items():
-        aggregated.append(
-            {
-                "side": side,
-                "point": point,
-                "prob": weight_probs(outcomes, bookmaker_weights),
-            }
+def get_market_probs(matches: pl.DataFrame, bookmaker_weights: dict) -> pl.DataFrame:
+    """Get the implied probabilities of each outcome, averaged across bookmakers.
+
+    Returns a row per match (by its index), market type, side and point, with
+    outcomes in the order in which bookmakers first list them.
+    """
+    # Flatten the outcomes of each market of the weighted bookmakers
+    df = matches.select(
+        pl.int_range(pl.len(), dtype=pl.UInt32).alias("match"),
+        pl.col("team_h_toa_name").cast(pl.String).alias("home_team"),
+        pl.col("team_a_toa_name").cast(pl.String).alias("away_team"),
+        pl.col("toa_bookmakers").alias("bookmakers"),
+    ).explode("bookmakers")
+    df = (
+        df.select(
+            pl.col("match", "home_team", "away_team"),
+            pl.col("bookmakers").struct.field("key").alias("bookmaker"),
+            pl.col("bookmakers").struct.field("markets"),
         )
-
-    return aggregated
-
-
-def aggregate_totals_probs(
-    bookmakers: list[dict], bookmaker_weights: dict | defaultdict
-) -> list[dict]:
-    groups = defaultdict(list)
-    for bookmaker in bookmakers:
-        for outcome in bookmaker["outcomes"]:
-            key = (outcome["name"], outcome["point"])
-            groups[key].append(
-                {"bookmaker": bookmaker["bookmaker"], "prob": outcome["prob"]}
-            )
-
-    aggregated = []
-    for (name, point), outcomes in groups.items():
-        aggregated.append(
-            {
-                "name": name,
-                "point": point,
-                "prob": weight_probs(outcomes, bookmaker_weights),
-            }
+        .filter(pl.col("bookmaker").is_in(list(bookmaker_weights)))
+        .explode("markets")
+    )
+    df = (
+        df.select(
+            pl.col("match", "home_team", "away_team", "bookmaker"),
+            pl.col("markets").struct.field("key").alias("type"),
+            pl.col("markets").struct.field("outcomes"),
         )
+        .filter(pl.col("type").is_in(["h2h", "spreads", "totals"]))
+        .with_row_index("market")
+        .explode("outcomes")
+    )
+    name = pl.col("outcomes").struct.field("name")
+    team_side = (
+        pl.when(name == pl.col("home_team"))
+        .then(pl.lit("home"))
+        .when(name == pl.col("away_team"))
+        .then(pl.lit("away"))
+    )
+    df = df.select(
+        pl.col("match", "market", "bookmaker", "type"),
+        pl.when(pl.col("type") == "h2h")
+        .then(team_side.when(name == "Draw").then(pl.lit("draw")))
+        .when(pl.col("type") == "spreads")
+        .then(team_side)
+        .otherwise(name)
+        .alias("side"),
+        pl.when(pl.col("type") != "h2h")
+        .then(pl.col("outcomes").struct.field("point"))
+        .alias("point"),
+        pl.col("outcomes").struct.field("price"),
+        pl.col("outcomes").is_not_null().alias("listed"),
+    )
 
-    return aggregated
-
-
-def weight_probs(outcomes: list[dict], bookmaker_weights: dict) -> float:
-    """Compute a weighted average of probabilities from different bookmakers."""
-
-    bookmakers, probs, weights = [], [], []
-    for outcome in outcomes:
-        bookmakers.append(outcome["bookmaker"])
-        probs.append(outcome["prob"])
-        weights.append(bookmaker_weights[outcome["bookmaker"]])
+    incomplete = (
+        df.filter(pl.col("type") == "h2h")
+        .group_by("market")
+        .agg(pl.col("side").drop_nulls().n_unique())
+    )
+    if (incomplete.get_column("side") < 3).any():
+        raise ValueError("Missing odds for one of the outcomes in h2h market.")
+    if df.filter(
+        (pl.col("type") == "spreads") & pl.col("listed") & pl.col("side").is_null()
+    ).height:
+        raise ValueError("Unexpected outcome name in spreads market.")
+
+    # Convert odds to implied probabilities, adjusted for each market's overround
+    implied = 1 / pl.col("price")
+    df = df.filter(pl.col("side").is_not_null()).with_row_index("row")
+    df = df.with_columns(
+        (implied / implied.sum().over("market")).alias("prob"),
+        pl.col("bookmaker")
+        .replace_strict(bookmaker_weights, return_dtype=pl.Float64)
+        .alias("weight"),
+    )
 
-    total_weight = sum(weights)
-    if total_weight == 0:
+    # Compute weighted averages of probabilities from different bookmakers
+    weight = pl.col("weight") / pl.col("weight").sum()
+    df = df.group_by(["match", "type", "side", "point"], maintain_order=True).agg(
+        (pl.col("prob") * weight).sum(),
+        pl.col("weight").sum().alias("total_weight"),
+        pl.first("row"),
+    )
+    if (df.get_column("total_weight") == 0).any():
         raise ZeroDivisionError(
             "Sum of bookmaker weights is zero. Cannot compute weighted average."
         )
 
-    weights = [w / total_weight for w in weights]
-    return sum([v * p for v, p in zip(probs, weights, strict=True)])
-
-
-def compute_h2h_error(prob_matrix: np.ndarray, target_prob: list):
-    # Sum up the observed probabilities for home win, away win, and draw events
-    observed = [0 for _ in target_prob["data"]]
-
-    for h_goals in range(prob_matrix.shape[0]):
-        for a_goals in range(prob_matrix.shape[1]):
-            for i, event in enumerate(target_prob["data"]):
-                if event["side"] == "home" and h_goals > a_goals:
-                    observed[i] += prob_matrix[h_goals, a_goals]
-                if event["side"] == "away" and a_goals > h_goals:
-                    observed[i] += prob_matrix[h_goals, a_goals]
-                if event["side"] == "draw" and h_goals == a_goals:
-                    observed[i] += prob_matrix[h_goals, a_goals]
-
-    # Compute the sum of squared errors between observed and target probabilities
-    error = sum(
-        (observed[i] - event["prob"]) ** 2
-        for i, event in enumerate(target_prob["data"])
+    # Order each match's outcomes by market type, as bookmakers first list them
+    return df.sort("match", pl.col("row").min().over("match", "type"), "row").select(
+        "match", "type", "side", "point", "prob"
     )
 
-    return error
-
 
-def compute_spreads_error(prob_matrix: np.ndarray, target_prob: list):
-    # Sum up the observed probabilities for all target spreads
-    observed = [0 for _ in target_prob["data"]]
-
-    for h_goals in range(prob_matrix.shape[0]):
-        for a_goals in range(prob_matrix.shape[1]):
-            for i, spread in enumerate(target_prob["data"]):
-                if spread["side"] == "home" and (h_goals + spread["point"]) > a_goals:
-                    observed[i] += prob_matrix[h_goals, a_goals]
-                if spread["side"] == "away" and (a_goals + spread["point"]) > h_goals:
-                    observed[i] += prob_matrix[h_goals, a_goals]
-
-    # Compute the squared error
-    error = sum(
-        (observed[i] - spread["prob"]) ** 2
-        for i, spread in enumerate(target_prob["data"])
+def get_outcome_masks(
+    outcomes: pl.DataFrame, size: int, max_goals: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Get masks of the scorelines covered by each outcome of each match.
+
+    Outcomes hold the index of their match among `size` matches, and the type,
+    side, point and target probability of the outcome. Returns the masks of
+    distinct outcomes over the scoreline grid, the index of each match's outcomes
+    among them, their target probabilities, and whether each outcome is present
+    (as matches have different numbers of outcomes).
+    """
+    coefficients = pl.DataFrame(
+        [(*key, *value) for key, value in OUTCOME_COEFFICIENTS.items()],
+        schema={
+            "type": pl.String,
+            "side": pl.String,
+            "h": pl.Float64,
+            "a": pl.Float64,
+            "p": pl.Float64,
+            "exact": pl.Boolean,
+        },
+        orient="row",
     )
-
-    return error
-
-
-def compute_totals_error(prob_matrix: np.ndarray, target_prob: list):
-    # Sum up the observed probabilities for all over/under lines
-    observed = [0 for _ in target_prob["data"]]
-
-    for h_goals in range(prob_matrix.shape[0]):
-        for a_goals in range(prob_matrix.shape[1]):
-            for i, line in enumerate(target_prob["data"]):
-                if line["name"] == "Over" and (h_goals + a_goals) > line["point"]:
-                    observed[i] += prob_matrix[h_goals, a_goals]
-                if line["name"] == "Under" and (h_goals + a_goals) < line["point"]:
-                    observed[i] += prob_matrix[h_goals, a_goals]
-
-    # Calculate squared error
-    error = sum(
-        (observed[i] - line["prob"]) ** 2 for i, line in enumerate(target_prob["data"])
+    outcomes = outcomes.filter(pl.col("prob").is_not_null()).join(
+        coefficients, on=["type", "side"], how="left", maintain_order="left"
     )
+    unknown = outcomes.filter(pl.col("h").is_null())
+    if not unknown.is_empty():
+        raise ValueError(
+            f"Unknown outcome {unknown['side'][0]} of type {unknown['type'][0]}"
+        )
 
-    return error
-
-
-def objective(params: list, target_probs: dict, max_goals: int):
-    lambda_h, lambda_a = params
-
-    # Penalize non-positive parameters
-    if lambda_h <= 0 or lambda_a <= 0:
-        return float("inf")
-
-    # Calculate the probabilities of each scoreline (assuming a Poisson distribution)
+    # Number the distinct outcomes, and each outcome within its match
+    keys = ["h", "a", "p", "exact"]
+    outcomes = outcomes.with_columns(pl.col("p") * pl.col("point").fill_null(0))
+    distinct = outcomes.select(keys).unique(maintain_order=True)
+    outcomes = outcomes.join(
+        distinct.with_row_index("outcome"), on=keys, maintain_order="left"
+    ).with_columns(pl.int_range(pl.len()).over("match").alias("slot"))
+
+    # Evaluate the weighted sums of all distinct outcomes over the grid at once
+    goals = np.arange(max_goals + 1, dtype=np.float64)
+    coefficients = distinct.to_numpy().astype(np.float64).reshape(-1, 4)
+    h, a, p, exact = (coefficients[:, i, None, None] for i in range(4))
+    sums = h * goals[:, None] + a * goals[None, :] + p
+    masks = np.where(exact == 1, sums == 0, sums > 0).astype(np.float64)
+
+    # Pad the outcomes of each match to the same length
+    rows = outcomes.get_column("match").to_numpy()
+    slots = outcomes.get_column("slot").to_numpy()
+    width = int(slots.max()) + 1 if len(slots) else 0
+    indices = np.zeros((size, width), dtype=np.int64)
+    targets = np.zeros((size, width))
+    valid = np.zeros((size, width), dtype=bool)
+    indices[rows, slots] = outcomes.get_column("outcome").to_numpy()
+    targets[rows, slots] = outcomes.get_column("prob").to_numpy()
+    valid[rows, slots] = True
+
+    return masks, indices, targets, valid
+
+
+def get_outcome_errors(
+    params: np.ndarray,
+    masks: np.ndarray,
+    indices: np.ndarray,
+    targets: np.ndarray,
+    valid: np.ndarray,
+    max_goals: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Get the errors of outcome probabilities of each match, and their Jacobian.
+
+    Parameters hold the expected home and away goals of each match. Derivatives
+    follow from that of the Poisson distribution, which is the difference of the
+    probabilities of one fewer and the same number of goals.
+    """
+    # Calculate the probabilities of each number of goals and their derivatives
     goals_range = np.arange(max_goals + 1)
-    prob_h = poisson.pmf(goals_range, lambda_h)
-    prob_a = poisson.pmf(goals_range, lambda_a)
-    prob_matrix = np.outer(prob_h, prob_a)
-
-    # Compute the total error across all target probabilities
-    errors = []
-    for target_prob in target_probs:
-        if target_prob["type"] == "h2h":
-            error = compute_h2h_error(prob_matrix, target_prob)
-        elif target_prob["type"] == "spreads":
-            error = compute_spreads_error(prob_matrix, target_prob)
-        elif target_prob["type"] == "totals":
-            error = compute_totals_error(prob_matrix, target_prob)
-        else:
-            raise ValueError(f"Unknown target probability type: {target_prob['type']}")
-        errors.append(error)
-
-    return sum(errors)
-
-
-def estimate_goals(target_probs: dict, max_goals: int) -> dict:
-    """Estimate expected goals for home and away teams based on target probabilities."""
-    initial_guess = [1.5, 1.2]
-    bounds = [(1e-6, max_goals), (1e-6, max_goals)]
-    result = minimize(
-        objective,
-        initial_guess,
-        args=(
-            target_probs,
-            max_goals,
-        ),
-        method="L-BFGS-B",
-        bounds=bounds,
+    probs = poisson.pmf(goals_range, params[:, :, None])
+    derivatives = -probs
+    derivatives[:, :, 1:] += probs[:, :, :-1]
+    prob_h, prob_a = probs[:, 0], probs[:, 1]
+
+    # Sum the probabilities of the scorelines covered by each outcome
+    home_weights = np.einsum("uij,nj->nui", masks, prob_a)
+    away_weights = np.einsum("uij,ni->nuj", masks, prob_h)
+    observed = np.einsum("nui,ni->nu", home_weights, prob_h)
+    jacobian = np.stack(
+        [
+            np.einsum("nui,ni->nu", home_weights, derivatives[:, 0]),
+            np.einsum("nuj,nj->nu", away_weights, derivatives[:, 1]),
+        ],
+        axis=2,
     )
-    return result
-
 
-def calculate_implied_probs(*values: list[float]) -> list[float]:
-    """Convert bookmaker odds to implied probabilities, adjusted for overround."""
-    implied = [1 / v for v in values]
-    overround = sum(implied)
-    normalized = [x / overround for x in implied]
-    return normalized
+    # Select the outcomes of each match
+    rows = np.arange(len(params))[:, None]
+    errors = np.where(valid, observed[rows, indices] - targets, 0.0)
+    jacobian = np.where(valid[:, :, None], jacobian[rows, indices], 0.0)
+    return errors, jacobian
+
+
+def estimate_goals(
+    outcomes: pl.DataFrame, size: int, max_goals: int, max_iterations: int = 200
+) -> np.ndarray:
+    """Estimate expected goals for home and away teams based on target probabilities.
+
+    Outcomes are given as for `get_outcome_masks`, for `size` matches. Minimizes
+    the squared errors of outcome probabilities with Levenberg-Marquardt steps,
+    taken for all matches at once. Each match has its own damping and stops on its
+    own, so estimates do not depend on the other matches. Rows are NaN for matches
+    without targets, or where the fit did not converge.
+    """
+    masks, indices, targets, valid = get_outcome_masks(outcomes, size, max_goals)
+    lower, upper = 1e-6, max_goals
+
+    params = np.tile([1.5, 1.2], (size, 1))
+    damping = np.full(size, 1e-3)
+    errors, jacobian = get_outcome_errors(
+        params, masks, indices, targets, valid, max_goals
+    )
+    loss = (errors**2).sum(axis=1)
+    active = valid.any(axis=1)
+
+    for _ in range(max_iterations):
+        # Stop matches at a minimum, or where steps no longer reduce the error
+        gradient = np.einsum("nk,nkp->np", errors, jacobian)
+        gradient = _project(gradient, params, lower, upper)
+        active &= (np.abs(gradient) > 1e-12).any(axis=1) & (damping < 1e12)
+        if not active.any():
+            break
+
+        # Solve the damped normal equations of each match
+        a = jacobian[active]
+        hessian = np.einsum("nkp,nkq->npq", a, a)
+        hessian += (damping[active] + 1e-12)[:, None, None] * np.eye(2)
+        step = -_solve_2x2(hessian, np.einsum("nk,nkp->np", errors[active], a))
+        candidate = np.clip(params[active] + step, lower, upper)
+
+        # Accept steps that reduce the error, and adjust the damping
+        candidate_errors, candidate_jacobian = get_outcome_errors(
+            candidate, masks, indices[active], targets[active], valid[active], max_goals
+        )
+        candidate_loss = (candidate_errors**2).sum(axis=1)
+        improved = candidate_loss < loss[active]
+        accepted = np.flatnonzero(active)[improved]
+        params[accepted] = candidate[improved]
+        errors[accepted] = candidate_errors[improved]
+        jacobian[accepted] = candidate_jacobian[improved]
+        loss[accepted] = candidate_loss[improved]
+        damping[active] = np.where(improved, damping[active] / 3, damping[active] * 4)
+
+    # Check the gradient of each match for convergence
+    gradient = 2 * np.einsum("nk,nkp->np", errors, jacobian)
+    gradient = _project(gradient, params, lower, upper)
+    converged = valid.any(axis=1) & (np.abs(gradient) <= 1e-5).all(axis=1)
+    return np.where(converged[:, None], params, np.nan)
+
+
+def _project(
+    gradient: np.ndarray, params: np.ndarray, lower: float, upper: float
+) -> np.ndarray:
+    """Zero the components of gradients whose descent leaves the bounds."""
+    outward = ((params <= lower) & (gradient > 0)) | (
+        (params >= upper) & (gradient < 0)
+    )
+    return np.where(outward, 0.0, gradient)
+
+
+def _solve_2x2(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Solve a stack of 2x2 linear systems."""
+    determinant = a[:, 0, 0] * a[:, 1, 1] - a[:, 0, 1] * a[:, 1, 0]
+    return (
+        np.stack(
+            [
+                a[:, 1, 1] * b[:, 0] - a[:, 0, 1] * b[:, 1],
+                a[:, 0, 0] * b[:, 1] - a[:, 1, 0] * b[:, 0],
+            ],
+            axis=1,
+        )
+        / determinant[:, None]
+    )
@@ -1,22 +1,31 @@
 import os
 
-import polars as pl
 import requests
 
-from features.engineer_features import engineer_match_features, engineer_player_features
+from features.incremental import IncrementalFeatures
+from features.store import FeatureStore
 from game.rules import ELEMENT_TYPES
 from loaders.fpl import load_static_elements, load_static_teams
+from loaders.mappers import DenseGridMapper, DenseMapper
 from loaders.merged import load_merged
 from loaders.upcoming import get_upcoming_gameweeks
-from loaders.utils import force_dataframe, get_mapper, get_seasons, print_table
+from loaders.utils import get_seasons, print_table
 from optimization.optimize import optimize_squad
 from optimization.parameters import get_parameters
 from prediction.predict import aggregate_predictions, make_predictions, save_predictions
 from prediction.utils import load_model
 
 
-def run(current_season: int, next_gameweek: int, wildcard_gameweeks: list[int]):
-    """Run optimization on a live Fantasy Premier League team."""
+def run(
+    current_season: int,
+    next_gameweek: int,
+    wildcard_gameweeks: list[int],
+    log: bool = False,
+):
+    """Run optimization on a live Fantasy Premier League team.
+
+    If `log` is set, the time taken to load each data source is printed.
+    """
 
     parameters = get_parameters()
     fpl_id = int(os.getenv("FPL_ID"))
@@ -31,9 +40,9 @@ def run(current_season: int, next_gameweek: int, wildcard_gameweeks: list[int]):
     upcoming_gameweeks = get_upcoming_gameweeks(
         next_gameweek, parameters["optimization_window_size"], 38
     )
-    players, matches, _ = load_merged(seasons, current_season, upcoming_gameweeks)
-    players = players.collect()
-    matches = matches.collect()
+    players, matches, _ = load_merged(
+        seasons, current_season, upcoming_gameweeks, collect=True, log=log
+    )
 
     # Load team data from the API
     my_team = get_my_team(fpl_id, fpl_api_authorization)
@@ -44,41 +53,33 @@ def run(current_season: int, next_gameweek: int, wildcard_gameweeks: list[int]):
         pick["element"]: pick["selling_price"] for pick in my_team["picks"]
     }
 
-    # Engineer features
-    players = engineer_player_features(players)
-    matches = engineer_match_features(matches)
-
-    # Keep only the features for upcoming gameweeks
-    players = players.filter(
-        (pl.col("season") == current_season)
-        & (pl.col("gameweek").is_in(upcoming_gameweeks))
-    )
-    matches = matches.filter(
-        (pl.col("season") == current_season)
-        & (pl.col("gameweek").is_in(upcoming_gameweeks))
+    # Engineer the features read by the model for upcoming gameweeks
+    model = load_model("live")
+    features = IncrementalFeatures(FeatureStore(), model.get_player_columns())
+    players, matches = features.engineer(
+        players, matches, current_season, upcoming_gameweeks
     )
 
-    players = force_dataframe(players)
-    matches = force_dataframe(matches)
-
     # Predict total points
-    model = load_model("live")
     predictions = make_predictions(model, players, matches)
     save_predictions(predictions, static_elements, static_teams)
     predictions = aggregate_predictions(predictions)
 
-    # Map each prediction to an ID and gameweek
-    predictions = get_mapper(predictions, ["element", "gameweek"], "total_points")
-    for player in static_elements["id"]:
-        for gameweek in upcoming_gameweeks:
-            if (player, gameweek) not in predictions:
-                predictions[(player, gameweek)] = 0
+    # Map each prediction to an ID and gameweek, with 0 points for any others
+    predictions = DenseGridMapper.from_frame(
+        predictions,
+        "element",
+        "gameweek",
+        "total_points",
+        ids=static_elements["id"],
+        gameweeks=upcoming_gameweeks,
+    )
 
     # Optimize the squad
-    now_costs = get_mapper(static_elements, "id", "now_cost")
-    element_types = get_mapper(static_elements, "id", "element_type")
-    teams = get_mapper(static_elements, "id", "team")
-    web_names = get_mapper(static_elements, "id", "web_name")
+    now_costs = DenseMapper.from_frame(static_elements, "id", "now_cost")
+    element_types = DenseMapper.from_frame(static_elements, "id", "element_type")
+    teams = DenseMapper.from_frame(static_elements, "id", "team")
+    web_names = DenseMapper.from_frame(static_elements, "id", "web_name")
     roles = optimize_squad(
         squad,
         budget,
@@ -0,0 +1,87 @@
+import polars as pl
+
+from loaders.clubelo import apply_clubelo_cutoff, load_clubelo
+from loaders.fpl import build_fpl, load_fpl_sources
+from loaders.merged import get_cutoff_time, merge_sources
+from loaders.theoddsapi import (
+    build_theoddsapi,
+    load_theoddsapi_odds,
+    warn_theoddsapi_issues,
+)
+from loaders.understat import apply_understat_cutoff, load_understat
+from loaders.utils import collect_shared
+
+
+class AsOfStore:
+    """Loads all data for a season once, and serves it as of any gameweek.
+
+    Views are built with the same cutoff logic as `load_merged`, but from
+    sources that are only read from disk when the store is created.
+    """
+
+    def __init__(self, seasons: list[int], current_season: int):
+        if current_season not in seasons:
+            raise ValueError(f"Season '{current_season}' is not loaded.")
+
+        self.seasons = seasons
+        self.current_season = current_season
+
+        # Read and materialize each source without any cutoff
+        fixtures, elements, static_teams, static_element_intervals = load_fpl_sources(
+            seasons
+        )
+        self.fixtures = fixtures.collect()
+        self.elements = elements.collect()
+        self.static_teams = static_teams.collect()
+        self.static_element_intervals = {
+            column: intervals.collect()
+            for column, intervals in static_element_intervals.items()
+        }
+
+        uds_players, uds_teams = load_understat(seasons)
+        self.uds_players = uds_players.collect()
+        self.uds_teams = uds_teams.collect()
+
+        self.clb_ratings = load_clubelo().collect()
+        self.toa_odds = load_theoddsapi_odds(seasons).collect()
+
+    def load(
+        self, upcoming_gameweeks: list[int]
+    ) -> tuple[pl.DataFrame, pl.DataFrame, pl.DataFrame]:
+        """Return merged player, match, and manager data as of the next gameweek."""
+        next_gameweek = min(upcoming_gameweeks)
+        cutoff_time = get_cutoff_time(self.current_season, upcoming_gameweeks)
+
+        fpl_players, fpl_teams, fpl_managers = build_fpl(
+            self.seasons,
+            self.fixtures.lazy(),
+            self.elements.lazy(),
+            self.static_teams.lazy(),
+            {
+                column: intervals.lazy()
+                for column, intervals in self.static_element_intervals.items()
+            },
+            self.current_season,
+            upcoming_gameweeks,
+        )
+        uds_players, uds_teams = apply_understat_cutoff(
+            self.uds_players.lazy(), self.uds_teams.lazy(), cutoff_time
+        )
+        clb_teams = apply_clubelo_cutoff(self.clb_ratings.lazy(), cutoff_time)
+        toa_matches, toa_issues = build_theoddsapi(
+            self.toa_odds.lazy(), self.current_season, next_gameweek, cutoff_time
+        )
+
+        players, matches, managers = merge_sources(
+            fpl_players,
+            fpl_teams,
+            fpl_managers,
+            uds_players,
+            uds_teams,
+            clb_teams,
+            toa_matches,
+            cutoff_time,
+        )
+        *frames, toa_issues = collect_shared([players, matches, managers, toa_issues])
+        warn_theoddsapi_issues(toa_issues)
+        return tuple(frames)
@@ -0,0 +1,83 @@
+import hashlib
+import multiprocessing
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import polars as pl
+
+FINGERPRINT_FILENAME = "FINGERPRINT"
+
+
+def get_fingerprint(paths: list[Path], version: int = 0) -> str:
+    """Fingerprint files using their paths, sizes and modification times.
+
+    The version identifies the format the files are converted to, so that caches
+    are rebuilt whenever it changes.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"version:{version}\n".encode())
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def get_directory_fingerprint(directory: Path, version: int = 0) -> str:
+    """Fingerprint every file in a directory, without reading their contents."""
+    paths = sorted(path for path in Path(directory).rglob("*") if path.is_file())
+    return get_fingerprint(paths, version)
+
+
+def is_fresh(directory: Path, fingerprint: str) -> bool:
+    """Check whether a cache directory was written for the given fingerprint."""
+    path = directory / FINGERPRINT_FILENAME
+    return path.exists() and path.read_text() == fingerprint
+
+
+def write_tables(directory: Path, tables: dict[str, pl.DataFrame], fingerprint: str):
+    """Write tables to a cache directory as Parquet files."""
+    directory.mkdir(parents=True, exist_ok=True)
+
+    # Invalidate the directory before replacing any tables
+    (directory / FINGERPRINT_FILENAME).unlink(missing_ok=True)
+
+    for name, table in tables.items():
+        _write_atomic(directory / f"{name}.parquet", table.write_parquet)
+
+    # Only mark the directory as fresh once every table has been written
+    _write_atomic(
+        directory / FINGERPRINT_FILENAME,
+        lambda path: Path(path).write_text(fingerprint),
+    )
+
+
+def write_tables_parallel(
+    stale: list[tuple[Path, str, tuple]],
+    convert: Callable[..., dict[str, pl.DataFrame]],
+    workers: int,
+):
+    """Build tables for stale cache directories using a pool of processes.
+
+    Each stale entry holds a directory, its fingerprint, and the arguments that
+    `convert` is called with to build its tables.
+    """
+    if not stale:
+        return
+
+    # Workers return Polars frames, which are pickled as Arrow IPC buffers.
+    # Polars is not fork-safe, so workers are spawned instead.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [executor.submit(convert, *args) for _, _, args in stale]
+        for (directory, fingerprint, _), future in zip(stale, futures, strict=True):
+            write_tables(directory, future.result(), fingerprint)
+
+
+def _write_atomic(path: Path, write):
+    """Write to a temporary file, then move it into place."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    write(temporary_path)
+    os.replace(temporary_path, path)
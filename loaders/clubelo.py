@@ -1,24 +1,51 @@
+import glob
 from datetime import datetime
+from pathlib import Path
 
 import polars as pl
 
-from loaders.constants import DATA_DIR
+from loaders.cache import get_fingerprint, is_fresh, write_tables
+from loaders.constants import CACHE_DIR, DATA_DIR
+from loaders.schemas import SCHEMA_VERSION, scan_csv
 
 
-def load_clubelo(cutoff_time: datetime) -> pl.LazyFrame:
+def load_clubelo(cutoff_time: datetime | None = None) -> pl.LazyFrame:
     """Load local Club Elo ratings."""
-    ratings = pl.scan_csv(
-        DATA_DIR / "clubelo/ratings/*.csv",
-        try_parse_dates=True,
-        raise_if_empty=False,
-        null_values=["None"],
+    ratings = pl.scan_parquet(ingest_clubelo() / "ratings.parquet")
+    # Filter ratings using the cutoff time
+    if cutoff_time is not None:
+        ratings = apply_clubelo_cutoff(ratings, cutoff_time)
+    return ratings
+
+
+def apply_clubelo_cutoff(ratings: pl.LazyFrame, cutoff_time: datetime) -> pl.LazyFrame:
+    """Remove ratings that would not have been known at the cutoff time."""
+    # Keep past ratings, and the earliest rating still valid at the cutoff time.
+    # Ratings are sorted by end date, so a binary search finds it for each club.
+    return ratings.filter(
+        (
+            pl.int_range(pl.len())
+            <= pl.col("To").search_sorted(cutoff_time.date(), side="left")
+        ).over("Club")
     )
+
+
+def ingest_clubelo() -> Path:
+    """Compact ratings into a single Parquet table (if not yet cached).
+
+    Ratings are deduplicated, mapped to FPL codes, and sorted by FPL code and end
+    date, ready for as-of joins.
+    """
+    paths = sorted(glob.glob(str(DATA_DIR / "clubelo/ratings/*.csv")))
+    team_ids_path = DATA_DIR / "clubelo/team_ids.csv"
+    directory = CACHE_DIR / "clubelo"
+    fingerprint = get_fingerprint([*paths, team_ids_path], SCHEMA_VERSION)
+    if is_fresh(directory, fingerprint):
+        return directory
+
+    ratings = scan_csv(paths, "clubelo/ratings", null_values=["None"])
     # Add FPL codes to teams
-    team_ids = pl.scan_csv(
-        DATA_DIR / "clubelo/team_ids.csv",
-        try_parse_dates=True,
-        raise_if_empty=False,
-    )
+    team_ids = scan_csv(team_ids_path, "clubelo/team_ids")
     ratings = ratings.join(
         team_ids.select(
             pl.col("clubelo_name").alias("Club"),
@@ -26,16 +53,12 @@ def load_clubelo(cutoff_time: datetime) -> pl.LazyFrame:
         ),
         how="left",
         on="Club",
+        maintain_order="left",
     )
-    # Filter ratings using the cutoff time
-    ratings = pl.concat(
-        [
-            ratings.filter(pl.col("To") < cutoff_time.date()),
-            ratings.filter(pl.col("To") >= cutoff_time.date())
-            .group_by("Club")
-            .agg(pl.min("To"))
-            .join(ratings, on=["Club", "To"]),
-        ],
-        how="diagonal",
-    )
-    return ratings
+    # Keep one rating per club and end date. The last rating in file order is the
+    # one a backward as-of join on the unsorted files would have matched.
+    ratings = ratings.unique(["Club", "To"], keep="last", maintain_order=True)
+    ratings = ratings.sort(["fpl_code", "To"], maintain_order=True)
+
+    write_tables(directory, {"ratings": ratings.collect()}, fingerprint)
+    return directory
@@ -2,3 +2,4 @@ from pathlib import Path
 
 DATA_REPO_PATH = Path("fpl-data")
 DATA_DIR = DATA_REPO_PATH / "data"
+CACHE_DIR = Path("cache")
@@ -1,11 +1,33 @@
 import glob
 import json
 import lzma
+from collections.abc import Mapping
+from datetime import datetime
+from pathlib import Path
+from types import MappingProxyType
 
 import polars as pl
 
 from game.rules import DEF, FWD, GKP, MID, MNG
-from loaders.constants import DATA_DIR
+from loaders.cache import (
+    get_fingerprint,
+    is_fresh,
+    write_tables,
+    write_tables_parallel,
+)
+from loaders.constants import CACHE_DIR, DATA_DIR
+from loaders.keys import (
+    CODE_BOUND,
+    FIXTURE_BOUND,
+    GAMEWEEK_BOUND,
+    ID_BOUND,
+    check_key_bounds,
+    fixture_key,
+    gameweek_code_key,
+    gameweek_id_key,
+)
+from loaders.memo import LRUMemo
+from loaders.schemas import STATUS, scan_csv
 from loaders.upcoming import (
     get_upcoming_elements,
     get_upcoming_fixtures,
@@ -20,29 +42,74 @@ def load_fpl(
     seasons: list[int],
     current_season: int | None = None,
     upcoming_gameweeks: list[int] | None = None,
+    workers: int | None = None,
 ) -> tuple[pl.LazyFrame, pl.LazyFrame, pl.LazyFrame]:
-    """Load local FPL data for the given seasons."""
+    """Load local FPL data for the given seasons.
+
+    If `workers` is given, uncached bootstrap static snapshots are decompressed
+    and parsed in that many processes before loading.
+    """
+    fixtures, elements, static_teams, static_element_intervals = load_fpl_sources(
+        seasons, workers
+    )
+    return build_fpl(
+        seasons,
+        fixtures,
+        elements,
+        static_teams,
+        static_element_intervals,
+        current_season,
+        upcoming_gameweeks,
+    )
+
 
-    # Load local data
+def load_fpl_sources(
+    seasons: list[int], workers: int | None = None
+) -> tuple[pl.LazyFrame, pl.LazyFrame, pl.LazyFrame, dict[str, pl.LazyFrame]]:
+    """Load fixtures, elements, static teams, and static element intervals."""
     fixtures = load_fixtures(seasons)
     elements = load_elements(seasons)
 
+    snapshots = [
+        (season, gameweek) for season in seasons for gameweek in get_gameweeks(season)
+    ]
+    if workers is not None:
+        cache_bootstrap_static_parallel(snapshots, workers)
+
+    # Snapshots are scanned from disk, to avoid flushing the memo
     static_teams = pl.concat(
         [
-            load_static_teams(season, gameweek)
-            for season in seasons
-            for gameweek in get_gameweeks(season)
-        ],
-        how="diagonal_relaxed",
-    )
-    static_elements = pl.concat(
-        [
-            load_static_elements(season, gameweek)
-            for season in seasons
-            for gameweek in get_gameweeks(season)
+            format_static_teams(
+                pl.scan_parquet(
+                    cache_bootstrap_static(season, gameweek) / "teams.parquet"
+                ),
+                season,
+                gameweek,
+            )
+            for season, gameweek in snapshots
         ],
         how="diagonal_relaxed",
     )
+    static_elements = load_static_element_intervals(seasons, STATIC_ELEMENT_COLUMNS)
+
+    return fixtures, elements, static_teams, static_elements
+
+
+def build_fpl(
+    seasons: list[int],
+    fixtures: pl.LazyFrame,
+    elements: pl.LazyFrame,
+    static_teams: pl.LazyFrame,
+    static_element_intervals: dict[str, pl.LazyFrame],
+    current_season: int | None = None,
+    upcoming_gameweeks: list[int] | None = None,
+) -> tuple[pl.LazyFrame, pl.LazyFrame, pl.LazyFrame]:
+    """Build player, team, and manager data from the FPL sources."""
+
+    # Expand static element intervals into per-gameweek records. The expansion is
+    # cached, since it is reused by several joins below.
+    static_elements = expand_static_element_intervals(static_element_intervals)
+    static_elements = static_elements.cache()
 
     if current_season and upcoming_gameweeks:
         if current_season not in seasons:
@@ -86,31 +153,30 @@ def load_fpl(
     elements = elements.join(
         static_elements.select(
             [
-                pl.col("season"),
-                pl.col("gameweek"),
-                pl.col("id").alias("element"),
-                pl.col("element_type"),
+                gameweek_id_key("id").alias("key"),
+                pl.col("element_type").cast(pl.Int8),
                 pl.col("code"),
-                pl.col("web_name"),
+                pl.col("web_name").cast(pl.Categorical),
             ]
         ),
         how="left",
-        on=["season", "gameweek", "element"],
-    )
+        left_on=gameweek_id_key("element"),
+        right_on="key",
+    ).drop("key")
 
     # Add "team" to elements
     elements = elements.join(
         fixtures.select(
             [
-                pl.col("id").alias("fixture"),
-                pl.col("season"),
+                fixture_key(fixture="id").alias("key"),
                 pl.col("team_h"),
                 pl.col("team_a"),
             ]
         ),
         how="left",
-        on=["season", "fixture"],
-    )
+        left_on=fixture_key(),
+        right_on="key",
+    ).drop("key")
     elements = elements.with_columns(
         pl.when(pl.col("was_home"))
         .then(pl.col("team_h"))
@@ -124,15 +190,14 @@ def load_fpl(
         elements = elements.join(
             static_teams.select(
                 [
-                    pl.col("season"),
-                    pl.col("gameweek"),
-                    pl.col("id").alias(column),
+                    gameweek_id_key("id").alias("key"),
                     pl.col("code").alias(f"{column}_code"),
                 ]
             ),
             how="left",
-            on=["season", "gameweek", column],
-        )
+            left_on=gameweek_id_key(column),
+            right_on="key",
+        ).drop("key")
 
     # Compute defensive contributions for seasons before the 2024-2025 season
     if any(season < 2025 for season in seasons):
@@ -176,21 +241,20 @@ def load_fpl(
     players = players.join(
         static_elements.select(
             [
-                "season",
-                "gameweek",
-                "code",
-                "chance_of_playing_next_round",
-                "status",
-                "news",
-                "news_added",
-                "corners_and_indirect_freekicks_order",
-                "direct_freekicks_order",
-                "penalties_order",
+                gameweek_code_key().alias("key"),
+                pl.col("chance_of_playing_next_round"),
+                pl.col("status").cast(STATUS),
+                pl.col("news").cast(pl.Categorical),
+                pl.col("news_added"),
+                pl.col("corners_and_indirect_freekicks_order"),
+                pl.col("direct_freekicks_order"),
+                pl.col("penalties_order"),
             ]
         ),
-        on=["season", "gameweek", "code"],
+        left_on=gameweek_code_key(),
+        right_on="key",
         how="left",
-    )
+    ).drop("key")
 
     # Load team information
     matches = fixtures.select(
@@ -209,27 +273,12 @@ def load_fpl(
     )
     teams = get_teams_view(matches)
 
-    # Add team codes
+    # Add team codes and strengths
     teams = teams.join(
         static_teams.select(
             [
-                pl.col("season"),
-                pl.col("gameweek"),
-                pl.col("id"),
+                gameweek_id_key("id").alias("key"),
                 pl.col("code"),
-            ]
-        ),
-        how="left",
-        on=["season", "gameweek", "id"],
-    )
-
-    # Add team strengths
-    teams = teams.join(
-        static_teams.select(
-            [
-                pl.col("season"),
-                pl.col("gameweek"),
-                pl.col("id"),
                 pl.col("strength"),
                 pl.col("strength_attack_home"),
                 pl.col("strength_attack_away"),
@@ -240,8 +289,9 @@ def load_fpl(
             ]
         ),
         how="left",
-        on=["season", "gameweek", "id"],
-    )
+        left_on=gameweek_id_key("id"),
+        right_on="key",
+    ).drop("key")
 
     return players, teams, managers
 
@@ -254,14 +304,12 @@ def load_elements(seasons: list[int]) -> pl.LazyFrame:
         path = DATA_DIR / f"fpl/{season}/elements/*.csv"
         if glob.glob(str(path)):
             frames.append(
-                pl.scan_csv(
-                    path,
-                    try_parse_dates=True,
-                    raise_if_empty=False,
-                ).with_columns(pl.lit(season).alias("season"))
+                scan_csv(path, "fpl/elements").with_columns(
+                    pl.lit(season).alias("season")
+                )
             )
 
-    elements: pl.LazyFrame = pl.concat(frames, how="diagonal_relaxed")
+    elements: pl.LazyFrame = pl.concat(frames, how="diagonal")
 
     # Add the "starts" column when unavailable
     if all(season < 2022 for season in seasons):
@@ -316,14 +364,12 @@ def load_elements(seasons: list[int]) -> pl.LazyFrame:
 def load_fixtures(seasons: list[int]) -> pl.LazyFrame:
     """Load fixture information."""
     frames = [
-        pl.scan_csv(
-            DATA_DIR / f"fpl/{season}/fixtures.csv",
-            try_parse_dates=True,
-            raise_if_empty=False,
-        ).with_columns(pl.lit(season).alias("season"))
+        scan_csv(DATA_DIR / f"fpl/{season}/fixtures.csv", "fpl/fixtures").with_columns(
+            pl.lit(season).alias("season")
+        )
         for season in seasons
     ]
-    fixtures = pl.concat(frames, how="diagonal_relaxed")
+    fixtures = pl.concat(frames, how="diagonal")
 
     # Only load columns that are available to all seasons
     fixtures = fixtures.select(
@@ -339,33 +385,71 @@ def load_fixtures(seasons: list[int]) -> pl.LazyFrame:
         ]
     )
 
+    # Fixture IDs, gameweeks and team IDs are packed into keys to join on
+    check_key_bounds(
+        fixtures,
+        {
+            "id": FIXTURE_BOUND,
+            "gameweek": GAMEWEEK_BOUND,
+            "team_h": ID_BOUND,
+            "team_a": ID_BOUND,
+        },
+    )
+
     return fixtures
 
 
+# Static element columns used when building player data
+STATIC_ELEMENT_COLUMNS = [
+    "code",
+    "team",
+    "team_code",
+    "element_type",
+    "first_name",
+    "second_name",
+    "web_name",
+    "now_cost",
+    "status",
+    "chance_of_playing_next_round",
+    "news",
+    "news_added",
+    "corners_and_indirect_freekicks_order",
+    "corners_and_indirect_freekicks_text",
+    "direct_freekicks_order",
+    "direct_freekicks_text",
+    "penalties_order",
+    "penalties_text",
+]
+
+STATIC_ELEMENTS_SCHEMA_OVERRIDES = {
+    "ep_next": pl.Float64,
+    "ep_this": pl.Float64,
+    "expected_assists": pl.Float64,
+    "expected_goal_involvements": pl.Float64,
+    "expected_goals": pl.Float64,
+    "expected_goals_conceded": pl.Float64,
+    "form": pl.Float64,
+    "influence": pl.Float64,
+    "creativity": pl.Float64,
+    "threat": pl.Float64,
+    "ict_index": pl.Float64,
+    "points_per_game": pl.Float64,
+    "selected_by_percent": pl.Float64,
+    "value_form": pl.Float64,
+    "value_season": pl.Float64,
+}
+
+
 def load_static_elements(season: int, gameweek: int) -> pl.LazyFrame:
     """Load static elements data for the given season and gameweek."""
-    bootstrap_static = load_bootstrap_static(season, gameweek)
-    schema_overrides = {
-        "ep_next": pl.Float64,
-        "ep_this": pl.Float64,
-        "expected_assists": pl.Float64,
-        "expected_goal_involvements": pl.Float64,
-        "expected_goals": pl.Float64,
-        "expected_goals_conceded": pl.Float64,
-        "form": pl.Float64,
-        "influence": pl.Float64,
-        "creativity": pl.Float64,
-        "threat": pl.Float64,
-        "ict_index": pl.Float64,
-        "points_per_game": pl.Float64,
-        "selected_by_percent": pl.Float64,
-        "value_form": pl.Float64,
-        "value_season": pl.Float64,
-    }
-    static_elements = pl.LazyFrame(
-        bootstrap_static["elements"],
-        schema_overrides=schema_overrides,
-    )
+    static_elements = load_bootstrap_static_tables(season, gameweek)["elements"]
+    return format_static_elements(static_elements.lazy(), season, gameweek)
+
+
+def format_static_elements(
+    static_elements: pl.LazyFrame, season: int, gameweek: int
+) -> pl.LazyFrame:
+    """Add the season, gameweek, and any missing columns to static elements."""
     static_elements = static_elements.with_columns(
         pl.lit(season).alias("season"),
         pl.lit(gameweek).alias("gameweek"),
@@ -378,17 +462,194 @@ def load_static_elements(season: int, gameweek: int) -> pl.LazyFrame:
             pl.lit(None).cast(pl.String).alias("news"),
             pl.lit(None).cast(pl.Datetime(time_zone="UTC")).alias("news_added"),
         )
-    else:
-        static_elements = static_elements.with_columns(
-            pl.col("news_added").str.to_datetime(time_zone="UTC")
-        )
     return static_elements
 
 
+def load_static_element_intervals(
+    seasons: list[int], columns: list[str]
+) -> dict[str, pl.LazyFrame]:
+    """Load the validity intervals of static element columns for the given seasons."""
+    intervals = {}
+    for column in columns:
+        frames = []
+        for season in sorted(seasons):
+            path = cache_static_element_intervals(season) / f"{column}.parquet"
+            frames.append(
+                pl.scan_parquet(path).with_columns(pl.lit(season).alias("season"))
+            )
+        intervals[column] = pl.concat(frames, how="diagonal_relaxed")
+    return intervals
+
+
+def expand_static_element_intervals(
+    intervals: dict[str, pl.LazyFrame],
+) -> pl.LazyFrame:
+    """Expand validity intervals into one record per element and gameweek.
+
+    Intervals must be sorted by season, element, and start gameweek.
+    """
+    length = pl.col("valid_to_gw") - pl.col("valid_from_gw") + 1
+
+    # Every column's intervals cover the same gameweeks, so the sorted intervals
+    # expand into records that line up across all columns
+    frames = [
+        next(iter(intervals.values())).select(
+            pl.col("season").repeat_by(length).explode(),
+            pl.int_ranges(
+                pl.col("valid_from_gw"), pl.col("valid_to_gw") + 1, dtype=pl.Int32
+            )
+            .explode()
+            .alias("gameweek"),
+            pl.col("id").repeat_by(length).explode(),
+        )
+    ]
+    for column, frame in intervals.items():
+        frames.append(frame.select(pl.col(column).repeat_by(length).explode()))
+    return pl.concat(frames, how="horizontal")
+
+
+def cache_static_element_intervals(season: int) -> Path:
+    """Compress a season of static elements into validity intervals (if not cached).
+
+    Each column is stored as a separate table, with one row for each run of
+    consecutive gameweeks in which an element kept the same value.
+    """
+    gameweeks = get_gameweeks(season)
+    directory = CACHE_DIR / f"fpl/{season}/static_elements"
+    fingerprint = get_fingerprint(
+        [get_bootstrap_static_path(season, gameweek) for gameweek in gameweeks]
+    )
+    if not is_fresh(directory, fingerprint):
+        # Snapshots are scanned from disk, to avoid flushing the memo
+        static_elements = pl.concat(
+            [
+                format_static_elements(
+                    pl.scan_parquet(
+                        cache_bootstrap_static(season, gameweek) / "elements.parquet"
+                    ),
+                    season,
+                    gameweek,
+                )
+                for gameweek in gameweeks
+            ],
+            how="diagonal_relaxed",
+        ).collect()
+        tables = compress_static_elements(static_elements.drop("season"))
+        write_tables(directory, tables, fingerprint)
+    return directory
+
+
+def load_events(season: int) -> pl.LazyFrame:
+    """Load the events index for a season."""
+    return pl.scan_parquet(cache_events(season) / "events.parquet")
+
+
+# Deadline times of each season, shared by all callers in this process
+DEADLINE_TIMES_MEMO = LRUMemo(
+    max_bytes=1024 * 1024,
+    sizeof=lambda deadline_times: 128 * len(deadline_times),
+)
+
+
+def get_deadline_times(season: int) -> Mapping[int, datetime]:
+    """Map each gameweek in a season to its deadline time, memoized in memory."""
+    # Seasons are keyed by the fingerprint of their events, so new data is reloaded
+    fingerprint = get_events_fingerprint(season)
+    deadline_times = DEADLINE_TIMES_MEMO.get(
+        (season, fingerprint), lambda: _read_deadline_times(season)
+    )
+    return MappingProxyType(deadline_times)
+
+
+def _read_deadline_times(season: int) -> dict[int, datetime]:
+    events = load_events(season).select("gameweek", "deadline_time").collect()
+    return dict(events.iter_rows())
+
+
+def get_events_fingerprint(season: int) -> str:
+    """Fingerprint the snapshots that the events of a season are taken from."""
+    return get_fingerprint(
+        [
+            get_bootstrap_static_path(season, gameweek)
+            for gameweek in get_gameweeks(season)
+        ]
+    )
+
+
+def cache_events(season: int) -> Path:
+    """Build an index of events for a season (if not yet cached).
+
+    Each gameweek's event is taken from the snapshot made for that gameweek.
+    """
+    gameweeks = get_gameweeks(season)
+    directory = CACHE_DIR / f"fpl/{season}/events"
+    fingerprint = get_events_fingerprint(season)
+    if not is_fresh(directory, fingerprint):
+        events = pl.concat(
+            [
+                pl.scan_parquet(
+                    cache_bootstrap_static(season, gameweek) / "events.parquet"
+                )
+                .filter(pl.col("id") == gameweek)
+                .select(
+                    pl.col("id").cast(pl.Int32).alias("gameweek"),
+                    pl.col("deadline_time")
+                    .cast(pl.String)
+                    .str.to_datetime(time_zone="UTC"),
+                    pl.col("finished"),
+                    pl.col("is_current"),
+                    pl.col("is_next"),
+                )
+                for gameweek in gameweeks
+            ],
+            how="vertical",
+        ).collect()
+        write_tables(directory, {"events": events}, fingerprint)
+    return directory
+
+
+def compress_static_elements(static_elements: pl.DataFrame) -> dict[str, pl.DataFrame]:
+    """Split static elements into validity intervals for each column."""
+    df = static_elements.sort(["id", "gameweek"])
+
+    # Records of an element in consecutive gameweeks belong to the same run
+    df = df.with_columns(
+        (pl.col("gameweek").diff().over("id") != 1)
+        .fill_null(True)
+        .cum_sum()
+        .alias("run")
+    )
+
+    tables = {}
+    for column in df.columns:
+        if column in ["id", "gameweek", "run"]:
+            continue
+        tables[column] = (
+            df.group_by(
+                pl.struct("run", column).rle_id().alias("interval"),
+                maintain_order=True,
+            )
+            .agg(
+                pl.first("id"),
+                pl.min("gameweek").alias("valid_from_gw"),
+                pl.max("gameweek").alias("valid_to_gw"),
+                pl.first(column),
+            )
+            .drop("interval")
+        )
+    return tables
+
+
 def load_static_teams(season: int, gameweek: int) -> pl.LazyFrame:
     """Load static teams data for the given season and gameweek."""
-    bootstrap_static = load_bootstrap_static(season, gameweek)
-    static_teams = pl.LazyFrame(bootstrap_static["teams"])
+    static_teams = load_bootstrap_static_tables(season, gameweek)["teams"]
+    return format_static_teams(static_teams.lazy(), season, gameweek)
+
+
+def format_static_teams(
+    static_teams: pl.LazyFrame, season: int, gameweek: int
+) -> pl.LazyFrame:
+    """Add the season, gameweek, and any missing columns to static teams."""
     static_teams = static_teams.with_columns(
         pl.lit(season).alias("season"),
         pl.lit(gameweek).alias("gameweek"),
@@ -407,13 +668,106 @@ def load_static_teams(season: int, gameweek: int) -> pl.LazyFrame:
     return static_teams
 
 
+# Parsed snapshots shared by all callers in this process
+BOOTSTRAP_STATIC_MEMO = LRUMemo(
+    max_bytes=256 * 1024 * 1024,
+    sizeof=lambda tables: sum(table.estimated_size() for table in tables.values()),
+)
+
+
+def load_bootstrap_static_tables(
+    season: int, gameweek: int
+) -> Mapping[str, pl.DataFrame]:
+    """Load the tables in a bootstrap static snapshot, memoized in memory.
+
+    The returned mapping is read-only, and its tables are copies, so callers
+    cannot modify the memoized snapshot.
+    """
+    # Snapshots are keyed by their fingerprint, so changed files are reloaded
+    fingerprint = get_fingerprint([get_bootstrap_static_path(season, gameweek)])
+    tables = BOOTSTRAP_STATIC_MEMO.get(
+        (season, gameweek, fingerprint),
+        lambda: _read_bootstrap_static_tables(season, gameweek),
+    )
+    return MappingProxyType({name: table.clone() for name, table in tables.items()})
+
+
+def _read_bootstrap_static_tables(season: int, gameweek: int) -> dict:
+    path = cache_bootstrap_static(season, gameweek)
+    return {
+        name: pl.read_parquet(path / f"{name}.parquet")
+        for name in ["elements", "teams", "events"]
+    }
+
+
+def cache_bootstrap_static(season: int, gameweek: int) -> Path:
+    """Convert a bootstrap static snapshot to Parquet tables (if not yet cached)."""
+    directory = get_bootstrap_static_cache_dir(season, gameweek)
+    fingerprint = get_fingerprint([get_bootstrap_static_path(season, gameweek)])
+    if not is_fresh(directory, fingerprint):
+        tables = convert_bootstrap_static(load_bootstrap_static(season, gameweek))
+        write_tables(directory, tables, fingerprint)
+    return directory
+
+
+def cache_bootstrap_static_parallel(snapshots: list[tuple[int, int]], workers: int):
+    """Convert uncached bootstrap static snapshots using a pool of processes."""
+    stale = []
+    for season, gameweek in snapshots:
+        directory = get_bootstrap_static_cache_dir(season, gameweek)
+        fingerprint = get_fingerprint([get_bootstrap_static_path(season, gameweek)])
+        if not is_fresh(directory, fingerprint):
+            stale.append((directory, fingerprint, (season, gameweek)))
+    write_tables_parallel(stale, _convert_bootstrap_static_file, workers)
+
+
+def _convert_bootstrap_static_file(
+    season: int, gameweek: int
+) -> dict[str, pl.DataFrame]:
+    return convert_bootstrap_static(load_bootstrap_static(season, gameweek))
+
+
+def convert_bootstrap_static(bootstrap_static: dict) -> dict[str, pl.DataFrame]:
+    """Convert the elements, teams, and events in a snapshot to typed tables."""
+    elements = pl.DataFrame(
+        bootstrap_static["elements"],
+        schema_overrides=STATIC_ELEMENTS_SCHEMA_OVERRIDES,
+        infer_schema_length=None,
+    )
+    if "news_added" in elements.columns:
+        elements = elements.with_columns(
+            pl.col("news_added").cast(pl.String).str.to_datetime(time_zone="UTC")
+        )
+    teams = pl.DataFrame(bootstrap_static["teams"], infer_schema_length=None)
+    events = pl.DataFrame(bootstrap_static["events"], infer_schema_length=None)
+
+    # IDs and codes are packed into keys to join on
+    check_key_bounds(
+        elements,
+        {"id": ID_BOUND, "code": CODE_BOUND, "team": ID_BOUND, "team_code": CODE_BOUND},
+    )
+    check_key_bounds(teams, {"id": ID_BOUND, "code": CODE_BOUND})
+    check_key_bounds(events, {"id": GAMEWEEK_BOUND})
+    return {"elements": elements, "teams": teams, "events": events}
+
+
 def load_bootstrap_static(season: int, gameweek: int) -> dict:
     """Load bootstrap static data for the given season and gameweek."""
-    path = DATA_DIR / f"fpl/{season}/static/{gameweek}.json.xz"
+    path = get_bootstrap_static_path(season, gameweek)
     with lzma.open(path, "rt", encoding="utf-8") as f:
         return json.load(f)
 
 
+def get_bootstrap_static_path(season: int, gameweek: int) -> Path:
+    """Return the path to the bootstrap static snapshot for a season and gameweek."""
+    return DATA_DIR / f"fpl/{season}/static/{gameweek}.json.xz"
+
+
+def get_bootstrap_static_cache_dir(season: int, gameweek: int) -> Path:
+    """Return the cache directory for a bootstrap static snapshot."""
+    return CACHE_DIR / f"fpl/{season}/static/{gameweek}"
+
+
 def get_gameweeks(season: int) -> list[int]:
     """Scan the data directory for all available gameweeks."""
 
@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import warnings
+from pathlib import Path
+
+from loaders.cache import FINGERPRINT_FILENAME
+from loaders.constants import CACHE_DIR, DATA_DIR, DATA_REPO_PATH
+from loaders.fpl import get_bootstrap_static_cache_dir
+from loaders.theoddsapi import get_theoddsapi_cache_dir
+
+MANIFEST_PATH = CACHE_DIR / "manifest.json"
+
+
+def update_data(
+    offline: bool = False, background: bool = False
+) -> threading.Thread | None:
+    """Pull the data repository, then invalidate caches built from changed files.
+
+    In offline mode, no pull is made, but local changes are still detected. In
+    background mode, new commits are only fetched, in a thread that is returned
+    without waiting. The working tree is left at its current commit, so reads see
+    a single snapshot, until `finish_update` is called once reads are done.
+    """
+    if background and not offline:
+        invalidate_caches(refresh_manifest())
+        thread = threading.Thread(target=fetch_data)
+        thread.start()
+        return thread
+
+    if not offline:
+        pull_data()
+    invalidate_caches(refresh_manifest())
+    return None
+
+
+def finish_update(thread: threading.Thread):
+    """Wait for a background fetch, then apply it and invalidate changed caches."""
+    thread.join()
+    if merge_data():
+        invalidate_caches(refresh_manifest())
+
+
+def pull_data() -> bool:
+    """Pull the latest data, returning whether the pull succeeded."""
+    return fetch_data() and merge_data()
+
+
+def fetch_data() -> bool:
+    """Fetch the latest data without changing the working tree."""
+    return _run_git(["git", "fetch"])
+
+
+def merge_data() -> bool:
+    """Fast-forward the working tree to the fetched data."""
+    return _run_git(["git", "merge", "--ff-only", "@{upstream}"])
+
+
+def _run_git(command: list[str]) -> bool:
+    try:
+        subprocess.run(
+            command,
+            cwd=DATA_REPO_PATH,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        message = (
+            e.stderr.strip() if isinstance(e, subprocess.CalledProcessError) else e
+        )
+        warnings.warn(f"Could not pull data, using local copy: {message}", stacklevel=2)
+        return False
+    return True
+
+
+def refresh_manifest() -> set[str]:
+    """Update the saved manifest of the data directory, returning changed files."""
+    old = load_manifest()
+    new = build_manifest(DATA_DIR, old)
+    save_manifest(new)
+    # Without a previous manifest, caches rely on their own fingerprints
+    if not old:
+        return set()
+    return get_changed_files(old, new)
+
+
+def build_manifest(directory: Path, previous: dict | None = None) -> dict:
+    """Record the size and modification time of every file in a directory.
+
+    Files are only hashed once their size or modification time differs from the
+    previous manifest, so that touched files with unchanged content are not
+    reported. A first manifest hashes nothing.
+    """
+    previous = previous or {}
+    manifest = {}
+    for root, _, filenames in os.walk(directory):
+        for filename in filenames:
+            path = Path(root) / filename
+            key = path.relative_to(directory).as_posix()
+            stat = path.stat()
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            old_entry = previous.get(key)
+            if old_entry is not None and old_entry.items() >= entry.items():
+                entry = old_entry
+            elif previous:
+                entry["sha256"] = _hash_file(path)
+            manifest[key] = entry
+    return manifest
+
+
+def load_manifest() -> dict:
+    """Load the saved manifest, or an empty manifest if none exists."""
+    if not MANIFEST_PATH.exists():
+        return {}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: dict):
+    """Save a manifest, replacing the previous one."""
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    temporary_path = MANIFEST_PATH.with_name(f".{MANIFEST_PATH.name}.tmp")
+    with open(temporary_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(temporary_path, MANIFEST_PATH)
+
+
+def get_changed_files(old: dict, new: dict) -> set[str]:
+    """Find files added, removed, or changed between manifests.
+
+    Files are compared by hash where both manifests have one, and otherwise by
+    size and modification time.
+    """
+    return {
+        key
+        for key in old.keys() | new.keys()
+        if _is_changed(old.get(key), new.get(key))
+    }
+
+
+def _is_changed(old: dict | None, new: dict | None) -> bool:
+    if old is None or new is None:
+        return old is not new
+    if "sha256" in old and "sha256" in new:
+        return old["sha256"] != new["sha256"]
+    return (old["size"], old["mtime_ns"]) != (new["size"], new["mtime_ns"])
+
+
+def invalidate_caches(files: set[str]):
+    """Mark the cache entries built from changed files as stale.
+
+    Only the entry converted from each file is invalidated. Entries built from
+    many files (e.g. events, or the index of understat player files) check the
+    fingerprints of their files themselves, and rebuild only what changed.
+    """
+    for file in files:
+        directory = get_cache_entry(file)
+        if directory is not None:
+            (directory / FINGERPRINT_FILENAME).unlink(missing_ok=True)
+
+
+def get_cache_entry(file: str) -> Path | None:
+    """Return the cache directory that a data file is converted into, if any."""
+    path = Path(file)
+    match path.parts:
+        case ["fpl", season, "static", _]:
+            return get_bootstrap_static_cache_dir(int(season), _get_gameweek(path))
+        case ["theoddsapi", season, _]:
+            return get_theoddsapi_cache_dir(int(season), _get_gameweek(path))
+        case ["understat", "season", season, "teams", _]:
+            return CACHE_DIR / f"understat/teams/season={season}"
+        case ["clubelo", *_]:
+            return CACHE_DIR / "clubelo"
+    return None
+
+
+def _get_gameweek(path: Path) -> int:
+    # Snapshots are named after their gameweek, e.g. "3.json.xz"
+    return int(path.name.split(".")[0])
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
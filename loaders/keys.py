@@ -0,0 +1,69 @@
+import polars as pl
+
+# Exclusive upper bounds on the values packed into each key. Element and code parts
+# use most of the Int64 budget: the widest key, a fixture code key, stays below
+# 10_000 * FIXTURE_BOUND * CODE_BOUND = 1e16 for any four-digit season.
+GAMEWEEK_BOUND = 100
+FIXTURE_BOUND = 1_000
+ID_BOUND = 10_000_000
+CODE_BOUND = 1_000_000_000
+
+
+def check_key_bounds(df: pl.DataFrame | pl.LazyFrame, bounds: dict[str, int]):
+    """Check that columns fit within the bounds of the keys they are packed into.
+
+    Values outside their bounds would make packed keys collide, and joins on them
+    silently match the wrong rows. Only the minimum and maximum of each column
+    are computed.
+    """
+    columns = [column for column in bounds if column in df.collect_schema().names()]
+    if not columns:
+        return
+
+    stats = (
+        df.lazy()
+        .select(
+            *[pl.col(column).min().alias(f"{column}_min") for column in columns],
+            *[pl.col(column).max().alias(f"{column}_max") for column in columns],
+        )
+        .collect()
+        .row(0, named=True)
+    )
+    for column in columns:
+        low, high = stats[f"{column}_min"], stats[f"{column}_max"]
+        if low is not None and (low < 0 or high >= bounds[column]):
+            raise ValueError(
+                f"Column '{column}' has values in [{low}, {high}], outside of "
+                f"[0, {bounds[column]}) that keys can hold."
+            )
+
+
+def gameweek_key(season: str = "season", gameweek: str = "gameweek") -> pl.Expr:
+    """Pack a season and gameweek into a single integer key."""
+    return pl.col(season).cast(pl.Int64) * GAMEWEEK_BOUND + pl.col(gameweek)
+
+
+def fixture_key(season: str = "season", fixture: str = "fixture") -> pl.Expr:
+    """Pack a season and (season-scoped) fixture ID into a single integer key."""
+    return pl.col(season).cast(pl.Int64) * FIXTURE_BOUND + pl.col(fixture)
+
+
+def gameweek_id_key(
+    id: str, season: str = "season", gameweek: str = "gameweek"
+) -> pl.Expr:
+    """Pack a season, gameweek, and element or team ID into a single integer key."""
+    return gameweek_key(season, gameweek) * ID_BOUND + pl.col(id)
+
+
+def gameweek_code_key(
+    code: str = "code", season: str = "season", gameweek: str = "gameweek"
+) -> pl.Expr:
+    """Pack a season, gameweek, and element or team code into a single integer key."""
+    return gameweek_key(season, gameweek) * CODE_BOUND + pl.col(code)
+
+
+def fixture_code_key(
+    code: str = "code", season: str = "season", fixture: str = "fixture"
+) -> pl.Expr:
+    """Pack a season, fixture ID, and element or team code into a single integer key."""
+    return fixture_key(season, fixture) * CODE_BOUND + pl.col(code)
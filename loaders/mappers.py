@@ -0,0 +1,168 @@
+from collections.abc import Iterable, Iterator, Mapping
+
+import numpy as np
+import polars as pl
+
+
+class DenseMapper(Mapping):
+    """A read-only mapping from integer IDs to values, backed by NumPy arrays.
+
+    Columns are viewed without copying where possible, and lookups go through a
+    dense array holding the row of each ID, so no per-row objects are built.
+    Values that are invalid in `valid` map to None, like nulls in the source data.
+    """
+
+    def __init__(
+        self, ids: np.ndarray, values: np.ndarray, valid: np.ndarray | None = None
+    ):
+        self.ids = ids
+        self.values = values
+        self.valid = valid
+        self.index = _build_index(ids)
+
+    @classmethod
+    def from_frame(cls, df: pl.DataFrame, from_col: str, to_col: str) -> "DenseMapper":
+        """Map values in `from_col` to values in `to_col`."""
+        if not df.get_column(from_col).is_unique().all():
+            raise ValueError(f"Column(s): {from_col} must be unique")
+        return cls(
+            df.get_column(from_col).to_numpy(), *_to_numpy(df.get_column(to_col))
+        )
+
+    def row(self, id: int) -> int:
+        """Return the row of an ID, or -1 if it is not mapped."""
+        return _get_row(self.index, id)
+
+    def __getitem__(self, id: int):
+        row = self.row(id)
+        if row < 0:
+            raise KeyError(id)
+        if self.valid is not None and not self.valid[row]:
+            return None
+        return self.values.item(row)
+
+    def __contains__(self, id) -> bool:
+        return self.row(id) >= 0
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.ids.tolist())
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class DenseGridMapper(Mapping):
+    """A read-only mapping from (ID, gameweek) pairs to values, backed by a 2-D array.
+
+    Pairs without a value in the source data map to `fill_value`, and pairs whose
+    value is null map to None.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        gameweeks: np.ndarray,
+        values: np.ndarray,
+        valid: np.ndarray | None = None,
+    ):
+        self.ids = ids
+        self.gameweeks = gameweeks
+        self.values = values
+        self.valid = valid
+        self.id_index = _build_index(ids)
+        self.gameweek_index = _build_index(gameweeks)
+
+    @classmethod
+    def from_frame(
+        cls,
+        df: pl.DataFrame,
+        id_col: str,
+        gameweek_col: str,
+        to_col: str,
+        ids: Iterable[int] = (),
+        gameweeks: Iterable[int] = (),
+        fill_value: float = 0,
+    ) -> "DenseGridMapper":
+        """Map (`id_col`, `gameweek_col`) pairs to values in `to_col`.
+
+        The grid covers all IDs and gameweeks in the data, as well as any
+        additional `ids` and `gameweeks` given.
+        """
+        if not df.select(id_col, gameweek_col).is_unique().all():
+            raise ValueError(f"Column(s): {[id_col, gameweek_col]} must be unique")
+        df_ids = df.get_column(id_col).to_numpy()
+        df_gameweeks = df.get_column(gameweek_col).to_numpy()
+        all_ids = np.union1d(df_ids, np.fromiter(ids, dtype=np.int64))
+        all_gameweeks = np.union1d(df_gameweeks, np.fromiter(gameweeks, dtype=np.int64))
+
+        # Scatter the values (and where they are null) into the grid
+        values, valid = _to_numpy(df.get_column(to_col))
+        shape = (len(all_ids), len(all_gameweeks))
+        grid = np.full(shape, fill_value, dtype=values.dtype)
+        rows = np.searchsorted(all_ids, df_ids)
+        columns = np.searchsorted(all_gameweeks, df_gameweeks)
+        grid[rows, columns] = values
+        grid_valid = None
+        if valid is not None:
+            grid_valid = np.ones(shape, dtype=bool)
+            grid_valid[rows, columns] = valid
+        return cls(all_ids, all_gameweeks, grid, grid_valid)
+
+    def __getitem__(self, key: tuple[int, int]):
+        id, gameweek = key
+        row = _get_row(self.id_index, id)
+        column = _get_row(self.gameweek_index, gameweek)
+        if row < 0 or column < 0:
+            raise KeyError(key)
+        if self.valid is not None and not self.valid[row, column]:
+            return None
+        return self.values.item(row, column)
+
+    def __contains__(self, key) -> bool:
+        try:
+            self[key]
+        except (KeyError, TypeError, ValueError):
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        gameweeks = self.gameweeks.tolist()
+        for id in self.ids.tolist():
+            for gameweek in gameweeks:
+                yield id, gameweek
+
+    def __len__(self) -> int:
+        return self.values.size
+
+
+def _to_numpy(series: pl.Series) -> tuple[np.ndarray, np.ndarray | None]:
+    """Convert a column to an array of values and a mask of which are not null.
+
+    The mask is None if there are no nulls. Nulls in numeric columns are filled
+    with zeros first, so the array keeps the column's type instead of becoming
+    a float array holding NaNs.
+    """
+    if not series.has_nulls():
+        return series.to_numpy(), None
+    valid = series.is_not_null().to_numpy()
+    if series.dtype.is_numeric():
+        series = series.fill_null(0)
+    return series.to_numpy(), valid
+
+
+def _build_index(ids: np.ndarray) -> np.ndarray:
+    """Build a dense array holding the row of each ID, or -1 for missing IDs."""
+    if len(ids) == 0:
+        return np.empty(0, dtype=np.int64)
+    if ids.min() < 0:
+        raise ValueError("IDs must be non-negative")
+    index = np.full(ids.max() + 1, -1, dtype=np.int64)
+    index[ids] = np.arange(len(ids))
+    return index
+
+
+def _get_row(index: np.ndarray, id: int) -> int:
+    # Keys that are not integers (e.g. floats or strings) are never mapped
+    if isinstance(id, int | np.integer) and 0 <= id < len(index):
+        return int(index[id])
+    return -1
@@ -0,0 +1,19 @@
+import multiprocessing
+import resource
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+
+def measure_peak_rss(function, *args, **kwargs) -> int:
+    """Run a function in a new process, and return its peak memory usage in bytes."""
+    # Polars is not fork-safe, so the process is spawned instead
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(_run_and_measure, function, args, kwargs).result()
+
+
+def _run_and_measure(function, args: tuple, kwargs: dict) -> int:
+    function(*args, **kwargs)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, while macOS reports bytes
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
@@ -1,38 +1,179 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, datetime
 
 import polars as pl
 
 from loaders.clubelo import load_clubelo
-from loaders.fpl import load_bootstrap_static, load_fpl
-from loaders.theoddsapi import load_theoddsapi
+from loaders.fpl import get_deadline_times, load_fpl
+from loaders.keys import fixture_code_key
+from loaders.memory import measure_peak_rss
+from loaders.profiling import Profiler
+from loaders.theoddsapi import load_theoddsapi, warn_theoddsapi_issues
 from loaders.understat import load_understat
-from loaders.utils import get_matches_view
+from loaders.utils import collect_shared, get_matches_view
 
 
 def load_merged(
     seasons: list[int],
     current_season: int | None = None,
     upcoming_gameweeks: list[int] | None = None,
-) -> tuple[pl.LazyFrame, pl.LazyFrame, pl.LazyFrame]:
-    """Load merged player, team, and manager data."""
+    workers: int | None = None,
+    collect: bool = False,
+    log: bool = False,
+    engine: str = "auto",
+    profiler: Profiler | None = None,
+) -> tuple[pl.LazyFrame, pl.LazyFrame, pl.LazyFrame] | tuple[pl.DataFrame, ...]:
+    """Load merged player, team, and manager data.
+
+    If `collect` is set, all three frames are collected in a single pass, so that
+    work shared between them (e.g. reading FPL data) is only done once. Use
+    `engine="streaming"` to collect them with Polars' low-memory streaming engine.
+
+    Sources are prepared concurrently, and the time taken by each is recorded in
+    `profiler` (and printed if `log` is set). If `workers` is given, uncached FPL
+    and odds files are converted in that many processes.
+
+    Issues in the odds data are reported either way. Without `collect`, only the
+    odds needed to find them are collected.
+    """
 
     # Get the cutoff time for loaded data
-    if upcoming_gameweeks:
-        next_gameweek = min(upcoming_gameweeks)
-        cutoff_time = get_deadline_time(current_season, next_gameweek)
-    else:
-        next_gameweek = None
-        cutoff_time = datetime.max.replace(tzinfo=UTC)
-
-    # Load all data sources
-    fpl_players, fpl_teams, fpl_managers = load_fpl(
-        seasons, current_season, upcoming_gameweeks
+    next_gameweek = min(upcoming_gameweeks) if upcoming_gameweeks else None
+    cutoff_time = get_cutoff_time(current_season, upcoming_gameweeks)
+
+    # Load all data sources. They are independent until merged, and their eager
+    # work (decompression, Parquet I/O and Polars queries) mostly releases the GIL.
+    profiler = profiler or Profiler()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        fpl = executor.submit(
+            profiler.timed,
+            "fpl/build",
+            load_fpl,
+            seasons,
+            current_season,
+            upcoming_gameweeks,
+            workers,
+        )
+        uds = executor.submit(
+            profiler.timed, "understat/build", load_understat, seasons, cutoff_time
+        )
+        clb = executor.submit(
+            profiler.timed, "clubelo/build", load_clubelo, cutoff_time
+        )
+        toa = executor.submit(
+            profiler.timed,
+            "theoddsapi/build",
+            load_theoddsapi,
+            seasons,
+            current_season,
+            next_gameweek,
+            cutoff_time,
+            workers,
+        )
+    fpl_players, fpl_teams, fpl_managers = fpl.result()
+    uds_players, uds_teams = uds.result()
+    clb_teams = clb.result()
+    toa_matches, toa_issues = toa.result()
+    if log:
+        for stage in profiler.stages:
+            print(f"Prepared {stage.name} in {stage.seconds:.2f}s")
+
+    players, matches, managers = merge_sources(
+        fpl_players,
+        fpl_teams,
+        fpl_managers,
+        uds_players,
+        uds_teams,
+        clb_teams,
+        toa_matches,
+        cutoff_time,
     )
-    uds_players, uds_teams = load_understat(seasons, cutoff_time)
-    clb_teams = load_clubelo(cutoff_time)
-    toa_matches = load_theoddsapi(seasons, current_season, next_gameweek, cutoff_time)
+    if collect:
+        # Issues in the odds data share their plan with the matches
+        *frames, toa_issues = collect_shared(
+            [players, matches, managers, toa_issues], log, engine
+        )
+        warn_theoddsapi_issues(toa_issues)
+        return tuple(frames)
+
+    warn_theoddsapi_issues(toa_issues.collect(engine=engine))
+    return players, matches, managers
+
+
+def compare_engines(seasons: list[int]) -> dict[str, int]:
+    """Measure the peak memory usage of loading merged data with each engine."""
+    return {
+        engine: measure_peak_rss(load_merged, seasons, collect=True, engine=engine)
+        for engine in ["in-memory", "streaming"]
+    }
+
+
+def profile_merged(
+    seasons: list[int],
+    current_season: int | None = None,
+    upcoming_gameweeks: list[int] | None = None,
+    workers: int | None = None,
+) -> Profiler:
+    """Load merged data one stage at a time, measuring each stage.
+
+    Building each source refreshes its caches, and is timed separately from
+    collecting it. Merges are run on the collected sources, so that they are
+    measured on their own.
+    """
+    profiler = Profiler()
+    next_gameweek = min(upcoming_gameweeks) if upcoming_gameweeks else None
+    cutoff_time = get_cutoff_time(current_season, upcoming_gameweeks)
+
+    with profiler.time("fpl/build"):
+        fpl_players, fpl_teams, fpl_managers = load_fpl(
+            seasons, current_season, upcoming_gameweeks, workers
+        )
+    fpl_players = profiler.collect("fpl/players", fpl_players)
+    fpl_teams = profiler.collect("fpl/teams", fpl_teams)
+    fpl_managers = profiler.collect("fpl/managers", fpl_managers)
 
-    # Merge all data sources
+    with profiler.time("understat/build"):
+        uds_players, uds_teams = load_understat(seasons, cutoff_time)
+    uds_players = profiler.collect("understat/players", uds_players)
+    uds_teams = profiler.collect("understat/teams", uds_teams)
+
+    with profiler.time("clubelo/build"):
+        clb_teams = load_clubelo(cutoff_time)
+    clb_teams = profiler.collect("clubelo/ratings", clb_teams)
+
+    with profiler.time("theoddsapi/build"):
+        toa_matches, toa_issues = load_theoddsapi(
+            seasons, current_season, next_gameweek, cutoff_time
+        )
+    toa_matches = profiler.collect("theoddsapi/matches", toa_matches)
+    warn_theoddsapi_issues(toa_issues.collect())
+
+    profiler.collect(
+        "merge/players",
+        merge_players(fpl_players.lazy(), uds_players.lazy(), cutoff_time),
+    )
+    teams = profiler.collect(
+        "merge/teams",
+        merge_teams(fpl_teams.lazy(), uds_teams.lazy(), clb_teams.lazy()),
+    )
+    profiler.collect(
+        "merge/matches",
+        merge_matches(get_matches_view(teams.lazy()), toa_matches.lazy()),
+    )
+    return profiler
+
+
+def merge_sources(
+    fpl_players: pl.LazyFrame,
+    fpl_teams: pl.LazyFrame,
+    fpl_managers: pl.LazyFrame,
+    uds_players: pl.LazyFrame,
+    uds_teams: pl.LazyFrame,
+    clb_teams: pl.LazyFrame,
+    toa_matches: pl.LazyFrame,
+    cutoff_time: datetime,
+) -> tuple[pl.LazyFrame, pl.LazyFrame, pl.LazyFrame]:
+    """Merge all data sources into player, match, and manager data."""
     players = merge_players(fpl_players, uds_players, cutoff_time)
     teams = merge_teams(fpl_teams, uds_teams, clb_teams)
     matches = get_matches_view(teams)
@@ -42,6 +183,15 @@ def load_merged(
     return players, matches, managers
 
 
+def get_cutoff_time(
+    current_season: int | None, upcoming_gameweeks: list[int] | None
+) -> datetime:
+    """Returns the time after which no data should be loaded."""
+    if upcoming_gameweeks:
+        return get_deadline_time(current_season, min(upcoming_gameweeks))
+    return datetime.max.replace(tzinfo=UTC)
+
+
 def merge_players(
     fpl_players: pl.LazyFrame,
     uds_players: pl.LazyFrame,
@@ -65,9 +215,7 @@ def merge_players(
     fpl_players = fpl_players.join(
         uds_players.select(
             [
-                pl.col("fpl_code").alias("code"),
-                pl.col("season"),
-                pl.col("fpl_fixture_id").alias("fixture"),
+                fixture_code_key("fpl_code", fixture="fpl_fixture_id").alias("key"),
                 *[
                     pl.col(column).alias(alias)
                     for column, alias in zip(columns, aliases, strict=True)
@@ -75,8 +223,9 @@ def merge_players(
             ]
         ),
         how="left",
-        on=["code", "season", "fixture"],
-    )
+        left_on=fixture_code_key(),
+        right_on="key",
+    ).drop("key")
 
     # Fill null values, but not for upcoming gameweeks
     expressions = []
@@ -123,21 +272,20 @@ def merge_teams(
 
     fpl_teams = fpl_teams.join(
         uds_teams.select(
-            pl.col("season"),
-            pl.col("fpl_fixture_id").alias("fixture_id"),
-            pl.col("fpl_code").alias("code"),
+            fixture_code_key("fpl_code", fixture="fpl_fixture_id").alias("key"),
             *[
                 pl.col(column).alias(alias)
                 for column, alias in zip(columns, aliases, strict=True)
             ],
         ),
         how="left",
-        on=["season", "fixture_id", "code"],
-    )
+        left_on=fixture_code_key(fixture="fixture_id"),
+        right_on="key",
+    ).drop("key")
 
     # Add clubelo ratings for teams
     fpl_teams = fpl_teams.sort("kickoff_time")
-    clb_teams = clb_teams.sort("To")
+    clb_teams = clb_teams.sort(["fpl_code", "To"], maintain_order=True)
 
     fpl_teams = fpl_teams.join_asof(
         clb_teams.select(
@@ -161,8 +309,8 @@ def merge_matches(matches: pl.LazyFrame, toa_matches: pl.LazyFrame):
             pl.col("season"),
             pl.col("team_h_fpl_code").alias("team_h_code"),
             pl.col("team_a_fpl_code").alias("team_a_code"),
-            pl.col("team_h").alias("team_h_toa_name"),
-            pl.col("team_a").alias("team_a_toa_name"),
+            pl.col("team_h").cast(pl.Categorical).alias("team_h_toa_name"),
+            pl.col("team_a").cast(pl.Categorical).alias("team_a_toa_name"),
             pl.col("bookmakers").alias("toa_bookmakers"),
         ),
         on=["season", "team_h_code", "team_a_code"],
@@ -173,9 +321,7 @@ def merge_matches(matches: pl.LazyFrame, toa_matches: pl.LazyFrame):
 
 def get_deadline_time(season: int, gameweek: int) -> datetime:
     """Returns the deadline time for a given gameweek."""
-    bootstrap_static = load_bootstrap_static(season, gameweek)
-    for event in bootstrap_static["events"]:
-        if event["id"] == gameweek:
-            return datetime.fromisoformat(event["deadline_time"])
-    else:
+    deadline_times = get_deadline_times(season)
+    if gameweek not in deadline_times:
         raise ValueError(f"Could not find cutoff time for gameweek {gameweek}.")
+    return deadline_times[gameweek]
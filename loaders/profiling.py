@@ -0,0 +1,114 @@
+import json
+import os
+import time
+import warnings
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import polars as pl
+
+from loaders.utils import print_table
+
+
+@dataclass
+class Stage:
+    """Measurements of a single loading stage."""
+
+    name: str
+    seconds: float
+    rows: int | None = None
+    bytes: int | None = None
+    bytes_read: int | None = None
+    plan: str | None = None
+
+
+class Profiler:
+    """Record the wall time, output size, bytes read, and query plan of stages."""
+
+    def __init__(self):
+        self.stages: list[Stage] = []
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        """Time a block of eager work (e.g. building caches) as a stage."""
+        start = time.perf_counter()
+        yield
+        self.stages.append(Stage(name, time.perf_counter() - start))
+
+    def timed(self, name: str, function, *args, **kwargs):
+        """Call a function, timing the call as a stage."""
+        with self.time(name):
+            return function(*args, **kwargs)
+
+    def collect(
+        self, name: str, frame: pl.LazyFrame, engine: str = "auto"
+    ) -> pl.DataFrame:
+        """Collect a frame as a stage, recording its size, sources, and plan."""
+        plan = frame.explain(engine=engine)
+        bytes_read = get_scanned_bytes(frame)
+        start = time.perf_counter()
+        df = frame.collect(engine=engine)
+        self.stages.append(
+            Stage(
+                name,
+                time.perf_counter() - start,
+                rows=df.height,
+                bytes=df.estimated_size(),
+                bytes_read=bytes_read,
+                plan=plan,
+            )
+        )
+        return df
+
+    def to_json(self, path: Path | None = None) -> str:
+        """Export all stages as JSON, optionally writing them to a file."""
+        text = json.dumps([asdict(stage) for stage in self.stages], indent=2)
+        if path is not None:
+            Path(path).write_text(text)
+        return text
+
+    def print(self):
+        """Print a table of all stages, without their plans."""
+        print_table(
+            [
+                {
+                    "stage": stage.name,
+                    "seconds": round(stage.seconds, 3),
+                    "rows": stage.rows,
+                    "bytes": stage.bytes,
+                    "bytes_read": stage.bytes_read,
+                }
+                for stage in self.stages
+            ]
+        )
+
+
+def get_scanned_bytes(frame: pl.LazyFrame) -> int | None:
+    """Sum the sizes of the files scanned by a frame, if they can be found.
+
+    The files are found in the serialized query plan, so the total is an upper
+    bound on what is read after projection and predicate pushdown.
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            plan = json.loads(frame.serialize(format="json"))
+    except Exception:
+        return None
+    paths = set(_find_scanned_paths(plan))
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def _find_scanned_paths(node) -> Iterator[str]:
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "Paths" and isinstance(value, list):
+                for path in value:
+                    yield path["inner"] if isinstance(path, dict) else path
+            else:
+                yield from _find_scanned_paths(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _find_scanned_paths(value)
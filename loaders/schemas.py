@@ -0,0 +1,242 @@
+import glob
+import warnings
+
+import polars as pl
+
+# Bump this whenever a schema changes, so that caches built from CSVs are rebuilt
+SCHEMA_VERSION = 3
+
+UTC_DATETIME = pl.Datetime(time_unit="us", time_zone="UTC")
+
+# Player availability statuses
+STATUS = pl.Enum(["a", "d", "i", "n", "s", "u"])
+
+# Home or away sides
+HOME_AWAY = pl.Enum(["h", "a"])
+
+SCHEMAS: dict[str, dict[str, pl.DataType]] = {
+    "fpl/elements": {
+        "element": pl.Int64,
+        "fixture": pl.Int64,
+        "opponent_team": pl.Int64,
+        "total_points": pl.Int64,
+        "was_home": pl.Boolean,
+        "kickoff_time": UTC_DATETIME,
+        "team_h_score": pl.Int64,
+        "team_a_score": pl.Int64,
+        "round": pl.Int64,
+        "modified": pl.Boolean,
+        "minutes": pl.Int64,
+        "goals_scored": pl.Int64,
+        "assists": pl.Int64,
+        "clean_sheets": pl.Int64,
+        "goals_conceded": pl.Int64,
+        "own_goals": pl.Int64,
+        "penalties_saved": pl.Int64,
+        "penalties_missed": pl.Int64,
+        "yellow_cards": pl.Int64,
+        "red_cards": pl.Int64,
+        "saves": pl.Int64,
+        "bonus": pl.Int64,
+        "bps": pl.Int64,
+        "influence": pl.Float64,
+        "creativity": pl.Float64,
+        "threat": pl.Float64,
+        "ict_index": pl.Float64,
+        "clearances_blocks_interceptions": pl.Int64,
+        "recoveries": pl.Int64,
+        "tackles": pl.Int64,
+        "defensive_contribution": pl.Int64,
+        "starts": pl.Int64,
+        "expected_goals": pl.Float64,
+        "expected_assists": pl.Float64,
+        "expected_goal_involvements": pl.Float64,
+        "expected_goals_conceded": pl.Float64,
+        "mng_win": pl.Int64,
+        "mng_draw": pl.Int64,
+        "mng_loss": pl.Int64,
+        "mng_underdog_win": pl.Int64,
+        "mng_underdog_draw": pl.Int64,
+        "mng_clean_sheets": pl.Int64,
+        "mng_goals_scored": pl.Int64,
+        "value": pl.Int64,
+        "transfers_balance": pl.Int64,
+        "selected": pl.Int64,
+        "transfers_in": pl.Int64,
+        "transfers_out": pl.Int64,
+        # Discontinued columns, which are dropped after loading
+        "attempted_passes": pl.Int64,
+        "big_chances_created": pl.Int64,
+        "big_chances_missed": pl.Int64,
+        "completed_passes": pl.Int64,
+        "dribbles": pl.Int64,
+        "ea_index": pl.Int64,
+        "errors_leading_to_goal": pl.Int64,
+        "errors_leading_to_goal_attempt": pl.Int64,
+        "fouls": pl.Int64,
+        "id": pl.Int64,
+        "key_passes": pl.Int64,
+        "kickoff_time_formatted": pl.String,
+        "loaned_in": pl.Int64,
+        "loaned_out": pl.Int64,
+        "offside": pl.Int64,
+        "open_play_crosses": pl.Int64,
+        "penalties_conceded": pl.Int64,
+        "tackled": pl.Int64,
+        "target_missed": pl.Int64,
+        "winning_goals": pl.Int64,
+    },
+    "fpl/fixtures": {
+        "id": pl.Int64,
+        "code": pl.Int64,
+        "event": pl.Int64,
+        "kickoff_time": UTC_DATETIME,
+        "team_h": pl.Int64,
+        "team_a": pl.Int64,
+        "team_h_score": pl.Int64,
+        "team_a_score": pl.Int64,
+    },
+    "understat/player_matches": {
+        "goals": pl.Int64,
+        "shots": pl.Int64,
+        "xG": pl.Float64,
+        "time": pl.Int64,
+        "position": pl.Categorical,
+        "h_team": pl.Categorical,
+        "a_team": pl.Categorical,
+        "h_goals": pl.Int64,
+        "a_goals": pl.Int64,
+        "date": pl.Date,
+        "id": pl.Int64,
+        "season": pl.Int64,
+        "roster_id": pl.Int64,
+        "xA": pl.Float64,
+        "assists": pl.Int64,
+        "key_passes": pl.Int64,
+        "npg": pl.Int64,
+        "npxG": pl.Float64,
+        "xGChain": pl.Float64,
+        "xGBuildup": pl.Float64,
+    },
+    "understat/teams": {
+        "id": pl.Int64,
+        "h_a": HOME_AWAY,
+        "xG": pl.Float64,
+        "xGA": pl.Float64,
+        "npxG": pl.Float64,
+        "npxGA": pl.Float64,
+        "ppda": pl.String,
+        "ppda_allowed": pl.String,
+        "deep": pl.Int64,
+        "deep_allowed": pl.Int64,
+        "scored": pl.Int64,
+        "missed": pl.Int64,
+        "xpts": pl.Float64,
+        "result": pl.String,
+        "date": pl.Datetime(time_unit="us"),
+        "wins": pl.Int64,
+        "draws": pl.Int64,
+        "loses": pl.Int64,
+        "pts": pl.Int64,
+        "npxGD": pl.Float64,
+    },
+    "understat/dates": {
+        "id": pl.Int64,
+        "h": pl.Int64,
+        "a": pl.Int64,
+        "datetime": pl.Datetime(time_unit="us"),
+    },
+    "understat/fixture_ids": {
+        "understat_id": pl.Int64,
+        "fpl_id": pl.Int64,
+    },
+    "understat/player_ids": {
+        "understat_id": pl.Int64,
+        "fpl_code": pl.Int64,
+    },
+    "understat/team_ids": {
+        "understat_id": pl.Int64,
+        "fpl_code": pl.Int64,
+    },
+    "clubelo/ratings": {
+        "Rank": pl.Int64,
+        "Club": pl.String,
+        "Country": pl.String,
+        "Level": pl.Int64,
+        "Elo": pl.Float64,
+        "From": pl.Date,
+        "To": pl.Date,
+    },
+    "clubelo/team_ids": {
+        "clubelo_name": pl.String,
+        "fpl_code": pl.Int64,
+    },
+    "theoddsapi/team_ids": {
+        "theoddsapi_name": pl.String,
+        "fpl_code": pl.Int64,
+    },
+}
+
+# Families whose columns are all passed on to features, so new columns in these files
+# should be registered. Other families are only read through registered columns.
+STRICT_FAMILIES = {"fpl/elements"}
+
+
+def scan_csv(source, family: str, **kwargs) -> pl.LazyFrame:
+    """Scan CSV files using the registered schema for their family.
+
+    Registered columns are parsed with fixed types, so values that do not fit the
+    schema raise an error instead of silently changing the type of a column.
+    Unregistered columns are read as strings, with a warning for strict families.
+    Headers are read from every file, and files with different headers are
+    aligned by column name.
+    """
+    schema = SCHEMAS[family]
+    paths = _expand_paths(source)
+    headers = [
+        tuple(
+            pl.scan_csv(path, infer_schema=False, raise_if_empty=False)
+            .collect_schema()
+            .names()
+        )
+        for path in paths
+    ]
+    columns = list(dict.fromkeys(column for header in headers for column in header))
+    unregistered = [column for column in columns if column not in schema]
+    if unregistered and family in STRICT_FAMILIES:
+        warnings.warn(
+            f"Found unregistered columns {unregistered} in '{family}' files, which "
+            f"are read as strings. Add them to the schema registry and bump "
+            f"SCHEMA_VERSION.",
+            stacklevel=2,
+        )
+
+    def scan(source, columns: list[str]) -> pl.LazyFrame:
+        return pl.scan_csv(
+            source,
+            schema_overrides={
+                column: schema[column] for column in columns if column in schema
+            },
+            infer_schema=False,
+            raise_if_empty=False,
+            **kwargs,
+        )
+
+    if len(set(headers)) > 1:
+        return pl.concat(
+            [scan(path, header) for path, header in zip(paths, headers, strict=True)],
+            how="diagonal",
+        )
+    return scan(source, columns)
+
+
+def _expand_paths(source) -> list[str]:
+    """Expand a path, glob pattern, or list of them into the files they match."""
+    sources = source if isinstance(source, list | tuple) else [source]
+    paths = []
+    for path in map(str, sources):
+        if any(character in path for character in "*?["):
+            paths.extend(sorted(glob.glob(path)))
+        else:
+            paths.append(path)
+    return paths
@@ -0,0 +1,648 @@
+import csv
+import json
+import lzma
+import random
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+
+from game.rules import DEF, FWD, GKP, MID, MNG
+from loaders.keys import FIXTURE_BOUND, GAMEWEEK_BOUND, ID_BOUND
+from loaders.theoddsapi import TIMESTAMP_FORMAT
+
+# Element types of the players in each team, repeated for larger squads
+SQUAD_ELEMENT_TYPES = [GKP, DEF, DEF, DEF, MID, MID, MID, FWD, FWD, GKP, DEF, MID, FWD]
+
+UNDERSTAT_POSITIONS = {GKP: "GK", DEF: "D", MID: "M", FWD: "F"}
+
+# Keys of the bookmakers weighted by match features, before any generic ones
+BOOKMAKER_KEYS = ["pinnacle", "betfair_ex_uk", "smarkets", "matchbook", "skybet"]
+
+TEAM_STRENGTH_COLUMNS = [
+    "strength_attack_home",
+    "strength_attack_away",
+    "strength_defence_home",
+    "strength_defence_away",
+    "strength_overall_home",
+    "strength_overall_away",
+]
+
+MANAGER_COLUMNS = [
+    "mng_win",
+    "mng_draw",
+    "mng_loss",
+    "mng_underdog_win",
+    "mng_underdog_draw",
+    "mng_clean_sheets",
+    "mng_goals_scored",
+]
+
+
+def generate_data(
+    directory: Path,
+    seasons: list[int],
+    teams: int = 20,
+    players_per_team: int = 30,
+    bookmakers: int = 10,
+    gameweeks: int | None = None,
+    seed: int = 0,
+):
+    """Write a synthetic data repository, laid out like the real one.
+
+    Values are random, but the output is deterministic for a given seed. If
+    `gameweeks` is given, the last season is cut off before that gameweek is
+    played, as if the season were in progress.
+    """
+    if teams < 2 or teams % 2:
+        raise ValueError("The number of teams must be even.")
+    # Each season is a double round-robin, so the team count sets the number of
+    # gameweeks and fixtures, which must fit in packed keys
+    if 2 * (teams - 1) >= GAMEWEEK_BOUND:
+        raise ValueError(
+            f"{teams} teams play {2 * (teams - 1)} gameweeks, but packed keys only "
+            f"hold gameweeks below GAMEWEEK_BOUND={GAMEWEEK_BOUND}."
+        )
+    if teams * (teams - 1) >= FIXTURE_BOUND:
+        raise ValueError(
+            f"{teams} teams play {teams * (teams - 1)} fixtures, but packed keys only "
+            f"hold fixture IDs below FIXTURE_BOUND={FIXTURE_BOUND}."
+        )
+    if teams * (players_per_team + 1) >= ID_BOUND:
+        raise ValueError(
+            f"{teams * (players_per_team + 1)} elements do not fit in packed keys, "
+            f"which only hold IDs below ID_BOUND={ID_BOUND}."
+        )
+
+    rng = random.Random(seed)
+    root = Path(directory) / "data"
+    seasons = sorted(seasons)
+
+    clubs = [
+        {"id": i + 1, "code": i + 1, "name": f"Club {i + 1}", "understat_id": 100 + i}
+        for i in range(teams)
+    ]
+    players = [
+        {
+            "code": 100_000 + len(clubs) * k + club["id"],
+            "club": club,
+            "element_type": SQUAD_ELEMENT_TYPES[k % len(SQUAD_ELEMENT_TYPES)],
+            "understat_id": 10_000 + len(clubs) * k + club["id"],
+        }
+        for club in clubs
+        for k in range(players_per_team)
+    ]
+    write_csv(
+        root / "understat/player_ids.csv",
+        [{"understat_id": p["understat_id"], "fpl_code": p["code"]} for p in players],
+    )
+    write_csv(
+        root / "understat/team_ids.csv",
+        [{"understat_id": c["understat_id"], "fpl_code": c["code"]} for c in clubs],
+    )
+    write_csv(
+        root / "clubelo/team_ids.csv",
+        [{"clubelo_name": c["name"], "fpl_code": c["code"]} for c in clubs],
+    )
+    write_csv(
+        root / "theoddsapi/team_ids.csv",
+        [{"theoddsapi_name": f"{c['name']} FC", "fpl_code": c["code"]} for c in clubs],
+    )
+
+    player_matches = {player["code"]: [] for player in players}
+    for season in seasons:
+        fixtures = make_fixtures(rng, season, clubs)
+        last_gameweek = max(fixture["event"] for fixture in fixtures)
+
+        # Remove results of fixtures that have not been played yet
+        if gameweeks is not None and season == seasons[-1]:
+            if not 1 <= gameweeks <= last_gameweek:
+                raise ValueError(f"Season {season} has {last_gameweek} gameweeks.")
+            last_gameweek = gameweeks
+            for fixture in fixtures:
+                if fixture["event"] >= gameweeks:
+                    fixture.update(team_h_score=None, team_a_score=None, finished=False)
+
+        elements = make_elements(season, players, clubs)
+        write_fpl(root, rng, season, fixtures, elements, clubs, last_gameweek)
+        write_understat(root, rng, season, fixtures, clubs)
+        write_theoddsapi(root, rng, season, fixtures, clubs, bookmakers, last_gameweek)
+        for fixture in fixtures:
+            if fixture["finished"]:
+                add_player_matches(rng, season, fixture, elements, player_matches)
+
+    write_clubelo(root, rng, seasons, clubs)
+    for player in players:
+        if player_matches[player["code"]]:
+            write_csv(
+                root / f"understat/player/matches/{player['understat_id']}.csv",
+                player_matches[player["code"]],
+            )
+
+
+def make_fixtures(rng: random.Random, season: int, clubs: list[dict]) -> list[dict]:
+    """Schedule a double round-robin, one round per gameweek."""
+    start = get_season_start(season)
+    n = len(clubs)
+    interval = min(timedelta(days=7), timedelta(days=280) / (2 * (n - 1)))
+
+    # Rotate all clubs but the first to pair them up for each round
+    order = list(range(n))
+    rounds = []
+    for _ in range(n - 1):
+        rounds.append([(order[i], order[n - 1 - i]) for i in range(n // 2)])
+        order = [order[0], order[-1], *order[1:-1]]
+    rounds += [[(a, h) for h, a in pairs] for pairs in rounds]
+
+    fixtures = []
+    for gameweek, pairs in enumerate(rounds, start=1):
+        for h, a in pairs:
+            id = len(fixtures) + 1
+            kickoff_time = start + interval * (gameweek - 1) + timedelta(hours=id % 3)
+            fixtures.append(
+                {
+                    "id": id,
+                    "code": season * FIXTURE_BOUND + id,
+                    "event": gameweek,
+                    "kickoff_time": kickoff_time,
+                    "team_h": clubs[h]["id"],
+                    "team_a": clubs[a]["id"],
+                    "team_h_score": rng.randint(0, 4),
+                    "team_a_score": rng.randint(0, 3),
+                    "finished": True,
+                }
+            )
+    return fixtures
+
+
+def make_elements(season: int, players: list[dict], clubs: list[dict]) -> list[dict]:
+    """Assign element IDs to players (and managers, in the 2024-25 season)."""
+    elements = [
+        {
+            "id": i + 1,
+            "code": player["code"],
+            "element_type": player["element_type"],
+            "team": player["club"]["id"],
+            "team_code": player["club"]["code"],
+            "understat_id": player["understat_id"],
+        }
+        for i, player in enumerate(players)
+    ]
+    if season == 2024:
+        for club in clubs:
+            elements.append(
+                {
+                    "id": len(elements) + 1,
+                    "code": 900_000 + club["code"],
+                    "element_type": MNG,
+                    "team": club["id"],
+                    "team_code": club["code"],
+                    "understat_id": None,
+                }
+            )
+    return elements
+
+
+def write_fpl(
+    root: Path,
+    rng: random.Random,
+    season: int,
+    fixtures: list[dict],
+    elements: list[dict],
+    clubs: list[dict],
+    last_gameweek: int,
+):
+    """Write FPL fixtures, player histories, and bootstrap static snapshots."""
+    write_csv(
+        root / f"fpl/{season}/fixtures.csv",
+        [
+            {
+                **fixture,
+                "kickoff_time": fixture["kickoff_time"].strftime(TIMESTAMP_FORMAT),
+            }
+            for fixture in fixtures
+        ],
+    )
+
+    histories = {element["id"]: [] for element in elements}
+    for fixture in fixtures:
+        if not fixture["finished"]:
+            continue
+        for element in elements:
+            if element["team"] in (fixture["team_h"], fixture["team_a"]):
+                histories[element["id"]].append(
+                    make_history_row(rng, season, fixture, element)
+                )
+    for id, rows in histories.items():
+        if rows:
+            write_csv(root / f"fpl/{season}/elements/{id}.csv", rows)
+
+    rounds = max(fixture["event"] for fixture in fixtures)
+    deadline_times = {
+        gameweek: min(f["kickoff_time"] for f in fixtures if f["event"] == gameweek)
+        - timedelta(hours=2)
+        for gameweek in range(1, rounds + 1)
+    }
+    for gameweek in range(1, last_gameweek + 1):
+        events = [
+            {
+                "id": event,
+                "name": f"Gameweek {event}",
+                "deadline_time": deadline_times[event].strftime(TIMESTAMP_FORMAT),
+                "finished": event < gameweek,
+                "is_current": event == gameweek - 1,
+                "is_next": event == gameweek,
+            }
+            for event in deadline_times
+        ]
+        static_teams = [make_static_team(rng, season, club) for club in clubs]
+        static_elements = [
+            make_static_element(rng, season, gameweek, element, deadline_times)
+            for element in elements
+        ]
+        write_json_xz(
+            root / f"fpl/{season}/static/{gameweek}.json.xz",
+            {"events": events, "teams": static_teams, "elements": static_elements},
+        )
+
+
+def make_history_row(
+    rng: random.Random, season: int, fixture: dict, element: dict
+) -> dict:
+    """Make a record of an element's performance in a fixture."""
+    was_home = element["team"] == fixture["team_h"]
+    minutes = rng.choice([0, 0, 20, 65, 90, 90, 90])
+    row = {
+        "element": element["id"],
+        "fixture": fixture["id"],
+        "opponent_team": fixture["team_a"] if was_home else fixture["team_h"],
+        "total_points": rng.randint(0, 12) if minutes else 0,
+        "was_home": was_home,
+        "kickoff_time": fixture["kickoff_time"].strftime(TIMESTAMP_FORMAT),
+        "team_h_score": fixture["team_h_score"],
+        "team_a_score": fixture["team_a_score"],
+        "round": fixture["event"],
+        "minutes": minutes,
+        "goals_scored": rng.randint(0, 1) if minutes else 0,
+        "assists": rng.randint(0, 1) if minutes else 0,
+        "clean_sheets": int(minutes >= 60 and rng.random() < 0.3),
+        "goals_conceded": rng.randint(0, 3) if minutes else 0,
+        "own_goals": 0,
+        "penalties_saved": 0,
+        "penalties_missed": 0,
+        "yellow_cards": int(rng.random() < 0.1),
+        "red_cards": 0,
+        "saves": rng.randint(0, 4) if element["element_type"] == GKP else 0,
+        "bonus": rng.randint(0, 3) if minutes else 0,
+        "bps": rng.randint(0, 40) if minutes else 0,
+        "influence": round(rng.random() * 50, 1),
+        "creativity": round(rng.random() * 30, 1),
+        "threat": round(rng.random() * 40, 1),
+        "ict_index": round(rng.random() * 10, 1),
+        "value": 40 + element["id"] % 90,
+        "transfers_balance": 0,
+        "selected": rng.randint(0, 1_000_000),
+        "transfers_in": 0,
+        "transfers_out": 0,
+    }
+    if season >= 2022:
+        row["starts"] = int(minutes >= 60)
+        row["expected_goals"] = round(rng.random(), 2)
+        row["expected_assists"] = round(rng.random(), 2)
+        row["expected_goal_involvements"] = round(rng.random(), 2)
+        row["expected_goals_conceded"] = round(rng.random() * 2, 2)
+    if season <= 2018 or season >= 2025:
+        row["clearances_blocks_interceptions"] = rng.randint(0, 5) if minutes else 0
+        row["recoveries"] = rng.randint(0, 6) if minutes else 0
+        row["tackles"] = rng.randint(0, 3) if minutes else 0
+    if season >= 2025:
+        row["defensive_contribution"] = (
+            row["clearances_blocks_interceptions"] + row["tackles"]
+        )
+    if season == 2024:
+        row.update(dict.fromkeys(MANAGER_COLUMNS, 0))
+    return row
+
+
+def make_static_team(rng: random.Random, season: int, club: dict) -> dict:
+    """Make a team record for a bootstrap static snapshot."""
+    team = {
+        "id": club["id"],
+        "code": club["code"],
+        "name": club["name"],
+        "short_name": f"C{club['id']:02}",
+        "pulse_id": 1_000 + club["id"],
+        "draw": 0,
+        "loss": 0,
+        "played": 0,
+        "points": 0,
+        "position": 0,
+        "win": 0,
+        "unavailable": False,
+    }
+    if season >= 2021:
+        team["strength"] = rng.randint(2, 5)
+        for column in TEAM_STRENGTH_COLUMNS:
+            team[column] = rng.randint(1000, 1350)
+    return team
+
+
+def make_static_element(
+    rng: random.Random,
+    season: int,
+    gameweek: int,
+    element: dict,
+    deadline_times: dict[int, datetime],
+) -> dict:
+    """Make an element record for a bootstrap static snapshot."""
+    id = element["id"]
+    static_element = {
+        "id": id,
+        "code": element["code"],
+        "element_type": element["element_type"],
+        "team": element["team"],
+        "team_code": element["team_code"],
+        "first_name": f"First{id}",
+        "second_name": f"Second{id}",
+        "web_name": f"Player{element['code']}",
+        "now_cost": 40 + id % 90 + gameweek // 10,
+        "ep_next": "2.5",
+        "ep_this": "2.0",
+        "form": f"{rng.random() * 8:.1f}",
+        "points_per_game": f"{rng.random() * 6:.1f}",
+        "selected_by_percent": f"{rng.random() * 30:.1f}",
+        "value_form": "0.5",
+        "value_season": "1.0",
+        "influence": "10.2",
+        "creativity": "5.0",
+        "threat": "3.0",
+        "ict_index": "2.0",
+        "total_points": rng.randint(0, 100),
+        "corners_and_indirect_freekicks_order": 1 if id % 7 == 0 else None,
+        "corners_and_indirect_freekicks_text": "",
+        "direct_freekicks_order": 1 if id % 11 == 0 else None,
+        "direct_freekicks_text": "",
+        "penalties_order": 1 if id % 5 == 0 else None,
+        "penalties_text": "",
+    }
+    if season >= 2021:
+        status = rng.choice(["a", "a", "a", "a", "d", "i", "s", "u"])
+        news_added = deadline_times[gameweek] - timedelta(days=2)
+        static_element.update(
+            status=status,
+            chance_of_playing_next_round=None if status == "a" else 50,
+            news="" if status == "a" else "Knee injury - 50% chance of playing",
+            news_added=None
+            if status == "a"
+            else news_added.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        )
+    if season >= 2022:
+        static_element.update(
+            expected_goals="0.50",
+            expected_assists="0.30",
+            expected_goal_involvements="0.80",
+            expected_goals_conceded="1.00",
+        )
+    return static_element
+
+
+def add_player_matches(
+    rng: random.Random,
+    season: int,
+    fixture: dict,
+    elements: list[dict],
+    player_matches: dict[int, list[dict]],
+):
+    """Add Understat records for players who played in a fixture."""
+    for element in elements:
+        if element["team"] not in (fixture["team_h"], fixture["team_a"]):
+            continue
+        if element["element_type"] == MNG or rng.random() < 0.3:
+            continue
+        player_matches[element["code"]].append(
+            {
+                "goals": rng.randint(0, 1),
+                "shots": rng.randint(0, 4),
+                "xG": round(rng.random(), 3),
+                "time": rng.choice([20, 65, 90]),
+                "position": UNDERSTAT_POSITIONS[element["element_type"]],
+                "h_team": f"Club {fixture['team_h']}",
+                "a_team": f"Club {fixture['team_a']}",
+                "h_goals": fixture["team_h_score"],
+                "a_goals": fixture["team_a_score"],
+                "date": fixture["kickoff_time"].strftime("%Y-%m-%d"),
+                "id": get_understat_fixture_id(season, fixture),
+                "season": season,
+                "roster_id": rng.randint(1, 1_000_000),
+                "xA": round(rng.random(), 3),
+                "assists": rng.randint(0, 1),
+                "key_passes": rng.randint(0, 3),
+                "npg": 0,
+                "npxG": round(rng.random(), 3),
+                "xGChain": round(rng.random(), 3),
+                "xGBuildup": round(rng.random(), 3),
+            }
+        )
+
+
+def write_understat(
+    root: Path,
+    rng: random.Random,
+    season: int,
+    fixtures: list[dict],
+    clubs: list[dict],
+):
+    """Write Understat fixture dates, fixture IDs, and team match records."""
+    understat_ids = {club["id"]: club["understat_id"] for club in clubs}
+    played = [fixture for fixture in fixtures if fixture["finished"]]
+    write_csv(
+        root / f"understat/season/{season}/dates.csv",
+        [
+            {
+                "id": get_understat_fixture_id(season, fixture),
+                "isResult": fixture["finished"],
+                "h": understat_ids[fixture["team_h"]],
+                "a": understat_ids[fixture["team_a"]],
+                "datetime": fixture["kickoff_time"].strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            for fixture in fixtures
+        ],
+    )
+    write_csv(
+        root / f"understat/season/{season}/fixture_ids.csv",
+        [
+            {
+                "understat_id": get_understat_fixture_id(season, fixture),
+                "fpl_id": fixture["id"],
+            }
+            for fixture in fixtures
+        ],
+    )
+    for club in clubs:
+        rows = []
+        for fixture in played:
+            if club["id"] not in (fixture["team_h"], fixture["team_a"]):
+                continue
+            was_home = club["id"] == fixture["team_h"]
+            scored, missed = fixture["team_h_score"], fixture["team_a_score"]
+            if not was_home:
+                scored, missed = missed, scored
+            result = "w" if scored > missed else "l" if scored < missed else "d"
+            rows.append(
+                {
+                    "h_a": "h" if was_home else "a",
+                    "xG": round(rng.random() * 3, 3),
+                    "xGA": round(rng.random() * 3, 3),
+                    "npxG": round(rng.random() * 3, 3),
+                    "npxGA": round(rng.random() * 3, 3),
+                    "ppda": make_ppda(rng),
+                    "ppda_allowed": make_ppda(rng),
+                    "deep": rng.randint(0, 15),
+                    "deep_allowed": rng.randint(0, 15),
+                    "scored": scored,
+                    "missed": missed,
+                    "xpts": round(rng.random() * 3, 3),
+                    "result": result,
+                    "date": fixture["kickoff_time"].strftime("%Y-%m-%d %H:%M:%S"),
+                    "wins": int(result == "w"),
+                    "draws": int(result == "d"),
+                    "loses": int(result == "l"),
+                    "pts": {"w": 3, "d": 1, "l": 0}[result],
+                    "npxGD": round(rng.random() * 2 - 1, 3),
+                    "id": club["understat_id"],
+                }
+            )
+        if rows:
+            write_csv(
+                root / f"understat/season/{season}/teams/{club['understat_id']}.csv",
+                rows,
+            )
+
+
+def write_theoddsapi(
+    root: Path,
+    rng: random.Random,
+    season: int,
+    fixtures: list[dict],
+    clubs: list[dict],
+    bookmakers: int,
+    last_gameweek: int,
+):
+    """Write odds for the fixtures of each gameweek and the one after it."""
+    if season < 2021:
+        return
+    names = {club["id"]: f"{club['name']} FC" for club in clubs}
+    for gameweek in range(1, last_gameweek + 1):
+        deadline_time = min(
+            f["kickoff_time"] for f in fixtures if f["event"] == gameweek
+        ) - timedelta(hours=2)
+        last_update = (deadline_time - timedelta(hours=1)).strftime(TIMESTAMP_FORMAT)
+        odds = []
+        for fixture in fixtures:
+            if fixture["event"] not in (gameweek, gameweek + 1):
+                continue
+            home_team, away_team = names[fixture["team_h"]], names[fixture["team_a"]]
+            odds.append(
+                {
+                    "id": f"{season}-{gameweek}-{fixture['id']}",
+                    "sport_key": "soccer_epl",
+                    "commence_time": fixture["kickoff_time"].strftime(TIMESTAMP_FORMAT),
+                    "home_team": home_team,
+                    "away_team": away_team,
+                    "bookmakers": [
+                        make_bookmaker(rng, i, home_team, away_team, last_update)
+                        for i in range(bookmakers)
+                    ],
+                }
+            )
+        write_json_xz(root / f"theoddsapi/{season}/{gameweek}.json.xz", odds)
+
+
+def make_bookmaker(
+    rng: random.Random, index: int, home_team: str, away_team: str, last_update: str
+) -> dict:
+    """Make a bookmaker's head-to-head, spread, and totals markets for a match."""
+    return {
+        "key": BOOKMAKER_KEYS[index]
+        if index < len(BOOKMAKER_KEYS)
+        else f"bookmaker_{index}",
+        "title": f"Bookmaker {index}",
+        "last_update": last_update,
+        "markets": [
+            {
+                "key": "h2h",
+                "last_update": last_update,
+                "outcomes": [
+                    {"name": home_team, "price": round(1.2 + rng.random() * 4, 2)},
+                    {"name": away_team, "price": round(1.2 + rng.random() * 6, 2)},
+                    {"name": "Draw", "price": round(3 + rng.random(), 2)},
+                ],
+            },
+            {
+                "key": "spreads",
+                "last_update": last_update,
+                "outcomes": [
+                    {"name": home_team, "price": 1.9, "point": -0.5},
+                    {"name": away_team, "price": 1.95, "point": 0.5},
+                ],
+            },
+            {
+                "key": "totals",
+                "last_update": last_update,
+                "outcomes": [
+                    {"name": "Over", "price": 1.9, "point": 2.5},
+                    {"name": "Under", "price": 1.95, "point": 2.5},
+                ],
+            },
+        ],
+    }
+
+
+def write_clubelo(
+    root: Path, rng: random.Random, seasons: list[int], clubs: list[dict]
+):
+    """Write Club Elo ratings, each valid for a period of 18 days."""
+    for club in clubs:
+        rows = []
+        for season in seasons:
+            for period in range(20):
+                start = datetime(season, 7, 1) + timedelta(days=18 * period)
+                rows.append(
+                    {
+                        "Rank": "None" if period % 7 == 0 else club["id"],
+                        "Club": club["name"],
+                        "Country": "ENG",
+                        "Level": 1,
+                        "Elo": round(1500 + rng.random() * 500, 3),
+                        "From": start.strftime("%Y-%m-%d"),
+                        "To": (start + timedelta(days=17)).strftime("%Y-%m-%d"),
+                    }
+                )
+        write_csv(root / f"clubelo/ratings/{club['name']}.csv", rows)
+
+
+def make_ppda(rng: random.Random) -> str:
+    return f"{{'att': {rng.randint(100, 400)}, 'def': {rng.randint(10, 40)}}}"
+
+
+def get_season_start(season: int) -> datetime:
+    return datetime(season, 8, 10, 14, tzinfo=UTC)
+
+
+def get_understat_fixture_id(season: int, fixture: dict) -> int:
+    return season * FIXTURE_BOUND + fixture["id"]
+
+
+def write_csv(path: Path, rows: list[dict]):
+    """Write records to a CSV file, with columns in order of first appearance."""
+    columns = list(dict.fromkeys(column for row in rows for column in row))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json_xz(path: Path, data):
+    """Write data to an xz-compressed JSON file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with lzma.open(path, "wt", encoding="utf-8") as f:
+        json.dump(data, f)
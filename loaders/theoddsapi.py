@@ -2,11 +2,49 @@ import json
 import lzma
 import warnings
 from datetime import datetime
+from pathlib import Path
 
 import polars as pl
 
-from loaders.constants import DATA_DIR
+from loaders.cache import (
+    get_fingerprint,
+    is_fresh,
+    write_tables,
+    write_tables_parallel,
+)
+from loaders.constants import CACHE_DIR, DATA_DIR
 from loaders.fpl import get_gameweeks
+from loaders.schemas import scan_csv
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# ISO 8601 formats that timestamps are parsed from. Timestamps without an offset
+# are taken to be in UTC.
+ISO_FORMATS = [
+    "%Y-%m-%dT%H:%M:%S%.fZ",
+    "%Y-%m-%dT%H:%M:%S%.f%:z",
+    "%Y-%m-%dT%H:%M:%S%.f",
+]
+
+ODDS_SCHEMA = {
+    "season": pl.Int64,
+    "gameweek": pl.Int64,
+    "match": pl.UInt32,
+    "home_team": pl.String,
+    "away_team": pl.String,
+    "commence_time": pl.Datetime(time_zone="UTC"),
+    "bookmaker_index": pl.UInt32,
+    "bookmaker": pl.String,
+    "bookmaker_title": pl.String,
+    "last_update": pl.Datetime(time_zone="UTC"),
+    "market_index": pl.UInt32,
+    "market": pl.String,
+    "market_last_update": pl.String,
+    "outcome_index": pl.UInt32,
+    "outcome": pl.String,
+    "point": pl.Float64,
+    "price": pl.Float64,
+}
 
 
 def load_theoddsapi(
@@ -14,42 +52,160 @@ def load_theoddsapi(
     current_season: int,
     next_gameweek: int,
     cutoff_time: datetime | None = None,
-):
-    """Load odds data from the-odds-api.com."""
+    workers: int | None = None,
+) -> tuple[pl.LazyFrame, pl.LazyFrame]:
+    """Load odds data from the-odds-api.com.
+
+    Returns the matches, and the issues found while building them (see
+    `build_theoddsapi`).
+    """
+    odds = load_theoddsapi_odds(seasons, current_season, next_gameweek, workers)
+    return build_theoddsapi(odds, current_season, next_gameweek, cutoff_time)
+
+
+def load_theoddsapi_odds(
+    seasons: list[int],
+    current_season: int | None = None,
+    next_gameweek: int | None = None,
+    workers: int | None = None,
+) -> pl.LazyFrame:
+    """Load odds for all season and gameweek combinations as a long-format table.
 
-    # Load odds data for all season and gameweek combinations
-    unique_matches = dict()
+    Each row holds the price of a single outcome, in a single market, offered by
+    a single bookmaker. Matches without any bookmakers are kept as a single row
+    with a null bookmaker. If `workers` is given, uncached odds are converted in
+    that many processes.
+    """
+    snapshots = []
     for season in sorted(season for season in seasons if season >= 2021):
         for gameweek in sorted(get_gameweeks(season)):
-            if season == current_season and gameweek > next_gameweek:
+            if _is_future(season, gameweek, current_season, next_gameweek):
                 break
-            # Important: Sorted order prevents overwriting future data with past data
-            unique_matches.update(
-                _load_theoddsapi(season, gameweek, cutoff_time=cutoff_time)
-            )
-
-    # Construct a Polars DataFrame from the unique matches
-    data = {
-        "season": [],
-        "team_h": [],
-        "team_a": [],
-        "commence_time": [],
-        "bookmakers": [],
-    }
-    for match_key, match_data in unique_matches.items():
-        season, team_h, team_a = match_key
-        data["season"].append(season)
-        data["team_h"].append(team_h)
-        data["team_a"].append(team_a)
-        data["commence_time"].append(
-            datetime.fromisoformat(match_data["commence_time"])
+            snapshots.append((season, gameweek))
+    if workers is not None:
+        cache_theoddsapi_parallel(snapshots, workers)
+
+    frames = [
+        pl.scan_parquet(cache_theoddsapi(season, gameweek) / "odds.parquet")
+        for season, gameweek in snapshots
+    ]
+    if not frames:
+        return pl.LazyFrame(schema=ODDS_SCHEMA)
+    return pl.concat(frames, how="vertical")
+
+
+def build_theoddsapi(
+    odds: pl.LazyFrame,
+    current_season: int | None,
+    next_gameweek: int | None,
+    cutoff_time: datetime | None = None,
+) -> tuple[pl.LazyFrame, pl.LazyFrame]:
+    """Build a frame of unique matches, with nested bookmaker data.
+
+    Also returns a frame of issues in the odds data (matches that occur more than
+    once in a snapshot, and bookmakers updated after the cutoff time). It shares
+    its plan with the matches, so that both can be collected in a single pass,
+    after which `warn_theoddsapi_issues` reports them.
+    """
+
+    if next_gameweek is not None:
+        odds = odds.filter(
+            (pl.col("season") != current_season) | (pl.col("gameweek") <= next_gameweek)
         )
-        data["bookmakers"].append(match_data["bookmakers"])
 
-    df = pl.LazyFrame(data)
+    # Ignore any bookmaker data updated after the cutoff time
+    # This should not happen if data is being collected correctly
+    valid = pl.col("bookmaker").is_not_null()
+    ignored = pl.lit(False)
+    if cutoff_time:
+        ignored = valid & (pl.col("last_update") > cutoff_time)
+        valid = valid & (pl.col("last_update") <= cutoff_time)
+    odds = odds.with_columns(valid.alias("valid"), ignored.alias("ignored"))
+
+    # Count occurences of each match and ignored bookmakers in each snapshot
+    issues = (
+        odds.group_by(["season", "gameweek", "home_team", "away_team"])
+        .agg(
+            pl.col("match").n_unique().alias("occurences"),
+            pl.col("bookmaker_index")
+            .filter(pl.col("ignored"))
+            .n_unique()
+            .alias("ignored_bookmakers"),
+        )
+        .filter((pl.col("occurences") > 1) | (pl.col("ignored_bookmakers") > 0))
+        .sort(["season", "gameweek", "home_team", "away_team"])
+    )
+
+    # Count the bookmakers available for each occurence of a match
+    match_keys = ["season", "gameweek", "match"]
+    matches = odds.group_by(match_keys).agg(
+        pl.first("home_team"),
+        pl.first("away_team"),
+        pl.first("commence_time"),
+        pl.col("bookmaker_index").filter(pl.col("valid")).n_unique().alias("count"),
+    )
+
+    # Keep one occurence of each match. Later gameweeks take priority, followed by
+    # the occurence with the most bookmakers, followed by later occurences.
+    matches = (
+        matches.sort(match_keys)
+        .group_by(["season", "home_team", "away_team"], maintain_order=True)
+        .agg(pl.all().sort_by(["gameweek", "count", "match"]).last())
+        .drop("count")
+    )
+
+    # Nest outcomes into markets, markets into bookmakers, and bookmakers into matches
+    odds = odds.drop("ignored").join(
+        matches.select(match_keys), on=match_keys, how="semi"
+    )
+    odds = odds.sort([*match_keys, "bookmaker_index", "market_index", "outcome_index"])
+    markets = odds.group_by(
+        [*match_keys, "bookmaker_index", "market_index"], maintain_order=True
+    ).agg(
+        pl.first("bookmaker", "bookmaker_title", "last_update", "market", "valid"),
+        pl.first("market_last_update"),
+        pl.struct(
+            pl.col("outcome").alias("name"),
+            pl.col("price"),
+            pl.col("point"),
+        )
+        .filter(pl.col("outcome").is_not_null())
+        .alias("outcomes"),
+    )
+    bookmakers = markets.group_by(
+        [*match_keys, "bookmaker_index"], maintain_order=True
+    ).agg(
+        pl.first("bookmaker", "bookmaker_title", "last_update", "valid"),
+        pl.struct(
+            pl.col("market").alias("key"),
+            pl.col("market_last_update").alias("last_update"),
+            pl.col("outcomes"),
+        )
+        .filter(pl.col("market").is_not_null())
+        .alias("markets"),
+    )
+    bookmakers = bookmakers.group_by(match_keys, maintain_order=True).agg(
+        pl.struct(
+            pl.col("bookmaker").alias("key"),
+            pl.col("bookmaker_title").alias("title"),
+            pl.col("last_update").dt.to_string(TIMESTAMP_FORMAT),
+            pl.col("markets"),
+        )
+        .filter(pl.col("valid"))
+        .alias("bookmakers"),
+    )
+
+    df = matches.join(bookmakers, on=match_keys, how="left", maintain_order="left")
+    df = df.select(
+        pl.col("season"),
+        pl.col("home_team").alias("team_h"),
+        pl.col("away_team").alias("team_a"),
+        pl.col("commence_time"),
+        pl.col("bookmakers"),
+    )
 
     # Add FPL codes to teams
-    team_ids = pl.scan_csv(DATA_DIR / "theoddsapi/team_ids.csv")
+    team_ids = scan_csv(DATA_DIR / "theoddsapi/team_ids.csv", "theoddsapi/team_ids")
     for column in ["team_h", "team_a"]:
         df = df.join(
             team_ids.select(
@@ -60,49 +216,145 @@ def load_theoddsapi(
             how="left",
         )
 
-    return df.lazy()
+    return df, issues
+
+
+def warn_theoddsapi_issues(issues: pl.DataFrame):
+    """Warn about the issues found by `build_theoddsapi`, once collected."""
+    duplicates = issues.filter(pl.col("occurences") > 1)
+    for season, gameweek, home_team, away_team in duplicates.select(
+        "season", "gameweek", "home_team", "away_team"
+    ).iter_rows():
+        warnings.warn(
+            f"Found multiple occurences for {home_team} vs {away_team} in the "
+            f"{season} season, gameweek {gameweek}. Keeping the one with the most "
+            f"bookmakers...",
+            stacklevel=2,
+        )
+
+    ignored = issues.get_column("ignored_bookmakers").sum()
+    if ignored:
+        warnings.warn(
+            f"Ignoring {ignored} bookmaker(s) updated after cutoff time.",
+            stacklevel=2,
+        )
+
+
+def cache_theoddsapi(season: int, gameweek: int) -> Path:
+    """Convert odds data for a season and gameweek to Parquet (if not yet cached)."""
+    directory = get_theoddsapi_cache_dir(season, gameweek)
+    fingerprint = get_fingerprint([get_theoddsapi_path(season, gameweek)])
+    if not is_fresh(directory, fingerprint):
+        write_tables(directory, _convert_theoddsapi_file(season, gameweek), fingerprint)
+    return directory
+
 
+def cache_theoddsapi_parallel(snapshots: list[tuple[int, int]], workers: int):
+    """Convert uncached odds data using a pool of processes."""
+    stale = []
+    for season, gameweek in snapshots:
+        directory = get_theoddsapi_cache_dir(season, gameweek)
+        fingerprint = get_fingerprint([get_theoddsapi_path(season, gameweek)])
+        if not is_fresh(directory, fingerprint):
+            stale.append((directory, fingerprint, (season, gameweek)))
+    write_tables_parallel(stale, _convert_theoddsapi_file, workers)
 
-def _load_theoddsapi(
-    season: int, gameweek: int, cutoff_time: datetime | None = None
-) -> dict:
-    """Load odds data from the-odds-api.com for a given season and gameweek."""
 
-    path = DATA_DIR / f"theoddsapi/{season}/{gameweek}.json.xz"
-    with lzma.open(path, "rt", encoding="utf-8") as f:
+def _convert_theoddsapi_file(season: int, gameweek: int) -> dict[str, pl.DataFrame]:
+    with lzma.open(get_theoddsapi_path(season, gameweek), "rt", encoding="utf-8") as f:
         data = json.load(f)
+    return {"odds": convert_theoddsapi(data, season, gameweek)}
 
-    # Filter out any bookmaker data updated after the cutoff time
-    # This should not happen if data is being collected correctly
-    if cutoff_time:
-        for match in data:
-            bookmakers = []
-            for bookmaker in match["bookmakers"]:
-                last_update = datetime.fromisoformat(bookmaker["last_update"])
-                if last_update <= cutoff_time:
-                    bookmakers.append(bookmaker)
-                else:
-                    warnings.warn(
-                        "Ignoring bookmaker data updated after cutoff time. ",
-                        stacklevel=2,
-                    )
-            match["bookmakers"] = bookmakers
-
-    # Remove duplicates by picking the occurence of each match with the most bookmakers
-    unique_matches = dict()
-    for match in data:
-        match_key = (season, match["home_team"], match["away_team"])
-        if match_key not in unique_matches:
-            unique_matches[match_key] = match
-        else:
-            warnings.warn(
-                f"Found multiple occurences for {match['home_team']} vs "
-                f"{match['away_team']} in the {season} season, gameweek {gameweek}. "
-                f"Keeping the one with the most bookmakers...",
-                stacklevel=2,
-            )
-            unique_matches[match_key] = max(
-                match, unique_matches[match_key], key=lambda x: len(x["bookmakers"])
-            )
-
-    return unique_matches
+
+def get_theoddsapi_path(season: int, gameweek: int) -> Path:
+    """Return the path to the odds data for a season and gameweek."""
+    return DATA_DIR / f"theoddsapi/{season}/{gameweek}.json.xz"
+
+
+def get_theoddsapi_cache_dir(season: int, gameweek: int) -> Path:
+    """Return the cache directory for the odds data of a season and gameweek."""
+    return CACHE_DIR / f"theoddsapi/{season}/{gameweek}"
+
+
+def convert_theoddsapi(data: list[dict], season: int, gameweek: int) -> pl.DataFrame:
+    """Flatten odds data for a season and gameweek into a long-format table."""
+    if not data:
+        return pl.DataFrame(schema=ODDS_SCHEMA)
+
+    df = pl.DataFrame(data, infer_schema_length=None).with_row_index("match")
+
+    df = _explode(df, "bookmakers", "match", "bookmaker_index")
+    df = df.with_columns(
+        _field(df, "bookmakers", "key").alias("bookmaker"),
+        _field(df, "bookmakers", "title").alias("bookmaker_title"),
+        _field(df, "bookmakers", "last_update").alias("last_update"),
+        _field(df, "bookmakers", "markets").alias("markets"),
+    )
+    df = _explode(df, "markets", ["match", "bookmaker_index"], "market_index")
+    df = df.with_columns(
+        _field(df, "markets", "key").alias("market"),
+        _field(df, "markets", "last_update").alias("market_last_update"),
+        _field(df, "markets", "outcomes").alias("outcomes"),
+    )
+    df = _explode(
+        df, "outcomes", ["match", "bookmaker_index", "market_index"], "outcome_index"
+    )
+    df = df.with_columns(
+        _field(df, "outcomes", "name").alias("outcome"),
+        _field(df, "outcomes", "point").alias("point"),
+        _field(df, "outcomes", "price").alias("price"),
+        pl.lit(season).alias("season"),
+        pl.lit(gameweek).alias("gameweek"),
+    )
+
+    # Parse timestamps and enforce a consistent schema
+    timestamps = ["commence_time", "last_update"]
+    for column in timestamps:
+        raw = pl.col(column).cast(pl.String)
+        parsed = _parse_timestamp(raw)
+        unparsed = df.filter(parsed.is_null() & raw.is_not_null())
+        if not unparsed.is_empty():
+            raise ValueError(f"Could not parse {column} '{unparsed[column][0]}'.")
+        df = df.with_columns(parsed.alias(column))
+    return df.select(
+        pl.col(column).cast(dtype) for column, dtype in ODDS_SCHEMA.items()
+    )
+
+
+def _parse_timestamp(column: pl.Expr) -> pl.Expr:
+    """Parse ISO 8601 timestamps in UTC, with or without fractional seconds."""
+    return pl.coalesce(
+        column.str.to_datetime(format, time_unit="us", time_zone="UTC", strict=False)
+        for format in ISO_FORMATS
+    )
+
+
+def _explode(
+    df: pl.DataFrame, column: str, over: str | list[str], index: str
+) -> pl.DataFrame:
+    """Explode a list column, numbering the exploded items within each group."""
+    df = df.explode(column)
+    return df.with_columns(
+        pl.when(pl.col(column).is_not_null())
+        .then(pl.int_range(pl.len(), dtype=pl.UInt32).over(over))
+        .alias(index)
+    )
+
+
+def _field(df: pl.DataFrame, column: str, name: str) -> pl.Expr:
+    """Select a field from a struct column, or null if the field is missing."""
+    dtype = df.schema[column]
+    if isinstance(dtype, pl.Struct) and name in [f.name for f in dtype.fields]:
+        return pl.col(column).struct.field(name)
+    return pl.lit(None)
+
+
+def _is_future(
+    season: int,
+    gameweek: int,
+    current_season: int | None,
+    next_gameweek: int | None,
+) -> bool:
+    if next_gameweek is None:
+        return False
+    return season == current_season and gameweek > next_gameweek
@@ -1,12 +1,17 @@
 import glob
+import os
+import shutil
 from datetime import datetime
+from pathlib import Path
 
 import polars as pl
 
-from loaders.constants import DATA_DIR
+from loaders.cache import get_fingerprint, is_fresh, write_tables
+from loaders.constants import CACHE_DIR, DATA_DIR
+from loaders.schemas import SCHEMA_VERSION, SCHEMAS, scan_csv
 
 
-def load_understat(seasons: list[int], cutoff_time: datetime):
+def load_understat(seasons: list[int], cutoff_time: datetime | None = None):
     """Loads local understat data for the given seasons."""
 
     # Load local data
@@ -40,21 +45,6 @@ def load_understat(seasons: list[int], cutoff_time: datetime):
     # Any unmapped fixtures are for matches outside the EPL. Remove them.
     players = players.filter(pl.col("fpl_fixture_id").is_not_null())
 
-    # Extract PPDA stats and add to teams
-    pattern = r"\{'att':\s*(\d+),\s*'def':\s*(\d+)\}"
-    teams = teams.with_columns(
-        pl.col("ppda").str.extract(pattern, 1).cast(pl.Int32).alias("ppda_att"),
-        pl.col("ppda").str.extract(pattern, 2).cast(pl.Int32).alias("ppda_def"),
-        pl.col("ppda_allowed")
-        .str.extract(pattern, 1)
-        .cast(pl.Int32)
-        .alias("ppda_allowed_att"),
-        pl.col("ppda_allowed")
-        .str.extract(pattern, 2)
-        .cast(pl.Int32)
-        .alias("ppda_allowed_def"),
-    ).drop(["ppda", "ppda_allowed"])
-
     # Add understat fixture IDs to teams
     for column in ["h", "a"]:
         teams = teams.join(
@@ -101,30 +91,37 @@ def load_understat(seasons: list[int], cutoff_time: datetime):
     )
 
     # Filter records using the cutoff time
+    if cutoff_time is not None:
+        players, teams = apply_understat_cutoff(players, teams, cutoff_time)
+
+    return players, teams
+
+
+def apply_understat_cutoff(
+    players: pl.LazyFrame, teams: pl.LazyFrame, cutoff_time: datetime
+) -> tuple[pl.LazyFrame, pl.LazyFrame]:
+    """Remove understat records on or after the cutoff time."""
     players = players.filter(pl.col("date") < cutoff_time.date())
     teams = teams.filter(pl.col("date") < cutoff_time.date())
-
     return players, teams
 
 
 def load_players(seasons: list[int]) -> pl.LazyFrame:
     """Load player data."""
-    return (
-        pl.scan_csv(
-            DATA_DIR / "understat/player/matches/*.csv",
-            try_parse_dates=True,
-            raise_if_empty=False,
-            include_file_paths="file_path",
-        )
-        .with_columns(
-            # Rename the fixture ID column to avoid confusion
-            pl.col("id").alias("fixture_id"),
-            # Extract player ID from file path
-            pl.col("file_path").str.extract(r"(\d+)\.csv").cast(pl.Int32).alias("id"),
-        )
-        .drop("file_path")
-        .filter(pl.col("season").is_in(seasons))
-    )
+    directory = ingest_players()
+    paths = [directory / f"season={season}/data.parquet" for season in seasons]
+    paths = [path for path in paths if path.exists()]
+    if not paths:
+        return pl.LazyFrame(schema=get_player_schema())
+    return pl.scan_parquet(paths)
+
+
+def get_player_schema() -> dict[str, pl.DataType]:
+    """Return the schema of ingested player data, for its registered columns."""
+    schema = dict(SCHEMAS["understat/player_matches"])
+    schema["id"] = pl.Int32
+    schema["fixture_id"] = pl.Int64
+    return schema
 
 
 def load_teams(seasons: list[int]) -> pl.LazyFrame:
@@ -132,21 +129,162 @@ def load_teams(seasons: list[int]) -> pl.LazyFrame:
 
     frames = []
     for season in seasons:
-        path = DATA_DIR / f"understat/season/{season}/teams/*.csv"
-        if glob.glob(str(path)):
-            frames.append(
-                pl.scan_csv(
-                    path,
-                    try_parse_dates=True,
-                    raise_if_empty=False,
-                ).with_columns(
-                    pl.lit(season).alias("season"),
-                )
-            )
+        directory = ingest_teams(season)
+        if directory is not None:
+            frames.append(pl.scan_parquet(directory / "data.parquet"))
 
     return pl.concat(frames, how="diagonal")
 
 
+def ingest_players() -> Path:
+    """Compact per-player match files into a season-partitioned Parquet store.
+
+    Each player's file holds matches from several seasons. An index records which
+    seasons each file holds, so that only the files that changed are read to
+    find the affected seasons, and only their partitions are rewritten.
+    """
+    paths = sorted(glob.glob(str(DATA_DIR / "understat/player/matches/*.csv")))
+    directory = CACHE_DIR / "understat/player/matches"
+    fingerprint = get_fingerprint(paths, SCHEMA_VERSION)
+    if is_fresh(directory, fingerprint):
+        return directory
+
+    index_path = directory / "files.parquet"
+    previous = pl.read_parquet(index_path) if index_path.exists() else None
+    index = index_player_files(paths, previous)
+    seasons = index.get_column("season").drop_nulls().unique().sort().to_list()
+
+    # Remove partitions for seasons that are no longer in any file
+    partition_names = {f"season={season}" for season in seasons}
+    for partition in directory.glob("season=*"):
+        if partition.name not in partition_names:
+            shutil.rmtree(partition)
+
+    # Find the partitions built from files that have since changed
+    stale = {}
+    for season in seasons:
+        season_paths = (
+            index.filter(pl.col("season") == season).get_column("path").to_list()
+        )
+        season_fingerprint = get_fingerprint(season_paths, SCHEMA_VERSION)
+        if not is_fresh(directory / f"season={season}", season_fingerprint):
+            stale[season] = season_fingerprint
+
+    if stale:
+        stale_paths = (
+            index.filter(pl.col("season").is_in(list(stale)))
+            .get_column("path")
+            .unique()
+            .sort()
+            .to_list()
+        )
+        players = (
+            scan_csv(
+                stale_paths, "understat/player_matches", include_file_paths="file_path"
+            )
+            .filter(pl.col("season").is_in(list(stale)))
+            .with_columns(
+                # Rename the fixture ID column to avoid confusion
+                pl.col("id").alias("fixture_id"),
+                # Extract player ID from file path
+                pl.col("file_path")
+                .str.extract(r"(\d+)\.csv")
+                .cast(pl.Int32)
+                .alias("id"),
+            )
+            .drop("file_path")
+            .collect()
+        )
+        partitions = players.partition_by("season", as_dict=True)
+        for season, season_fingerprint in stale.items():
+            write_tables(
+                directory / f"season={season}",
+                {"data": partitions[(season,)]},
+                season_fingerprint,
+            )
+
+    write_tables(directory, {"files": index}, fingerprint)
+    return directory
+
+
+def index_player_files(paths: list[str], previous: pl.DataFrame | None) -> pl.DataFrame:
+    """Index the seasons held by each player file, with its size and modification time.
+
+    Files that are unchanged since the previous index are not read again.
+    """
+    schema = {
+        "path": pl.String,
+        "size": pl.Int64,
+        "mtime_ns": pl.Int64,
+        "season": pl.Int64,
+    }
+    stats = [os.stat(path) for path in paths]
+    files = pl.DataFrame(
+        {
+            "path": paths,
+            "size": [stat.st_size for stat in stats],
+            "mtime_ns": [stat.st_mtime_ns for stat in stats],
+        },
+        schema={column: schema[column] for column in ["path", "size", "mtime_ns"]},
+    )
+    if previous is None:
+        previous = pl.DataFrame(schema=schema)
+
+    keys = ["path", "size", "mtime_ns"]
+    unchanged = previous.join(files, on=keys, how="semi")
+    changed = files.join(previous, on=keys, how="anti")
+    seasons = pl.DataFrame(schema={"path": pl.String, "season": pl.Int64})
+    if changed.height > 0:
+        seasons = (
+            scan_csv(
+                changed.get_column("path").to_list(),
+                "understat/player_matches",
+                include_file_paths="path",
+            )
+            .select("path", "season")
+            .unique()
+            .collect()
+        )
+
+    # Files without any matches are kept, so that they are not read again
+    changed = changed.join(seasons, on="path", how="left")
+    return pl.concat([unchanged, changed]).sort("path", "season")
+
+
+def ingest_teams(season: int) -> Path | None:
+    """Compact per-team match files for a season into a Parquet store."""
+    paths = sorted(glob.glob(str(DATA_DIR / f"understat/season/{season}/teams/*.csv")))
+    if not paths:
+        return None
+
+    directory = CACHE_DIR / f"understat/teams/season={season}"
+    fingerprint = get_fingerprint(paths, SCHEMA_VERSION)
+    if is_fresh(directory, fingerprint):
+        return directory
+
+    teams = scan_csv(paths, "understat/teams").with_columns(
+        pl.lit(season).alias("season"),
+    )
+
+    # Extract PPDA stats from their string representations
+    pattern = r"\{'att':\s*(\d+),\s*'def':\s*(\d+)\}"
+    teams = teams.with_columns(
+        pl.col("ppda").str.extract(pattern, 1).cast(pl.Int32).alias("ppda_att"),
+        pl.col("ppda").str.extract(pattern, 2).cast(pl.Int32).alias("ppda_def"),
+        pl.col("ppda_allowed")
+        .str.extract(pattern, 1)
+        .cast(pl.Int32)
+        .alias("ppda_allowed_att"),
+        pl.col("ppda_allowed")
+        .str.extract(pattern, 2)
+        .cast(pl.Int32)
+        .alias("ppda_allowed_def"),
+    ).drop(["ppda", "ppda_allowed"])
+
+    write_tables(directory, {"data": teams.collect()}, fingerprint)
+    return directory
+
+
 def load_fixtures(seasons: list[str]) -> pl.LazyFrame:
     """Load fixture data."""
 
@@ -155,11 +293,7 @@ def load_fixtures(seasons: list[str]) -> pl.LazyFrame:
         path = DATA_DIR / f"understat/season/{season}/dates.csv"
         if path.exists():
             frames.append(
-                pl.scan_csv(
-                    path,
-                    try_parse_dates=True,
-                    raise_if_empty=False,
-                ).with_columns(
+                scan_csv(path, "understat/dates").with_columns(
                     pl.lit(season).alias("season"),
                 )
             )
@@ -169,12 +303,12 @@ def load_fixtures(seasons: list[str]) -> pl.LazyFrame:
 
 def load_player_ids() -> pl.LazyFrame:
     """Load FPL player ID mappings."""
-    return pl.scan_csv(DATA_DIR / "understat/player_ids.csv")
+    return scan_csv(DATA_DIR / "understat/player_ids.csv", "understat/player_ids")
 
 
 def load_team_ids() -> pl.LazyFrame:
     """Load FPL team ID mappings."""
-    return pl.scan_csv(DATA_DIR / "understat/team_ids.csv")
+    return scan_csv(DATA_DIR / "understat/team_ids.csv", "understat/team_ids")
 
 
 def load_fixture_ids(seasons: list[str]) -> pl.LazyFrame:
@@ -185,11 +319,7 @@ def load_fixture_ids(seasons: list[str]) -> pl.LazyFrame:
         path = DATA_DIR / f"understat/season/{season}/fixture_ids.csv"
         if path.exists():
             frames.append(
-                pl.scan_csv(
-                    path,
-                    try_parse_dates=True,
-                    raise_if_empty=False,
-                ).with_columns(
+                scan_csv(path, "understat/fixture_ids").with_columns(
                     pl.lit(season).alias("season"),
                 )
             )
@@ -42,33 +42,19 @@ def get_upcoming_elements(
     )
     df = df.drop(["team_h", "team_a"])
 
-    # Add elements for each team
+    # Add elements and their values for each team. Values come from a single
+    # snapshot, so they are already constant across upcoming gameweeks.
     df = df.join(
         static_elements.select(
             pl.col("season"),
             pl.col("team"),
             pl.col("id").alias("element"),
+            pl.col("now_cost").alias("value"),
         ),
         on=["season", "team"],
         how="inner",
     )
 
-    # Add values for each element
-    df = df.join(
-        static_elements.select(
-            pl.col("season"),
-            pl.col("id").alias("element"),
-            pl.col("now_cost").alias("value"),
-        ),
-        on=["season", "element"],
-        how="left",
-    )
-
-    # Forward fill any missing values
-    df = df.sort("kickoff_time").with_columns(
-        pl.col("value").forward_fill().over(["season", "element"])
-    )
-
     return df
 
 
@@ -101,15 +87,7 @@ def get_upcoming_static_teams(
     )
 
     # Duplicate for each upcoming gameweek
-    df = pl.concat(
-        [
-            static_teams.with_columns(pl.lit(gameweek).alias("gameweek"))
-            for gameweek in upcoming_gameweeks
-        ],
-        how="vertical",
-    )
-
-    return df
+    return expand_gameweeks(static_teams, upcoming_gameweeks)
 
 
 def get_upcoming_static_elements(
@@ -141,37 +119,30 @@ def get_upcoming_static_elements(
         "direct_freekicks_text",
         "penalties_order",
         "penalties_text",
+        # Availability information is only known for the next gameweek
+        "status",
+        "chance_of_playing_next_round",
+        "news",
+        "news_added",
     )
 
     # Duplicate for each upcoming gameweek
-    df = pl.concat(
-        [
-            df.with_columns(pl.lit(gameweek).alias("gameweek"))
-            for gameweek in upcoming_gameweeks
-        ],
-        how="vertical",
-    )
-
-    # Add availability information for only the next gameweek
-    df = df.join(
-        static_elements.select(
-            "season",
-            "gameweek",
-            "code",
-            "status",
-            "chance_of_playing_next_round",
-            "news",
-            "news_added",
-        ).filter(
-            pl.col("season").eq(season) & pl.col("gameweek").eq(min(upcoming_gameweeks))
-        ),
-        on=["season", "gameweek", "code"],
-        how="left",
+    df = expand_gameweeks(df, upcoming_gameweeks)
+    df = df.with_columns(
+        pl.when(pl.col("gameweek") == min(upcoming_gameweeks)).then(pl.col(column))
+        for column in ["status", "chance_of_playing_next_round", "news", "news_added"]
     )
 
     return df
 
 
+def expand_gameweeks(df: pl.LazyFrame, gameweeks: list[int]) -> pl.LazyFrame:
+    """Repeat each record for every given gameweek, in order of gameweek."""
+    columns = get_columns(df)
+    gameweeks = pl.LazyFrame({"gameweek": gameweeks}, schema={"gameweek": pl.Int32})
+    return gameweeks.join(df.drop("gameweek"), how="cross").select(columns)
+
+
 def get_upcoming_fixtures(
     fixtures: pl.LazyFrame, season: int, upcoming_gameweeks: list[int]
 ) -> pl.LazyFrame:
@@ -1,3 +1,5 @@
+import re
+from collections import Counter
 from collections.abc import Iterable
 
 import polars as pl
@@ -20,17 +22,11 @@ def get_mapper(df: pl.DataFrame, from_col: str | Iterable[str], to_col: str) ->
     if not df.select(from_col).is_unique().all():
         raise ValueError(f"Column(s): {from_col} must be unique")
 
-    mapper = dict()
+    values = df.get_column(to_col).to_list()
     if isinstance(from_col, str):
-        for row in df.to_dicts():
-            key = row[from_col]
-            mapper[key] = row[to_col]
-    else:
-        for row in df.to_dicts():
-            key = tuple(row[col] for col in from_col)
-            mapper[key] = row[to_col]
-
-    return mapper
+        return dict(zip(df.get_column(from_col).to_list(), values, strict=True))
+    keys = zip(*(df.get_column(col).to_list() for col in from_col), strict=True)
+    return dict(zip(keys, values, strict=True))
 
 
 def get_teams_view(matches: pl.LazyFrame) -> pl.LazyFrame:
@@ -119,6 +115,23 @@ def force_lazyframe(df: pl.DataFrame | pl.LazyFrame) -> pl.LazyFrame:
     return df
 
 
+def collect_shared(
+    frames: list[pl.LazyFrame], log: bool = False, engine: str = "auto"
+) -> list[pl.DataFrame]:
+    """Collect LazyFrames together, so that common subplans are only run once."""
+    if log:
+        shared, avoided = count_shared_subplans(frames)
+        print(f"Shared subplans: {shared} ({avoided} recomputations avoided)")
+    return pl.collect_all(frames, engine=engine)
+
+
+def count_shared_subplans(frames: list[pl.LazyFrame]) -> tuple[int, int]:
+    """Count the subplans shared between LazyFrames, and the reuses of each."""
+    plan = pl.explain_all(frames)
+    uses = Counter(re.findall(r"CACHE\[id: ([^\]]+)\]", plan))
+    return len(uses), sum(uses.values()) - len(uses)
+
+
 def print_table(data: list[dict]):
     """Prints a list of dictionaries as a table."""
     df = pl.DataFrame(data)
@@ -1,12 +1,14 @@
 import argparse
 import random
-import subprocess
 
 import numpy as np
 import polars as pl
 
 from game.run import run
-from loaders.constants import DATA_REPO_PATH
+from loaders.freshness import finish_update, update_data
+from loaders.merged import profile_merged
+from loaders.synthetic import generate_data
+from loaders.utils import get_seasons
 from optimization.tune import tune
 from prediction.train import train
 from simulation.simulate import simulate
@@ -17,6 +19,16 @@ def main():
 
     # Set up command-line argument parsing
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Use local data without pulling the data repository",
+    )
+    parser.add_argument(
+        "--background-pull",
+        action="store_true",
+        help="Pull the data repository without waiting for it to finish",
+    )
     subparsers = parser.add_subparsers(dest="command", help="Commands")
 
     run_parser = subparsers.add_parser(
@@ -41,6 +53,7 @@ def main():
         default=[],
         help="Gameweeks to activate wildcards",
     )
+    run_parser.add_argument("--log", action="store_true", help="Log data loading times")
 
     simulate_parser = subparsers.add_parser("simulate", help="Simulate seasons")
     simulate_parser.add_argument(
@@ -54,31 +67,105 @@ def main():
     )
 
     subparsers.add_parser("tune", help="Tune hyperparameters")
-    subparsers.add_parser("train", help="Train models")
+    train_parser = subparsers.add_parser("train", help="Train models")
+    train_parser.add_argument(
+        "--engine",
+        choices=["auto", "in-memory", "streaming"],
+        default="auto",
+        help="Polars engine used to load data",
+    )
+    train_parser.add_argument(
+        "--report-memory",
+        action="store_true",
+        help="Report peak memory usage of loading data with each engine",
+    )
 
-    # Ensure the data repository is up to date
-    subprocess.run(
-        ["git", "pull"],
-        cwd=DATA_REPO_PATH,
-        capture_output=True,
-        text=True,
-        check=True,
+    profile_parser = subparsers.add_parser(
+        "profile", help="Measure each stage of loading data"
+    )
+    profile_parser.add_argument(
+        "--season",
+        type=int,
+        required=True,
+        help="The last season to load",
+    )
+    profile_parser.add_argument(
+        "--output",
+        help="Path to export stage measurements and plans as JSON",
     )
 
-    # Execute the appropriate command based on user input
+    generate_parser = subparsers.add_parser(
+        "generate", help="Generate a synthetic data repository"
+    )
+    generate_parser.add_argument(
+        "--directory",
+        required=True,
+        help="Directory to write the data repository to",
+    )
+    generate_parser.add_argument(
+        "--seasons",
+        type=int,
+        nargs="+",
+        required=True,
+        help="Seasons to generate",
+    )
+    generate_parser.add_argument(
+        "--teams", type=int, default=20, help="Number of teams in each season"
+    )
+    generate_parser.add_argument(
+        "--players-per-team", type=int, default=30, help="Number of players per team"
+    )
+    generate_parser.add_argument(
+        "--bookmakers", type=int, default=10, help="Number of bookmakers per match"
+    )
+    generate_parser.add_argument(
+        "--gameweeks",
+        type=int,
+        help="Number of gameweeks released in the last season",
+    )
+    generate_parser.add_argument("--seed", type=int, default=0, help="Random seed")
+
     args = parser.parse_args()
+    if args.command is None:
+        parser.print_help()
+        return
+
+    # Synthetic data does not depend on the data repository
+    if args.command == "generate":
+        generate_data(
+            args.directory,
+            args.seasons,
+            args.teams,
+            args.players_per_team,
+            args.bookmakers,
+            args.gameweeks,
+            args.seed,
+        )
+        return
+
+    # Ensure the data repository is up to date
+    pull = update_data(offline=args.offline, background=args.background_pull)
+
+    # Execute the appropriate command based on user input
     if args.command == "tune":
         tune()
     elif args.command == "simulate":
         points = simulate(args.season, [], log=args.log)
         print(f"{args.season}: {points} points")
     elif args.command == "train":
-        train()
+        train(args.engine, args.report_memory)
         print("Models trained successfully.")
     elif args.command == "run":
-        run(args.season, args.next_gameweek, args.wildcard_gameweeks)
-    else:
-        parser.print_help()
+        run(args.season, args.next_gameweek, args.wildcard_gameweeks, log=args.log)
+    elif args.command == "profile":
+        profiler = profile_merged(get_seasons(args.season))
+        profiler.print()
+        if args.output:
+            profiler.to_json(args.output)
+
+    # Apply any background pull once the data is no longer read
+    if pull is not None:
+        finish_update(pull)
 
 
 def set_seed(seed: int):
@@ -1,3 +1,5 @@
+from collections.abc import Mapping
+
 from game.rules import DEF, FWD, GKP, MID
 from game.utils import format_currency
 from loaders.utils import print_table
@@ -9,14 +11,14 @@ def optimize_squad(
     initial_squad: list[int],
     initial_budget: int,
     initial_free_transfers: int,
-    now_costs: dict[int, int],
-    selling_prices: dict[int, int],
+    now_costs: Mapping[int, int],
+    selling_prices: Mapping[int, int],
     upcoming_gameweeks: list[int],
     wildcard_gameweeks: list[int],
-    total_points: dict[tuple[int, int], float],
-    element_types: dict[int, int],
-    teams: dict[int, int],
-    web_names: dict[int, str],
+    total_points: Mapping[tuple[int, int], float],
+    element_types: Mapping[int, int],
+    teams: Mapping[int, int],
+    web_names: Mapping[int, str],
     parameters: dict[str, float],
     log: bool = False,
 ):
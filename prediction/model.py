@@ -23,6 +23,7 @@ from .saves import make_saves_predictor
 from .tackles import make_tackles_predictor
 from .team_goals_scored import make_team_goals_scored_predictor
 from .total_points import make_total_points_predictor
+from .utils import get_selected_columns
 
 
 class PredictionModel:
@@ -100,6 +101,15 @@ class PredictionModel:
             ),
         ]
 
+    def get_player_columns(self) -> list[str]:
+        """Get the player columns read by the sub-models of the player pipeline."""
+        columns = []
+        for step in self.player_pipeline:
+            model = getattr(step, "model", None)
+            if isinstance(model, BaseEstimator):
+                columns.extend(get_selected_columns(model))
+        return list(dict.fromkeys(columns))
+
     def fit(self, players: pl.DataFrame, matches: pl.DataFrame):
         """Fit all sub-models in order."""
 
@@ -1,26 +1,40 @@
 import polars as pl
 
 from features.engineer_features import engineer_match_features, engineer_player_features
-from loaders.merged import load_merged
-from loaders.utils import force_dataframe, get_seasons
+from features.store import FeatureStore
+from loaders.cache import get_directory_fingerprint
+from loaders.constants import DATA_DIR
+from loaders.merged import compare_engines, load_merged
+from loaders.utils import get_seasons
 from prediction.model import PredictionModel
 from prediction.utils import save_model
 
 
-def train():
-    # Load player and match data
+def train(engine: str = "auto", report_memory: bool = False):
     seasons = get_seasons(2024)
-    players, matches, _ = load_merged(seasons)
-    players = players.collect()
-    matches = matches.collect()
 
-    # Engineer features for prediction
-    players = engineer_player_features(players)
-    matches = engineer_match_features(matches)
+    # Report the memory needed to load data with each engine
+    if report_memory:
+        for name, peak_rss in compare_engines(seasons).items():
+            print(f"Peak RSS ({name}): {peak_rss / 2**20:.0f} MiB")
 
-    # Collect lazyframes
-    players = force_dataframe(players)
-    matches = force_dataframe(matches)
+    # Load player and match data
+    players, matches, _ = load_merged(seasons, collect=True, log=True, engine=engine)
+
+    # Engineer the features read by the models, reusing them if the data is unchanged
+    columns = PredictionModel().get_player_columns()
+    tables = FeatureStore().get(
+        "train",
+        get_directory_fingerprint(DATA_DIR),
+        lambda: {
+            "players": engineer_player_features(players, columns=columns),
+            "matches": engineer_match_features(matches),
+        },
+        seasons=seasons,
+        player_columns=sorted(columns),
+    )
+    players = tables["players"]
+    matches = tables["matches"]
 
     # Fit and save models for simulations
     for season in seasons:
@@ -56,6 +56,15 @@ class FeatureSelector(TransformerMixin):
         return self.transformer.transform(X)
 
 
+def get_selected_columns(estimator: BaseEstimator) -> list[str]:
+    """Get the columns selected by any `FeatureSelector` within an estimator."""
+    columns = []
+    for value in estimator.get_params(deep=True).values():
+        if isinstance(value, FeatureSelector):
+            columns.extend(value.columns)
+    return list(dict.fromkeys(columns))
+
+
 class SeasonSplit(BaseCrossValidator):
     """Like `TimeSeriesSplit`, but splits by seasons"""
 
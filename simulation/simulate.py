@@ -1,8 +1,7 @@
-import polars as pl
-
-from features.engineer_features import engineer_match_features, engineer_player_features
+from features.incremental import IncrementalFeatures
+from features.store import FeatureStore
+from loaders.mappers import DenseGridMapper, DenseMapper
 from loaders.upcoming import get_upcoming_gameweeks
-from loaders.utils import force_dataframe, get_mapper
 from optimization.optimize import optimize_squad
 from optimization.parameters import get_parameters
 from prediction.model import PredictionModel
@@ -26,10 +25,13 @@ def simulate(
     # Initialize simulator and load model
     model = load_model(f"simulation_{season}")
     simulator = Simulator(season)
+    features = IncrementalFeatures(FeatureStore(), model.get_player_columns())
 
     # Simulate each gameweek
     while simulator.next_gameweek is not None:
-        roles = get_best_roles(simulator, model, wildcard_gameweeks, parameters, log)
+        roles = get_best_roles(
+            simulator, model, features, wildcard_gameweeks, parameters, log
+        )
         simulator.update(roles, wildcard_gameweeks, log=log)
 
     return simulator.season_points
@@ -38,6 +40,7 @@ def simulate(
 def get_best_roles(
     simulator: Simulator,
     model: PredictionModel,
+    features: IncrementalFeatures,
     wildcard_gameweeks: list[int],
     parameters: dict[str, float],
     log: bool = False,
@@ -55,41 +58,32 @@ def get_best_roles(
     players = simulator.players
     matches = simulator.matches
 
-    # Engineer features
-    players = engineer_player_features(players)
-    matches = engineer_match_features(matches)
-
-    players = force_dataframe(players)
-    matches = force_dataframe(matches)
-
-    # Keep only the features for upcoming gameweeks
+    # Engineer features for upcoming gameweeks
     upcoming_gameweeks = get_upcoming_gameweeks(
         next_gameweek, parameters["optimization_window_size"], last_gameweek
     )
-    players = players.filter(
-        (pl.col("season") == season) & (pl.col("gameweek").is_in(upcoming_gameweeks))
-    )
-    matches = matches.filter(
-        (pl.col("season") == season) & (pl.col("gameweek").is_in(upcoming_gameweeks))
-    )
+    players, matches = features.engineer(players, matches, season, upcoming_gameweeks)
 
     # Predict total points
     predictions = make_predictions(model, players, matches)
     predictions = aggregate_predictions(predictions)
 
-    # Map each prediction to an ID and gameweek
-    predictions = get_mapper(predictions, ["element", "gameweek"], "total_points")
-    for player in static_elements["id"]:
-        for gameweek in upcoming_gameweeks:
-            if (player, gameweek) not in predictions:
-                predictions[(player, gameweek)] = 0
+    # Map each prediction to an ID and gameweek, with 0 points for any others
+    predictions = DenseGridMapper.from_frame(
+        predictions,
+        "element",
+        "gameweek",
+        "total_points",
+        ids=static_elements["id"],
+        gameweeks=upcoming_gameweeks,
+    )
 
     # Optimize the squad
-    now_costs = get_mapper(static_elements, "id", "now_cost")
-    element_types = get_mapper(static_elements, "id", "element_type")
-    teams = get_mapper(static_elements, "id", "team")
+    now_costs = DenseMapper.from_frame(static_elements, "id", "now_cost")
+    element_types = DenseMapper.from_frame(static_elements, "id", "element_type")
+    teams = DenseMapper.from_frame(static_elements, "id", "team")
     selling_prices = get_selling_prices(squad, purchase_prices, now_costs)
-    web_names = get_mapper(static_elements, "id", "web_name")
+    web_names = DenseMapper.from_frame(static_elements, "id", "web_name")
     roles = optimize_squad(
         squad,
         budget,
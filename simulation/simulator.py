@@ -4,9 +4,10 @@ import polars as pl
 
 from game.rules import DEF, ELEMENT_TYPES, FWD, GKP, MID, MNG
 from game.utils import format_currency
+from loaders.asof import AsOfStore
 from loaders.fpl import load_fixtures, load_static_elements, load_static_teams
-from loaders.merged import load_merged
-from loaders.utils import get_mapper, get_seasons, print_table
+from loaders.mappers import DenseMapper
+from loaders.utils import get_seasons, print_table
 
 from .utils import (
     calculate_budget,
@@ -47,6 +48,9 @@ class Simulator:
         # Load results
         self.results = load_results(self.season).collect()
 
+        # Load historical data once, to be viewed as of each gameweek
+        self.store = AsOfStore(get_seasons(self.season, 2), self.season)
+
         # Update data for the first gameweek
         self.next_gameweek = self.first_gameweek
         self.reload()
@@ -67,20 +71,14 @@ class Simulator:
         )
 
         # Recalculate player selling prices
-        now_costs = get_mapper(self.static_elements, "id", "now_cost")
+        now_costs = DenseMapper.from_frame(self.static_elements, "id", "now_cost")
         self.selling_prices = get_selling_prices(
             self.squad, self.purchase_prices, now_costs
         )
 
         # Load historical and upcoming data
-        seasons = get_seasons(self.season, 2)
         upcoming_gameweeks = list(range(self.next_gameweek, self.last_gameweek + 1))
-        self.players, self.matches, self.managers = load_merged(
-            seasons, self.season, upcoming_gameweeks
-        )
-        self.players = self.players.collect()
-        self.matches = self.matches.collect()
-        self.managers = self.managers.collect()
+        self.players, self.matches, self.managers = self.store.load(upcoming_gameweeks)
 
     def update(self, roles: dict, wildcard_gameweeks: list[int], log: bool = False):
         """Updates the squad and results for the next gameweek."""
@@ -91,11 +89,15 @@ class Simulator:
 
         # Get the results of the gameweek
         gameweek_results = self.results.filter(pl.col("gameweek") == self.next_gameweek)
-        minutes = get_mapper(gameweek_results, "element", "minutes")
-        total_points = get_mapper(gameweek_results, "element", "total_points")
-        element_types = get_mapper(self.static_elements, "id", "element_type")
-        now_costs = get_mapper(self.static_elements, "id", "now_cost")
-        web_names = get_mapper(self.static_elements, "id", "web_name")
+        minutes = DenseMapper.from_frame(gameweek_results, "element", "minutes")
+        total_points = DenseMapper.from_frame(
+            gameweek_results, "element", "total_points"
+        )
+        element_types = DenseMapper.from_frame(
+            self.static_elements, "id", "element_type"
+        )
+        now_costs = DenseMapper.from_frame(self.static_elements, "id", "now_cost")
+        web_names = DenseMapper.from_frame(self.static_elements, "id", "web_name")
 
         # Calculate points scored by the squad
         substituted_roles = make_automatic_substitutions(roles, minutes, element_types)
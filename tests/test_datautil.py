@@ -1,20 +1,59 @@
-from datetime import datetime
+import json
+import lzma
+import os
+from datetime import UTC, datetime
 
 import polars as pl
+import pytest
 from polars.testing import assert_frame_equal
 
+from loaders.asof import AsOfStore
+from loaders.cache import FINGERPRINT_FILENAME
 from loaders.clubelo import load_clubelo
+from loaders.constants import CACHE_DIR, DATA_DIR
 from loaders.fpl import (
+    BOOTSTRAP_STATIC_MEMO,
+    cache_bootstrap_static,
+    compress_static_elements,
+    convert_bootstrap_static,
+    expand_static_element_intervals,
+    get_bootstrap_static_cache_dir,
+    get_deadline_times,
+    load_bootstrap_static,
     load_fixtures,
     load_fpl,
 )
-from loaders.merged import load_merged
-from loaders.understat import load_understat
+from loaders.freshness import build_manifest, get_changed_files, invalidate_caches
+from loaders.keys import (
+    GAMEWEEK_BOUND,
+    ID_BOUND,
+    check_key_bounds,
+    fixture_code_key,
+    gameweek_id_key,
+)
+from loaders.mappers import DenseGridMapper, DenseMapper
+from loaders.memo import LRUMemo
+from loaders.merged import get_deadline_time, load_merged
+from loaders.profiling import Profiler
+from loaders.schemas import scan_csv
+from loaders.synthetic import generate_data
+from loaders.theoddsapi import (
+    build_theoddsapi,
+    convert_theoddsapi,
+    get_theoddsapi_cache_dir,
+)
+from loaders.understat import load_players, load_understat
 from loaders.upcoming import (
     get_upcoming_fixtures,
     get_upcoming_gameweeks,
+    get_upcoming_static_elements,
+)
+from loaders.utils import (
+    collect_shared,
+    count_shared_subplans,
+    get_seasons,
+    get_teams_view,
 )
-from loaders.utils import get_seasons, get_teams_view
 
 
 def test_load_clubelo():
@@ -156,6 +195,110 @@ def test_load_fpl():
     )
 
 
+def test_cache_bootstrap_static():
+    # Cached tables should match a direct conversion of the snapshot
+    path = cache_bootstrap_static(2024, 1)
+    expected = convert_bootstrap_static(load_bootstrap_static(2024, 1))
+    for name, table in expected.items():
+        assert_frame_equal(pl.read_parquet(path / f"{name}.parquet"), table)
+
+
+def test_convert_theoddsapi(tmp_path, monkeypatch):
+    # Each outcome should be a row, and matches without bookmakers should be kept
+    outcomes = [{"name": "Arsenal", "price": 1.5}, {"name": "Draw", "price": 4.0}]
+    markets = [
+        {"key": "h2h", "last_update": "2024-08-16T12:00:00Z", "outcomes": outcomes}
+    ]
+    data = [
+        {
+            "home_team": "Arsenal",
+            "away_team": "Chelsea",
+            "commence_time": "2024-08-17T14:00:00Z",
+            "bookmakers": [
+                {
+                    "key": key,
+                    "title": key.title(),
+                    "last_update": "2024-08-16T12:00:00Z",
+                    "markets": markets,
+                }
+                for key in ["betfair", "unibet"]
+            ],
+        },
+        {
+            "home_team": "Everton",
+            "away_team": "Fulham",
+            "commence_time": "2024-08-17T14:00:00Z",
+            "bookmakers": [],
+        },
+    ]
+    odds = convert_theoddsapi(data, 2024, 1)
+    assert odds.height == 5
+    assert odds["bookmaker_index"].to_list() == [0, 0, 1, 1, None]
+    assert odds["outcome_index"].to_list() == [0, 1, 0, 1, None]
+    assert odds["price"].to_list() == [1.5, 4.0, 1.5, 4.0, None]
+    assert odds["point"].null_count() == 5
+    assert odds["last_update"][0] == datetime(2024, 8, 16, 12, tzinfo=UTC)
+    assert convert_theoddsapi([], 2024, 1).is_empty()
+
+    # Timestamps may have fractional seconds or an offset
+    data[0]["commence_time"] = "2024-08-17T15:00:00+01:00"
+    data[0]["bookmakers"][1]["last_update"] = "2024-08-16T12:30:00.250Z"
+    odds = convert_theoddsapi(data, 2024, 1)
+    assert odds["commence_time"][0] == datetime(2024, 8, 17, 14, tzinfo=UTC)
+    assert odds["last_update"][2] == datetime(2024, 8, 16, 12, 30, 0, 250000, UTC)
+    with pytest.raises(ValueError):
+        convert_theoddsapi([{**data[0], "commence_time": "17/08/2024"}], 2024, 1)
+
+    # Duplicate matches and bookmakers updated after the cutoff are reported
+    monkeypatch.chdir(tmp_path)
+    path = DATA_DIR / "theoddsapi/team_ids.csv"
+    path.parent.mkdir(parents=True)
+    path.write_text("theoddsapi_name,fpl_code\nArsenal,3\n")
+    odds = convert_theoddsapi([*data, data[1]], 2024, 1)
+    cutoff_time = datetime(2024, 8, 16, 12, 15, tzinfo=UTC)
+    _, issues = build_theoddsapi(odds.lazy(), 2024, 1, cutoff_time)
+    issues = issues.collect()
+    assert issues.select("home_team", "occurences", "ignored_bookmakers").rows() == [
+        ("Arsenal", 1, 1),
+        ("Everton", 2, 0),
+    ]
+
+
+def test_static_element_intervals():
+    # Expanding intervals should restore the original records, including gaps
+    static_elements = pl.DataFrame(
+        {
+            "id": [1, 1, 1, 1, 2, 2, 2],
+            "gameweek": [1, 2, 3, 5, 1, 2, 3],
+            "now_cost": [50, 50, 51, 51, 60, 60, 60],
+            "status": ["a", "d", "d", "d", None, None, "a"],
+        },
+        schema_overrides={"gameweek": pl.Int32},
+    )
+    intervals = compress_static_elements(static_elements)
+    assert intervals["now_cost"].height == 4
+    assert intervals["status"].height == 5
+    expanded = expand_static_element_intervals(
+        {
+            column: table.lazy().with_columns(pl.lit(2024).alias("season"))
+            for column, table in intervals.items()
+        }
+    ).collect()
+    assert_frame_equal(
+        expanded.drop("season"),
+        static_elements.select(expanded.drop("season").columns),
+    )
+
+
+def test_get_deadline_time():
+    # Deadlines from the events index should match the bootstrap static snapshots
+    for gameweek in [1, 20, 38]:
+        events = load_bootstrap_static(2024, gameweek)["events"]
+        event = next(event for event in events if event["id"] == gameweek)
+        expected = datetime.fromisoformat(event["deadline_time"])
+        assert get_deadline_time(2024, gameweek) == expected
+
+
 def test_load_understat():
     # Load understat data
     players, teams = load_understat([2021], datetime.max)
@@ -340,6 +483,350 @@ def test_load_merged():
     assert teams.get_column("clb_elo").null_count() == 0
 
 
+def test_asof_store():
+    # Views from the store should match loading from scratch
+    seasons = [2023, 2024]
+    store = AsOfStore(seasons, 2024)
+    for next_gameweek in [1, 20]:
+        upcoming_gameweeks = list(range(next_gameweek, 39))
+        expected = load_merged(seasons, 2024, upcoming_gameweeks)
+        for df, lf in zip(store.load(upcoming_gameweeks), expected, strict=True):
+            assert_frame_equal(df, lf.collect())
+
+
+def test_collect_shared():
+    # A subplan used by several frames should be shared and only run once
+    base = pl.LazyFrame({"a": [1, 2, 3]}).with_columns(b=pl.col("a") * 2)
+    frames = [base.filter(pl.col("a") > 1), base.select(pl.col("b").sum())]
+    shared, avoided = count_shared_subplans(frames)
+    assert shared == 1
+    assert avoided == 1
+    collected = collect_shared(frames)
+    for frame, df in zip(frames, collected, strict=True):
+        assert_frame_equal(frame.collect(), df)
+
+
+def test_scan_csv(tmp_path):
+    # Registered columns should have fixed types, regardless of their values
+    path = tmp_path / "ratings.csv"
+    path.write_text(
+        "Rank,Club,Elo,From,To,Extra\n,Arsenal,2000,2024-08-01,2024-08-10,1\n"
+    )
+    ratings = scan_csv(path, "clubelo/ratings").collect()
+    assert ratings.schema["Rank"] == pl.Int64
+    assert ratings.schema["Elo"] == pl.Float64
+    assert ratings.schema["To"] == pl.Date
+    assert ratings.schema["Extra"] == pl.String
+
+    # Values that do not fit the schema should fail
+    path.write_text("Rank,Club,Elo,From,To\n1.5,Arsenal,2000,2024-08-01,2024-08-10\n")
+    with pytest.raises(pl.exceptions.ComputeError):
+        scan_csv(path, "clubelo/ratings").collect()
+
+    # Unregistered columns should be reported for strict families, in any file
+    directory = tmp_path / "elements"
+    directory.mkdir()
+    (directory / "1.csv").write_text("element,round\n1,1\n")
+    (directory / "2.csv").write_text("element,round,new_stat\n1,2,0\n")
+    with pytest.warns(UserWarning, match="new_stat"):
+        elements = scan_csv(directory / "*.csv", "fpl/elements").collect()
+    assert elements.schema["round"] == pl.Int64
+    assert elements.schema["new_stat"] == pl.String
+    assert elements.get_column("new_stat").to_list() == [None, "0"]
+
+
+def test_get_changed_files(tmp_path, monkeypatch):
+    (tmp_path / "fpl/2024/static").mkdir(parents=True)
+    (tmp_path / "theoddsapi/2024").mkdir(parents=True)
+    (tmp_path / "fpl/2024/static/1.json.xz").write_text("a")
+    (tmp_path / "theoddsapi/2024/1.json.xz").write_text("b")
+    # A first manifest should only record sizes and modification times
+    first = build_manifest(tmp_path)
+    assert all("sha256" not in entry for entry in first.values())
+
+    # Without a hash to compare against, touched files count as changed
+    os.utime(tmp_path / "fpl/2024/static/1.json.xz", ns=(1, 1))
+    old = build_manifest(tmp_path, first)
+    assert get_changed_files(first, old) == {"fpl/2024/static/1.json.xz"}
+
+    # Only files with changed content should be reported
+    (tmp_path / "fpl/2024/static/1.json.xz").write_text("a")
+    (tmp_path / "theoddsapi/2024/2.json.xz").write_text("c")
+    new = build_manifest(tmp_path, old)
+    changed = get_changed_files(old, new)
+    assert changed == {"theoddsapi/2024/2.json.xz"}
+    assert "sha256" not in new["theoddsapi/2024/1.json.xz"]
+
+    # Only the cache entry converted from a changed file should be invalidated
+    monkeypatch.chdir(tmp_path)
+    entries = [
+        get_theoddsapi_cache_dir(2024, 1),
+        get_theoddsapi_cache_dir(2024, 2),
+        get_bootstrap_static_cache_dir(2024, 1),
+    ]
+    for entry in entries:
+        entry.mkdir(parents=True)
+        (entry / FINGERPRINT_FILENAME).write_text("fingerprint")
+    invalidate_caches(changed)
+    fresh = [(entry / FINGERPRINT_FILENAME).exists() for entry in entries]
+    assert fresh == [True, False, True]
+
+
+def test_dense_mappers():
+    df = pl.DataFrame(
+        {
+            "element": [3, 1, 3, 7],
+            "gameweek": [2, 2, 3, 3],
+            "total_points": [1.5, 2.0, 3.5, 4.0],
+            "web_name": ["a", "b", "c", "d"],
+        }
+    )
+
+    first_gameweek = df.filter(pl.col("gameweek") == 2)
+    mapper = DenseMapper.from_frame(first_gameweek, "element", "web_name")
+    assert dict(mapper) == {3: "a", 1: "b"}
+    assert 7 not in mapper and mapper.get(7) is None
+    with pytest.raises(KeyError):
+        mapper[100]
+    # Keys that are not integers should not be mapped, even if they equal an ID
+    for key in [3.0, "3", None]:
+        assert key not in mapper and mapper.get(key) is None
+        with pytest.raises(KeyError):
+            mapper[key]
+    with pytest.raises(ValueError):
+        DenseMapper.from_frame(df, "element", "web_name")
+
+    grid = DenseGridMapper.from_frame(
+        df, "element", "gameweek", "total_points", ids=[5], gameweeks=[4]
+    )
+    assert grid[3, 3] == 3.5 and grid[7, 3] == 4.0
+    # Pairs without a value are filled with zeros
+    assert grid[5, 2] == 0 and grid[1, 4] == 0
+    assert len(grid) == 4 * 3 and (2, 2) not in grid
+    assert (3.0, 3) not in grid and (3, 3.5) not in grid
+    assert grid.values.shape == (4, 3)
+
+    # Null values should map to None, like they would in a dict
+    df = pl.DataFrame(
+        {
+            "element": [1, 2, 1, 2],
+            "gameweek": [1, 1, 2, 2],
+            "now_cost": [45, None, 50, 55],
+            "web_name": [None, "b", "c", "d"],
+        }
+    )
+    first_gameweek = df.filter(pl.col("gameweek") == 1)
+    now_costs = DenseMapper.from_frame(first_gameweek, "element", "now_cost")
+    assert dict(now_costs) == {1: 45, 2: None}
+    assert isinstance(now_costs[1], int) and 2 in now_costs
+    web_names = DenseMapper.from_frame(first_gameweek, "element", "web_name")
+    assert dict(web_names) == {1: None, 2: "b"}
+    grid = DenseGridMapper.from_frame(df, "element", "gameweek", "now_cost", ids=[3])
+    assert grid[2, 1] is None and grid[2, 2] == 55 and grid[3, 1] == 0
+
+
+def test_lru_memo():
+    memo = LRUMemo(max_bytes=10, sizeof=len)
+
+    assert memo.get("a", lambda: "aaaa") == "aaaa"
+    assert memo.get("b", lambda: "bbbb") == "bbbb"
+    assert memo.get("a", lambda: "xxxx") == "aaaa"
+    # Storing "c" exceeds the budget, evicting the least recently used value
+    assert memo.get("c", lambda: "cccc") == "cccc"
+    assert memo.get("b", lambda: "BBBB") == "BBBB"
+    # Values larger than the budget are never stored
+    assert memo.get("d", lambda: "d" * 11) == "d" * 11
+
+    stats = memo.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 5, 2)
+    assert stats["bytes"] == 8
+
+    memo.resize(4)
+    assert memo.stats()["evictions"] == 3
+    assert memo.get("b", lambda: "xxxx") == "BBBB"
+
+
+def test_profiler(tmp_path):
+    path = tmp_path / "numbers.parquet"
+    pl.DataFrame({"x": range(100)}).write_parquet(path)
+
+    profiler = Profiler()
+    with profiler.time("build"):
+        frame = pl.scan_parquet(path).filter(pl.col("x") < 10)
+    df = profiler.collect("numbers", frame)
+    assert profiler.timed("total", sum, [1, 2, 3]) == 6
+
+    build, numbers, total = profiler.stages
+    assert total.name == "total" and total.seconds >= 0
+    assert build.name == "build" and build.rows is None
+    assert numbers.rows == df.height == 10
+    assert numbers.bytes == df.estimated_size()
+    assert numbers.bytes_read == path.stat().st_size
+    assert "FILTER" in numbers.plan or "SELECTION" in numbers.plan
+
+    exported = json.loads(profiler.to_json(tmp_path / "profile.json"))
+    assert [stage["name"] for stage in exported] == ["build", "numbers", "total"]
+    assert (tmp_path / "profile.json").read_text() == profiler.to_json()
+
+
+def test_packed_keys():
+    # Packed keys should be unique for every combination of their columns
+    df = pl.DataFrame(
+        {
+            "season": [2023, 2023, 2024, 2024],
+            "gameweek": [1, 38, 1, 1],
+            "fixture": [1, 380, 1, 2],
+            "element": [1, 1, 1, 2],
+            "code": [223094, 223094, 223094, 3],
+        }
+    )
+    keys = df.select(
+        gameweek_id_key("element").alias("gameweek_id"),
+        fixture_code_key().alias("fixture_code"),
+    )
+    assert keys["gameweek_id"].to_list() == [
+        2023_01_0000001,
+        2023_38_0000001,
+        2024_01_0000001,
+        2024_01_0000002,
+    ]
+    assert keys["fixture_code"].n_unique() == 4
+
+    # Values that do not fit their key should be rejected
+    check_key_bounds(df, {"element": ID_BOUND, "gameweek": GAMEWEEK_BOUND})
+    with pytest.raises(ValueError):
+        check_key_bounds(
+            df.with_columns(element=pl.lit(ID_BOUND)), {"element": ID_BOUND}
+        )
+    with pytest.raises(ValueError):
+        check_key_bounds(
+            df.lazy().with_columns(gameweek=-1), {"gameweek": GAMEWEEK_BOUND}
+        )
+
+
+def test_generate_data(tmp_path, monkeypatch):
+    # Generated data should be deterministic for a given seed
+    for name in ["a", "b"]:
+        generate_data(
+            tmp_path / name, [2023, 2024], teams=4, players_per_team=13, gameweeks=3
+        )
+    a, b = tmp_path / "a", tmp_path / "b"
+    paths = sorted(path.relative_to(a) for path in a.rglob("*") if path.is_file())
+    assert paths
+    for path in paths:
+        assert (a / path).read_bytes() == (b / path).read_bytes()
+
+    # Generated data should load like the real data
+    a.rename(tmp_path / "fpl-data")
+    monkeypatch.chdir(tmp_path)
+    BOOTSTRAP_STATIC_MEMO.clear()
+    try:
+        players, matches, managers = load_merged(
+            [2023, 2024], 2024, [3, 4], collect=True
+        )
+    finally:
+        BOOTSTRAP_STATIC_MEMO.clear()
+
+    # Each season has 6 gameweeks of 2 matches, and each team has 13 players
+    assert matches.height == (6 + 4) * 2
+    assert players.height == matches.height * 2 * 13
+    assert managers.get_column("element").n_unique() == 4
+    codes = players.select("code", "team_code", "opponent_team_code")
+    assert codes.null_count().sum_horizontal().item() == 0
+    upcoming = players.filter(pl.col("season") == 2024, pl.col("gameweek") >= 3)
+    assert upcoming.get_column("total_points").null_count() == upcoming.height
+
+
+def test_ingest_clubelo_duplicates(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    directory = DATA_DIR / "clubelo"
+    (directory / "ratings").mkdir(parents=True)
+    (directory / "team_ids.csv").write_text("clubelo_name,fpl_code\nArsenal,3\n")
+    header = "Rank,Club,Country,Level,Elo,From,To\n"
+    (directory / "ratings/a.csv").write_text(
+        header
+        + "1,Arsenal,ENG,1,1900.0,2024-01-01,2024-01-10\n"
+        + "1,Arsenal,ENG,1,1910.0,2024-01-11,2024-01-20\n"
+    )
+    (directory / "ratings/b.csv").write_text(
+        header + "1,Arsenal,ENG,1,1920.0,2024-01-11,2024-01-20\n"
+    )
+
+    # The last rating for a club and end date in file order should be kept
+    ratings = load_clubelo(datetime(2024, 1, 15)).collect()
+    assert ratings.get_column("Elo").to_list() == [1900.0, 1920.0]
+
+
+def test_ingest_understat_players(tmp_path, monkeypatch):
+    generate_data(
+        tmp_path / "fpl-data", [2023, 2024], teams=4, players_per_team=13, gameweeks=3
+    )
+    monkeypatch.chdir(tmp_path)
+    players = load_players([2023, 2024]).collect()
+    directory = CACHE_DIR / "understat/player/matches"
+    partitions = sorted(path.name for path in directory.glob("season=*"))
+    assert partitions == ["season=2023", "season=2024"]
+    written = directory / "season=2023/data.parquet"
+    mtime_ns = written.stat().st_mtime_ns
+
+    # A file with a new season should only add that season's partition
+    matches = DATA_DIR / "understat/player/matches"
+    path = sorted(matches.glob("*.csv"))[0]
+    new_path = matches / "99999.csv"
+    pl.read_csv(path).filter(pl.col("season") == 2023).with_columns(
+        season=pl.lit(2025)
+    ).write_csv(new_path)
+    assert load_players([2025]).collect().height > 0
+    assert written.stat().st_mtime_ns == mtime_ns
+    assert_frame_equal(load_players([2023, 2024]).collect(), players)
+
+    # Removing the season's only file should remove its partition
+    new_path.unlink()
+    assert load_players([2025]).collect().height == 0
+    assert not (directory / "season=2025").exists()
+    assert written.stat().st_mtime_ns == mtime_ns
+
+    # Missing seasons should load as an empty frame with the player schema
+    empty = load_players([2030]).collect()
+    assert empty.is_empty() and empty.schema == players.schema
+
+
+def test_load_merged_odds_issues(tmp_path, monkeypatch):
+    generate_data(
+        tmp_path / "fpl-data", [2024], teams=4, players_per_team=13, gameweeks=3
+    )
+    monkeypatch.chdir(tmp_path)
+
+    # Add a second occurence of a match to a snapshot
+    path = DATA_DIR / "theoddsapi/2024/2.json.xz"
+    odds = json.loads(lzma.decompress(path.read_bytes()))
+    odds.append({**odds[0], "bookmakers": odds[0]["bookmakers"][:1]})
+    path.write_bytes(lzma.compress(json.dumps(odds).encode()))
+
+    # The issue should be reported whether or not the frames are collected
+    for collect in [False, True]:
+        with pytest.warns(UserWarning, match="multiple occurences"):
+            load_merged([2024], 2024, [3, 4], collect=collect)
+
+
+def test_get_deadline_times(tmp_path, monkeypatch):
+    generate_data(
+        tmp_path / "fpl-data", [2024], teams=4, players_per_team=13, gameweeks=3
+    )
+    monkeypatch.chdir(tmp_path)
+    expected = datetime(2024, 8, 17, 12, tzinfo=UTC)
+    assert get_deadline_times(2024)[2] == expected
+    assert get_deadline_times(2024)[2] == expected
+
+    # Deadline times should be reloaded once the snapshots change
+    path = DATA_DIR / "fpl/2024/static/2.json.xz"
+    bootstrap_static = json.loads(lzma.decompress(path.read_bytes()))
+    bootstrap_static["events"][1]["deadline_time"] = "2024-08-17T10:30:00Z"
+    path.write_bytes(lzma.compress(json.dumps(bootstrap_static).encode()))
+    expected = datetime(2024, 8, 17, 10, 30, tzinfo=UTC)
+    assert get_deadline_times(2024)[2] == expected
+
+
 def test_get_seasons():
     expected = [2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023]
     assert get_seasons(2023) == expected
@@ -364,6 +851,54 @@ def test_get_upcoming_fixtures():
     assert upcoming_fixtures.get_column("gameweek").max() == 5
 
 
+def test_get_upcoming_static_elements():
+    columns = [
+        "code",
+        "id",
+        "team",
+        "team_code",
+        "element_type",
+        "first_name",
+        "second_name",
+        "web_name",
+        "now_cost",
+        "corners_and_indirect_freekicks_order",
+        "corners_and_indirect_freekicks_text",
+        "direct_freekicks_order",
+        "direct_freekicks_text",
+        "penalties_order",
+        "penalties_text",
+        "status",
+        "chance_of_playing_next_round",
+        "news",
+        "news_added",
+    ]
+    static_elements = pl.LazyFrame(
+        {
+            "season": [2024] * 6,
+            "gameweek": [4, 4, 4, 5, 5, 5],
+            **{column: [1, 2, 3, 1, 2, 3] for column in columns},
+        },
+        schema_overrides={"season": pl.Int32, "gameweek": pl.Int32},
+    )
+
+    # The query plan should not grow with the number of upcoming gameweeks
+    plans = []
+    for last_gameweek in [6, 38]:
+        upcoming_gameweeks = list(range(5, last_gameweek + 1))
+        df = get_upcoming_static_elements(2024, upcoming_gameweeks, static_elements)
+        plans.append(df.explain())
+
+        df = df.collect()
+        assert df.height == 3 * len(upcoming_gameweeks)
+        assert df.get_column("gameweek").to_list() == sorted(upcoming_gameweeks * 3)
+        # Availability is only known for the next gameweek
+        assert df.filter(pl.col("gameweek") > 5).get_column("status").null_count() == (
+            df.height - 3
+        )
+    assert len(plans[0]) == len(plans[1])
+
+
 def assert_mappings_correct(
     df: pl.DataFrame,
     expected: pl.DataFrame,
@@ -1,19 +1,33 @@
 from datetime import datetime
+from statistics import stdev
 
+import numpy as np
 import polars as pl
 from polars.testing import assert_frame_equal
+from scipy.stats import poisson
 
 from features.availability import compute_availability
 from features.balanced_mean import compute_balanced_mean
+from features.engineer_features import engineer_match_features, engineer_player_features
 from features.fatigue import compute_fatigue
 from features.imputed_last_season_mean import compute_imputed_last_season_mean
 from features.imputed_set_piece_order import compute_imputed_set_piece_order
+from features.incremental import IncrementalFeatures
 from features.last_season_mean import compute_last_season_mean
 from features.minutes_category import compute_minutes_category
 from features.per_90 import compute_per_90
 from features.record_count import compute_record_count
+from features.registry import Feature, get_required_features
 from features.rolling_mean import compute_rolling_mean
+from features.rolling_std import compute_rolling_std
 from features.share import compute_share
+from features.store import FeatureStore
+from features.toa_features import estimate_goals, get_outcome_errors, get_outcome_masks
+from loaders.asof import AsOfStore
+from loaders.cache import get_directory_fingerprint
+from loaders.fpl import BOOTSTRAP_STATIC_MEMO
+from loaders.synthetic import generate_data
+from loaders.upcoming import get_upcoming_condition
 from loaders.utils import force_dataframe
 
 
@@ -490,6 +504,63 @@ def test_compute_rolling_mean():
     )
 
 
+def test_compute_rolling_std():
+    # Test rolling deviations over values meeting a condition
+    players = pl.DataFrame(
+        {
+            "season": [2021] * 6 + [2022] * 2,
+            "code": [1] * 8,
+            "kickoff_time": [1, 2, 3, 4, 5, 6, 7, 8],
+            "minutes": [2, 4, None, 6, 8, 10, 90, 90],
+            "availability": [100, 100, 100, 0, 100, 100, 100, 100],
+        }
+    )
+    expected = players.with_columns(
+        pl.Series(
+            "minutes_rolling_std_2_when_available",
+            [
+                None,
+                None,
+                stdev([2, 4]),
+                stdev([2, 4]),
+                stdev([2, 4]),
+                stdev([4, 8]),
+                None,
+                None,
+            ],
+        ),
+        pl.Series(
+            "minutes_rolling_std_3_when_available",
+            [
+                None,
+                None,
+                stdev([2, 4]),
+                stdev([2, 4]),
+                stdev([2, 4]),
+                stdev([2, 4, 8]),
+                None,
+                None,
+            ],
+        ),
+    )
+    players = players.sample(fraction=1.0, shuffle=True, seed=42)
+    result = compute_rolling_std(
+        players,
+        columns=["minutes", "minutes"],
+        window_sizes=[2, 3],
+        condition=pl.col("availability") == 100,
+        suffix="_when_available",
+    )
+    assert_frame_equal(
+        result,
+        expected,
+        check_row_order=False,
+        check_column_order=False,
+        check_exact=False,
+        check_dtypes=False,
+    )
+
+
 def test_compute_last_season_mean():
     # Test with a single player
     players = pl.DataFrame(
@@ -937,3 +1008,172 @@ def _compare_availability(df: pl.DataFrame, expected: pl.DataFrame):
     result = compute_availability(df)
     result = result.select(expected.columns)
     assert_frame_equal(result, expected, check_dtypes=False)
+
+    # Loaders provide the news as a categorical column
+    df = df.with_columns(pl.col("news").cast(pl.Categorical))
+    result = compute_availability(df).select(expected.columns)
+    assert_frame_equal(result, expected, check_dtypes=False)
+
+
+def test_incremental_features(tmp_path, monkeypatch):
+    generate_data(
+        tmp_path / "fpl-data", [2023, 2024], teams=4, players_per_team=13, gameweeks=4
+    )
+    monkeypatch.chdir(tmp_path)
+    BOOTSTRAP_STATIC_MEMO.clear()
+    try:
+        store = AsOfStore([2023, 2024], 2024)
+        features = IncrementalFeatures()
+        stored_features = IncrementalFeatures(FeatureStore(tmp_path / "features"))
+        columns = [
+            "balanced_adjusted_uds_xG_per_90_rolling_mean_3",
+            "minutes_mean_last_season_when_available",
+            "minutes_std_last_season",
+            "depth_rank_change_minutes_rolling_mean_38",
+        ]
+        pruned_features = IncrementalFeatures(columns=columns)
+        # Incremental features should match the upcoming records of batch features
+        for upcoming_gameweeks in [[2, 3], [4, 5]]:
+            players, matches, _ = store.load(upcoming_gameweeks)
+            upcoming = get_upcoming_condition(2024, upcoming_gameweeks)
+            expected_players = force_dataframe(engineer_player_features(players))
+            expected_matches = force_dataframe(engineer_match_features(matches))
+            result_players, result_matches = features.engineer(
+                players, matches, 2024, upcoming_gameweeks
+            )
+            assert_frame_equal(
+                result_players.sort("fixture", "element"),
+                expected_players.filter(upcoming).sort("fixture", "element"),
+                check_exact=True,
+            )
+            assert_frame_equal(
+                result_matches.sort("fixture_id"),
+                expected_matches.filter(upcoming).sort("fixture_id"),
+                check_exact=True,
+            )
+            # Pruned features should match on the requested columns
+            keys = ["fixture", "element", *columns]
+            pruned_players = force_dataframe(
+                engineer_player_features(players, columns=columns)
+            )
+            assert_frame_equal(
+                pruned_players.select(keys).sort(keys),
+                expected_players.select(keys).sort(keys),
+                check_exact=True,
+            )
+            pruned_players, _ = pruned_features.engineer(
+                players, matches, 2024, upcoming_gameweeks
+            )
+            assert_frame_equal(
+                pruned_players.select(keys).sort(keys),
+                result_players.select(keys).sort(keys),
+                check_exact=True,
+            )
+            assert pruned_players.width < result_players.width
+
+            # Stored features should match, whether computed or read back
+            for _ in range(2):
+                stored_players, stored_matches = stored_features.engineer(
+                    players, matches, 2024, upcoming_gameweeks
+                )
+                assert_frame_equal(stored_players, result_players, check_exact=True)
+                assert_frame_equal(stored_matches, result_matches, check_exact=True)
+    finally:
+        BOOTSTRAP_STATIC_MEMO.clear()
+
+
+def test_get_required_features():
+    registry = {
+        "b": Feature(("a",)),
+        "c": Feature(("a", "b")),
+        "d": Feature(("c",)),
+    }
+    assert get_required_features(registry, None) is None
+    assert get_required_features(registry, ["c", "e"]) == {"b", "c"}
+    assert get_required_features(registry, ["d"]) == {"b", "c", "d"}
+    assert get_required_features(registry, ["a"]) == set()
+
+
+def test_feature_store(tmp_path):
+    df = pl.DataFrame({"season": [2023, 2023, 2024], "value": [1.0, 2.0, 3.0]})
+    data = tmp_path / "data"
+    (data / "2024").mkdir(parents=True)
+    (data / "2024" / "1.json").write_text("{}")
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {
+            "features": df.with_columns(doubled=pl.col("value") * 2),
+            "matches": df,
+        }
+
+    store = FeatureStore(tmp_path / "features")
+    fingerprint = get_directory_fingerprint(data)
+    first = store.get("test", fingerprint, compute)
+    # Stored tables are reused for the same sources, projecting only named tables
+    second = store.get(
+        "test", get_directory_fingerprint(data), compute, {"features": ["doubled"]}
+    )
+    assert len(calls) == 1
+    assert_frame_equal(second["features"], first["features"].select("doubled"))
+    assert_frame_equal(second["matches"], df)
+
+    # Changing the source files or the parameters recomputes the tables
+    (data / "2024" / "2.json").write_text("{}")
+    assert get_directory_fingerprint(data) != fingerprint
+    store.get("test", get_directory_fingerprint(data), compute)
+    store.get("test", fingerprint, compute, season=2024)
+    assert len(calls) == 3
+
+    # Only the most recently used entries are kept within the budget
+    entry_size = store.size() // 3
+    store = FeatureStore(tmp_path / "features", max_bytes=2 * entry_size)
+    store.get("test", fingerprint, compute)
+    store.get("test", fingerprint, compute, season=2025)
+    assert len(calls) == 4
+    assert store.size() <= 2 * entry_size
+    store.get("test", fingerprint, compute)
+    assert len(calls) == 4
+
+
+def test_estimate_goals():
+    # Outcome probabilities of a match with known expected goals
+    home, away = np.meshgrid(np.arange(11), np.arange(11), indexing="ij")
+    probs = np.outer(poisson.pmf(np.arange(11), 1.7), poisson.pmf(np.arange(11), 0.9))
+    outcomes = pl.DataFrame(
+        [
+            ("h2h", "home", None, probs[home > away].sum()),
+            ("h2h", "away", None, probs[home < away].sum()),
+            ("h2h", "draw", None, probs[home == away].sum()),
+            ("spreads", "home", -1.5, probs[home - 1.5 > away].sum()),
+            ("spreads", "away", 1.5, probs[away + 1.5 > home].sum()),
+            ("totals", "Over", 2.5, probs[home + away > 2.5].sum()),
+            ("totals", "Under", 2.5, probs[home + away < 2.5].sum()),
+        ],
+        schema=["type", "side", "point", "prob"],
+        orient="row",
+    )
+
+    # Matches are fitted together, and those without targets have no estimate
+    targets = pl.concat(
+        [
+            outcomes.with_columns(match=pl.lit(0)),
+            outcomes.head(3).with_columns(match=pl.lit(2)),
+        ]
+    )
+    goals = estimate_goals(targets, 3, max_goals=10)
+    assert np.allclose(goals[0], [1.7, 0.9], atol=1e-4)
+    assert np.isnan(goals[1]).all()
+    assert np.isfinite(goals[2]).all()
+
+    # The Jacobian should match finite differences of the errors
+    outcomes = outcomes.with_columns(match=pl.lit(0))
+    masks, indices, targets, valid = get_outcome_masks(outcomes, 1, max_goals=10)
+    params = np.array([[1.3, 1.1]])
+    _, jacobian = get_outcome_errors(params, masks, indices, targets, valid, 10)
+    for i in range(2):
+        step = np.eye(2)[i] * 1e-6
+        upper, _ = get_outcome_errors(params + step, masks, indices, targets, valid, 10)
+        lower, _ = get_outcome_errors(params - step, masks, indices, targets, valid, 10)
+        assert np.allclose(jacobian[0, :, i], (upper - lower)[0] / 2e-6, atol=1e-8)